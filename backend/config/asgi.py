@@ -1,5 +1,8 @@
 """
 ASGI config for config project.
+
+Servi en production par gunicorn avec des workers uvicorn
+(voir config/gunicorn.conf.py).
 """
 
 import os
@@ -7,5 +10,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Sous ASGI, les chemins de lecture les plus sollicités sont servis par des
+# vues asynchrones (smartbin/async_views.py)
+os.environ.setdefault('SMARTBIN_ASYNC_VIEWS', '1')
 
-application = get_asgi_application() 
\ No newline at end of file
+application = get_asgi_application()
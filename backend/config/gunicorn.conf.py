@@ -0,0 +1,28 @@
+"""
+Configuration gunicorn : application ASGI servie par des workers uvicorn.
+
+    gunicorn -c config/gunicorn.conf.py
+
+Rechargement sans coupure après un déploiement : ``kill -HUP <pid du maître>``
+démarre de nouveaux workers puis arrête les anciens une fois leurs requêtes
+terminées (dans la limite de graceful_timeout).
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = os.environ.get('GUNICORN_APP', 'config.asgi:application')
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recyclage périodique des workers, décalé pour ne pas les relancer ensemble
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
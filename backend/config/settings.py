@@ -28,14 +28,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête : mesure la durée complète des requêtes
+    'smartbin.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # ?_profile=1 : après l'authentification (jeton JWT ou session)
+    'smartbin.instrumentation.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'smartbin.replicas.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -57,20 +62,76 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Vues asynchrones (liste et détail des bacs et alertes, statistiques,
+# télémétrie) : activées par config/asgi.py, sans effet sous WSGI
+SMARTBIN_ASYNC_VIEWS = os.environ.get('SMARTBIN_ASYNC_VIEWS') == '1'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connexions empruntées à un pool propre à chaque processus
+# (smartbin/postgresql_pool), rendues en fin de requête. Sans pool
+# (SMARTBIN_DB_POOL=0), POSTGRES_CONN_MAX_AGE garde les connexions ouvertes
+# entre les requêtes d'un même thread (WSGI uniquement : sous ASGI, chaque
+# requête synchrone peut changer de thread).
+SMARTBIN_DB_POOL = os.environ.get('SMARTBIN_DB_POOL', '1') == '1'
+# Connexion via PgBouncer en mode transaction : une transaction peut changer
+# de connexion serveur, les curseurs serveur (iterator()) sont désactivés
+SMARTBIN_DB_PGBOUNCER = os.environ.get('SMARTBIN_DB_PGBOUNCER') == '1'
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": "smartbin_db",
-        "USER": "postgres",
-        "PASSWORD": "SQL2025",
-        "HOST": "127.0.0.1",
-        "PORT": "5432",
+        "ENGINE": "smartbin.postgresql_pool" if SMARTBIN_DB_POOL else "django.db.backends.postgresql",
+        "NAME": os.environ.get('POSTGRES_DB', 'smartbin_db'),
+        "USER": os.environ.get('POSTGRES_USER', 'postgres'),
+        "PASSWORD": os.environ.get('POSTGRES_PASSWORD', 'SQL2025'),
+        "HOST": os.environ.get('POSTGRES_HOST', '127.0.0.1'),
+        "PORT": os.environ.get('POSTGRES_PORT', '5432'),
+        "CONN_MAX_AGE": 0 if SMARTBIN_DB_POOL else int(os.environ.get('POSTGRES_CONN_MAX_AGE', 0)),
+        # Connexion persistante vérifiée avant d'être réutilisée
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": SMARTBIN_DB_PGBOUNCER,
+        "OPTIONS": {
+            "connect_timeout": int(os.environ.get('POSTGRES_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
+if SMARTBIN_DB_POOL:
+    # Taille par processus : prévoir workers × max_size connexions au plus
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.environ.get('SMARTBIN_DB_POOL_MIN_SIZE', 2)),
+        "max_size": int(os.environ.get('SMARTBIN_DB_POOL_MAX_SIZE', 10)),
+        "timeout": float(os.environ.get('SMARTBIN_DB_POOL_TIMEOUT', 10)),
+        "max_idle": float(os.environ.get('SMARTBIN_DB_POOL_MAX_IDLE', 600)),
+        "max_lifetime": float(os.environ.get('SMARTBIN_DB_POOL_MAX_LIFETIME', 3600)),
+        "check_after": float(os.environ.get('SMARTBIN_DB_POOL_CHECK_AFTER', 30)),
+    }
+
+# Réplicas en lecture (réplication en streaming de la base principale) :
+# POSTGRES_REPLICAS=hôte:port:poids,... Les statistiques, résumés et
+# exports y sont lus (voir smartbin/replicas.py).
+SMARTBIN_READ_REPLICAS = {}
+for index, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICAS', '').split(',')), 1):
+    host, *rest = replica.strip().split(':')
+    port, weight = (rest + [None, None])[:2]
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'], 'HOST': host, 'PORT': port or '5432',
+        'TEST': {'MIRROR': 'default'},
+    }
+    SMARTBIN_READ_REPLICAS[alias] = int(weight or 1)
+DATABASE_ROUTERS = ['smartbin.replicas.ReplicaRouter']
+# Retard maximal (s) d'un réplica interrogé
+SMARTBIN_REPLICA_MAX_LAG = float(os.environ.get('SMARTBIN_REPLICA_MAX_LAG', 10))
+
+# Connexion dédiée à LISTEN (temps réel) : directe vers PostgreSQL, LISTEN
+# ne traversant pas PgBouncer en mode transaction
+SMARTBIN_LISTEN_HOST = os.environ.get('POSTGRES_LISTEN_HOST', '')
+SMARTBIN_LISTEN_PORT = os.environ.get('POSTGRES_LISTEN_PORT', '')
+
+AUTH_USER_MODEL = 'smartbin.User'
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,6 +166,28 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache partagé (permissions des rôles, règles d'alerte, réponses de l'API,
+# métriques des workers) :
+# redis://hôte:6379/0 (paquet redis requis), file:///chemin/du/dossier, ou
+# mémoire locale du processus par défaut
+SMARTBIN_CACHE_URL = os.environ.get('SMARTBIN_CACHE_URL', '')
+if SMARTBIN_CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SMARTBIN_CACHE_URL,
+    }}
+elif SMARTBIN_CACHE_URL.startswith('file://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SMARTBIN_CACHE_URL[len('file://'):],
+    }}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Jeton du collecteur Prometheus pour /metrics (en-tête Authorization:
+# Bearer <jeton>) ; sans jeton, /metrics est réservé aux utilisateurs staff
+SMARTBIN_METRICS_TOKEN = os.environ.get('SMARTBIN_METRICS_TOKEN', '')
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -113,6 +196,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'smartbin.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # JWT Settings
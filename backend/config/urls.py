@@ -3,7 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
-from smartbin.views import CustomTokenObtainPairView, CustomTokenRefreshView
+from smartbin.views import CustomTokenObtainPairView, CustomTokenRefreshView, metrics
 
 urlpatterns = [
     path('', RedirectView.as_view(url='http://localhost:3000', permanent=True)),  # Redirection vers le frontend
@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/', include('smartbin.urls')),
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,396 @@
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import dashboard, realtime
+from .models import Alert, AlertRule, BinReading, Collection, SmartBin
+
+# Les règles actives sont compilées une fois par processus en tableaux numpy
+# (une ligne par règle), puis évaluées sur chaque lot de relevés. Une
+# modification de règle (voir signals.py) incrémente une génération stockée
+# dans le cache partagé ; sans cache partagé, la table est recompilée au plus
+# tard après RULES_TTL secondes.
+RULES_TTL = getattr(settings, 'SMARTBIN_ALERT_RULES_TTL', 60)
+GENERATION_KEY = 'smartbin:alert_rules:generation'
+# Alertes créées au plus par bac et par heure, tous types confondus
+MAX_ALERTS_PER_HOUR = getattr(settings, 'SMARTBIN_ALERTS_PER_BIN_PER_HOUR', 10)
+# Une collecte enregistrée dans cet intervalle autour d'une baisse l'explique
+COLLECTION_GRACE = timedelta(minutes=getattr(settings, 'SMARTBIN_ALERT_COLLECTION_GRACE_MINUTES', 30))
+# Une hausse n'est un saut que si les deux relevés sont aussi proches
+JUMP_WINDOW = timedelta(minutes=getattr(settings, 'SMARTBIN_ALERT_JUMP_WINDOW_MINUTES', 60))
+# Profondeur maximale de l'historique relu pour les relevés consécutifs
+HISTORY_WINDOW = timedelta(days=1)
+DB_BATCH_SIZE = 1000
+
+# Lignes de la matrice des relevés
+METRICS = ('fill_level', 'battery_level', 'level_drop', 'level_jump', 'stuck')
+# Mesurées entre deux relevés (ou depuis un relevé) : pas de série
+# consécutive, et le relevé précédant le lot est nécessaire
+PAIRWISE = ('level_drop', 'level_jump', 'stuck')
+OPERATORS = {'gt': np.greater, 'gte': np.greater_equal, 'lt': np.less, 'lte': np.less_equal}
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+DEFAULT_MESSAGES = {
+    'fill_level': 'Bac {bin} : niveau de remplissage à {value:.0f} %',
+    'battery_level': 'Bac {bin} : batterie à {value:.0f} %',
+    'level_drop': 'Bac {bin} : baisse de {value:.0f} points sans collecte',
+    'level_jump': 'Bac {bin} : hausse de {value:.0f} points entre deux relevés',
+    'stuck': 'Bac {bin} : niveau inchangé depuis {value:.0f} h',
+    'no_reading': 'Bac {bin} : aucun relevé depuis {value:.0f} h',
+    'flow_outlier': 'Bac {bin} : pesée anormale (écart robuste de {value:.1f})',
+}
+
+_compiled = {'table': None, 'generation': None, 'expires': 0.0}
+
+
+class RuleTable:
+    """Règles actives compilées : un tableau par attribut, une case par règle."""
+
+    def __init__(self, rules):
+        self.rules = [rule for rule in rules if rule.condition in METRICS]
+        self.silence_rules = [rule for rule in rules if rule.condition == 'no_reading']
+        self.flow_rules = [rule for rule in rules if rule.condition == 'flow_outlier']
+        self.metric = np.array([METRICS.index(rule.condition) for rule in self.rules], dtype=np.intp)
+        self.operator = np.array([rule.operator for rule in self.rules], dtype=object)
+        self.threshold = np.array([rule.threshold for rule in self.rules], dtype=np.float32)
+        self.is_drop = self.metric == METRICS.index('level_drop')
+        self.consecutive = np.array([
+            1 if rule.condition in PAIRWISE else max(rule.consecutive, 1)
+            for rule in self.rules
+        ], dtype=np.int32)
+        zones = np.array([
+            -1 if rule.zone_id is None else rule.zone_id for rule in self.rules
+        ], dtype=np.int64)
+        # Règles regroupées par zone (-1 : toutes les zones) : chaque groupe
+        # n'est évalué que sur les relevés de sa zone
+        self.groups = [(int(zone), np.nonzero(zones == zone)[0]) for zone in np.unique(zones)]
+        # Relevés antérieurs au lot nécessaires par bac
+        self.depth = int(self.consecutive.max()) - 1 if self.rules else 0
+        if any(rule.condition in PAIRWISE for rule in self.rules):
+            self.depth = max(self.depth, 1)
+
+
+def get_rule_table():
+    now = time.monotonic()
+    generation = cache.get(GENERATION_KEY)
+    if (
+        _compiled['table'] is None
+        or _compiled['generation'] != generation
+        or now >= _compiled['expires']
+    ):
+        _compiled['table'] = RuleTable(AlertRule.objects.filter(is_active=True).order_by('pk'))
+        _compiled['generation'] = generation
+        _compiled['expires'] = now + RULES_TTL
+    return _compiled['table']
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+    _compiled['table'] = None
+
+
+def invalidate_rules():
+    """Recompile les règles : tout de suite dans ce processus, ailleurs après le commit."""
+    _compiled['table'] = None
+    transaction.on_commit(_bump_generation)
+
+
+def alert_message(rule, bin_id, value):
+    template = rule.message or DEFAULT_MESSAGES[rule.condition]
+    return template.format(bin=bin_id, value=value, threshold=rule.threshold)
+
+
+def _propose(candidates, rule, bin_id, zone_id, value):
+    # Une alerte par bac et par type : la règle la plus sévère l'emporte
+    key = (bin_id, rule.alert_type)
+    current = candidates.get(key)
+    if current is None or SEVERITY_RANK[rule.severity] > SEVERITY_RANK[current[0].severity]:
+        candidates[key] = (rule, value, zone_id)
+
+
+def _history(bins, depth, since):
+    """Derniers relevés (``depth`` au plus) de chaque bac avant le lot."""
+    if depth == 1:
+        # Le dernier relevé est celui porté par le bac
+        return [
+            (bin.pk, bin.last_reading_at, bin.fill_level, bin.battery_level)
+            for bin in bins.values() if bin.last_reading_at is not None
+        ]
+    bin_ids = list(bins)
+    rows = []
+    for start in range(0, len(bin_ids), DB_BATCH_SIZE):
+        rows.extend(
+            BinReading.objects.filter(
+                bin_id__in=bin_ids[start:start + DB_BATCH_SIZE], ts__gte=since
+            ).annotate(
+                rank=Window(RowNumber(), partition_by=[F('bin_id')], order_by=F('ts').desc())
+            ).filter(rank__lte=depth).values_list('bin_id', 'ts', 'fill_level', 'battery_level')
+        )
+    return rows
+
+
+def _collected(columns, bin_ids, bin_code, ts):
+    """Colonnes dont la baisse de niveau est expliquée par une collecte."""
+    explained = np.zeros(len(ts), dtype=bool)
+    grace = COLLECTION_GRACE.total_seconds()
+    intervals = defaultdict(list)
+    for column in columns.tolist():
+        # Baisse mesurée entre la colonne précédente (même bac) et celle-ci
+        intervals[bin_ids[bin_code[column]]].append(
+            (column, ts[column - 1] - grace, ts[column] + grace)
+        )
+    low = datetime.fromtimestamp(ts[columns - 1].min() - grace, tz=dt_timezone.utc)
+    high = datetime.fromtimestamp(ts[columns].max() + grace, tz=dt_timezone.utc)
+    dates = defaultdict(list)
+    keys = list(intervals)
+    for start in range(0, len(keys), DB_BATCH_SIZE):
+        for bin_id, date in Collection.objects.filter(
+            bin_id__in=keys[start:start + DB_BATCH_SIZE], date__gte=low, date__lte=high
+        ).values_list('bin_id', 'date'):
+            dates[bin_id].append(date.timestamp())
+    for bin_id, bin_intervals in intervals.items():
+        for column, start, end in bin_intervals:
+            explained[column] = any(start <= date <= end for date in dates[bin_id])
+    return explained
+
+
+def evaluate_readings(readings, bins, now=None):
+    """
+    Évalue les règles actives sur un lot de relevés ``telemetry.Reading``.
+    ``bins`` associe chaque bac du lot à son état avant le lot. Retourne le
+    nombre d'alertes créées, répétées et écartées (voir raise_alerts).
+    """
+    table = get_rule_table()
+    if not table.rules or not readings:
+        return Counter()
+    now = now or timezone.now()
+
+    bin_ids = list(bins)
+    codes = {bin_id: code for code, bin_id in enumerate(bin_ids)}
+    since = min(reading.ts for reading in readings) - HISTORY_WINDOW
+    rows = [
+        (reading.bin_id, reading.ts, reading.fill_level, reading.battery_level, True)
+        for reading in readings
+    ]
+    if table.depth:
+        rows.extend((*row, False) for row in _history(bins, table.depth, since))
+
+    # Une colonne par relevé, triées par bac puis par date
+    n = len(rows)
+    bin_code = np.fromiter((codes[row[0]] for row in rows), np.int64, n)
+    ts = np.fromiter((row[1].timestamp() for row in rows), np.float64, n)
+    order = np.lexsort((ts, bin_code))
+    bin_code, ts = bin_code[order], ts[order]
+    is_new = np.fromiter((row[4] for row in rows), bool, n)[order]
+    values = np.full((len(METRICS), n), np.nan, dtype=np.float32)
+    values[0] = np.fromiter((row[2] for row in rows), np.float32, n)[order]
+    values[1] = np.fromiter(
+        (np.nan if row[3] is None else row[3] for row in rows), np.float32, n
+    )[order]
+    same_bin = np.zeros(n, dtype=bool)
+    same_bin[1:] = bin_code[1:] == bin_code[:-1]
+    values[2, 1:] = np.where(same_bin[1:], values[0, :-1] - values[0, 1:], np.nan)
+    close = same_bin[1:] & (ts[1:] - ts[:-1] <= JUMP_WINDOW.total_seconds())
+    values[3, 1:] = np.where(close, -values[2, 1:], np.nan)
+    positions = np.arange(n, dtype=np.int32)
+    # Heures au même niveau : depuis le début de la série de relevés égaux,
+    # qui peut précéder le premier relevé du bac (fill_level_since)
+    changed = ~same_bin
+    changed[1:] |= values[0, 1:] != values[0, :-1]
+    origin = ts.copy()
+    state = np.array([
+        (bins[bin_id].fill_level, bins[bin_id].fill_level_since.timestamp())
+        if bins[bin_id].fill_level_since is not None else (np.nan, np.nan)
+        for bin_id in bin_ids
+    ], dtype=np.float64).reshape(-1, 2)
+    starts = np.flatnonzero(~same_bin)
+    continued = state[bin_code[starts], 0] == values[0, starts]
+    origin[starts[continued]] = np.minimum(ts[starts[continued]], state[bin_code[starts[continued]], 1])
+    values[4] = (ts - origin[np.maximum.accumulate(np.where(changed, positions, 0))]) / 3600
+    # Première colonne du bac de chaque colonne
+    first = np.maximum.accumulate(np.where(same_bin, 0, positions))
+    zone_of_bin = np.array([
+        -1 if bins[bin_id].zone_id is None else bins[bin_id].zone_id for bin_id in bin_ids
+    ], dtype=np.int64)
+    column_zone = zone_of_bin[bin_code]
+
+    fired_rules, fired_columns = [], []
+    for zone, rule_rows in table.groups:
+        columns = positions if zone == -1 else positions[column_zone == zone]
+        if not len(columns):
+            continue
+        # Comparaisons NaN (batterie absente, pas de relevé précédent) : faux
+        x = values[table.metric[rule_rows][:, None], columns]
+        thresholds = table.threshold[rule_rows][:, None]
+        operators = table.operator[rule_rows]
+        condition = np.zeros(x.shape, dtype=bool)
+        for name, compare in OPERATORS.items():
+            selected = operators == name
+            if selected.any():
+                condition[selected] = compare(x[selected], thresholds[selected])
+        consecutive = table.consecutive[rule_rows]
+        if (consecutive > 1).any():
+            # Longueur de la série de relevés vérifiant la condition qui se
+            # termine sur chaque colonne (les colonnes d'un bac se suivent)
+            last_break = np.maximum.accumulate(np.where(condition, -1, columns), axis=1)
+            last_break = np.maximum(last_break, first[columns] - 1)
+            condition = (columns - last_break) >= consecutive[:, None]
+        fired = condition & is_new[columns]
+        rule_index, column_index = np.nonzero(fired)
+        fired_rules.append(rule_rows[rule_index])
+        fired_columns.append(columns[column_index])
+
+    rule_index = np.concatenate(fired_rules) if fired_rules else np.zeros(0, dtype=np.intp)
+    column = np.concatenate(fired_columns) if fired_columns else np.zeros(0, dtype=np.int32)
+    drops = table.is_drop[rule_index]
+    if drops.any():
+        explained = _collected(np.unique(column[drops]), bin_ids, bin_code, ts)
+        keep = ~(drops & explained[column])
+        rule_index, column = rule_index[keep], column[keep]
+    if not len(rule_index):
+        return Counter()
+
+    # Dernier déclenchement de chaque couple (règle, bac)
+    key = rule_index.astype(np.int64) * len(bin_ids) + bin_code[column]
+    order = np.lexsort((column, key))
+    key, rule_index, column = key[order], rule_index[order], column[order]
+    last = np.append(key[1:] != key[:-1], True)
+    candidates = {}
+    for rule_row, col in zip(rule_index[last].tolist(), column[last].tolist()):
+        rule = table.rules[rule_row]
+        bin_id = bin_ids[bin_code[col]]
+        value = float(values[table.metric[rule_row], col])
+        _propose(candidates, rule, bin_id, bins[bin_id].zone_id, value)
+    return raise_alerts(candidates, now)
+
+
+def evaluate_flows(flows, now=None):
+    """
+    Évalue les règles « pesée anormale » sur les flux ``(WasteFlow, écart)``
+    marqués par anomalies.screen_flows. Seuls les flux rattachés à un bac
+    donnent une alerte.
+    """
+    table = get_rule_table()
+    flows = [(flow, score) for flow, score in flows if flow.smart_bin_id is not None]
+    if not table.flow_rules or not flows:
+        return Counter()
+    zones = dict(
+        SmartBin.objects.filter(pk__in={flow.smart_bin_id for flow, _ in flows})
+        .values_list('pk', 'zone_id')
+    )
+    candidates = {}
+    for rule in table.flow_rules:
+        compare = OPERATORS[rule.operator]
+        for flow, score in flows:
+            zone_id = zones.get(flow.smart_bin_id)
+            if rule.zone_id in (None, zone_id) and compare(score, rule.threshold):
+                _propose(candidates, rule, flow.smart_bin_id, zone_id, score)
+    return raise_alerts(candidates, now or timezone.now())
+
+
+def check_silent_bins(now=None):
+    """Évalue les règles « absence de relevé » sur les bacs actifs."""
+    now = now or timezone.now()
+    candidates = {}
+    for rule in get_rule_table().silence_rules:
+        silent = SmartBin.objects.filter(
+            status='active', last_reading_at__lt=now - timedelta(hours=rule.threshold)
+        )
+        if rule.zone_id is not None:
+            silent = silent.filter(zone_id=rule.zone_id)
+        for bin_id, zone_id, last_reading_at in silent.values_list(
+            'pk', 'zone_id', 'last_reading_at'
+        ).iterator():
+            hours = (now - last_reading_at).total_seconds() / 3600
+            _propose(candidates, rule, bin_id, zone_id, hours)
+    return raise_alerts(candidates, now)
+
+
+def raise_alerts(candidates, now):
+    """
+    Crée les alertes ``{(bac, type): (règle, valeur, zone)}``. Une alerte déjà
+    ouverte pour le bac et le type est seulement comptée à nouveau
+    (``repeated``). Une nouvelle alerte est écartée (``suppressed``) pendant
+    le délai de la règle après la précédente du même type, ou au-delà de
+    MAX_ALERTS_PER_HOUR alertes par bac.
+    """
+    stats = Counter()
+    if not candidates:
+        return stats
+    bin_ids = list({bin_id for bin_id, _ in candidates})
+    types = list({alert_type for _, alert_type in candidates})
+    longest = max(rule.cooldown_minutes for rule, _, _ in candidates.values())
+    since = now - max(timedelta(minutes=longest), timedelta(hours=1))
+
+    open_alerts = {}
+    recent = defaultdict(list)
+    for start in range(0, len(bin_ids), DB_BATCH_SIZE):
+        for pk, bin_id, alert_type, is_resolved, created_at in Alert.objects.filter(
+            Q(is_resolved=False, type__in=types) | Q(created_at__gte=since),
+            bin_id__in=bin_ids[start:start + DB_BATCH_SIZE],
+        ).values_list('pk', 'bin_id', 'type', 'is_resolved', 'created_at'):
+            if not is_resolved and (bin_id, alert_type) in candidates:
+                open_alerts[bin_id, alert_type] = pk
+            if created_at >= since:
+                recent[bin_id].append((alert_type, created_at))
+
+    repeated = list(open_alerts.values())
+    for start in range(0, len(repeated), DB_BATCH_SIZE):
+        Alert.objects.filter(pk__in=repeated[start:start + DB_BATCH_SIZE]).update(
+            occurrences=F('occurrences') + 1, last_seen_at=now
+        )
+    stats['repeated'] = len(repeated)
+
+    hour_ago = now - timedelta(hours=1)
+    alerts = []
+    deltas = defaultdict(Counter)
+    for (bin_id, alert_type), (rule, value, zone_id) in candidates.items():
+        if (bin_id, alert_type) in open_alerts:
+            continue
+        previous = recent[bin_id]
+        cooldown_start = now - timedelta(minutes=rule.cooldown_minutes)
+        if (
+            any(kind == alert_type and created_at >= cooldown_start for kind, created_at in previous)
+            or sum(1 for _, created_at in previous if created_at >= hour_ago) >= MAX_ALERTS_PER_HOUR
+        ):
+            stats['suppressed'] += 1
+            continue
+        previous.append((alert_type, now))
+        alerts.append(Alert(
+            bin_id=bin_id,
+            type=alert_type,
+            severity=rule.severity,
+            message=alert_message(rule, bin_id, value),
+            rule=rule,
+            last_seen_at=now,
+        ))
+        deltas[zone_id]['alert_count'] += 1
+    # ignore_conflicts : alerte ouverte entre-temps par une ingestion
+    # concurrente. L'écart de compteur éventuel est corrigé par
+    # reconcile_statistics.
+    Alert.objects.bulk_create(alerts, batch_size=DB_BATCH_SIZE, ignore_conflicts=True)
+    # bulk_create ne déclenche pas les signaux : compteurs mis à jour ici
+    dashboard.apply_deltas(deltas)
+    if alerts:
+        # Relues pour leurs identifiants, non renvoyés avec ignore_conflicts
+        zones = {bin_id: zone_id for (bin_id, _), (_, _, zone_id) in candidates.items()}
+        alert_bins = list({alert.bin_id for alert in alerts})
+        created = []
+        for start in range(0, len(alert_bins), DB_BATCH_SIZE):
+            created.extend(Alert.objects.filter(
+                bin_id__in=alert_bins[start:start + DB_BATCH_SIZE],
+                is_resolved=False, last_seen_at=now, occurrences=1,
+            ))
+        realtime.alerts_changed(created, zones)
+    stats['created'] = len(alerts)
+    return stats
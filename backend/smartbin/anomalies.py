@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import alerts
+from .models import WasteFlowBaseline
+
+# Détection des pesées anormales, en une passe sur les flux dans leur ordre
+# d'arrivée. Chaque série (centre, type de déchet) garde ses WINDOW
+# dernières pesées ; une valeur est anormale quand son écart à la médiane
+# dépasse THRESHOLD fois l'écart absolu médian (MAD), ramené à l'écart type
+# d'une loi normale. Les anomalies des capteurs de remplissage sont des
+# règles d'alerte (level_drop, level_jump, stuck : voir alerts.py).
+
+WINDOW = getattr(settings, 'SMARTBIN_ANOMALY_WINDOW', 50)
+THRESHOLD = getattr(settings, 'SMARTBIN_ANOMALY_THRESHOLD', 5.0)
+# Pesées nécessaires dans une série avant de juger les suivantes
+MIN_HISTORY = 10
+MAD_SCALE = 1.4826
+# Dispersion minimale : une série de valeurs identiques ne rend pas
+# anormal le moindre écart (kg ou % de la médiane, points de taux)
+MIN_SPREAD_KG = 1.0
+MIN_SPREAD_RATIO = 0.05
+MIN_SPREAD_RATE = 2.0
+
+
+def _scores(windows, values, min_spread, min_ratio):
+    median = np.median(windows, axis=1)
+    spread = MAD_SCALE * np.median(np.abs(windows - median[:, None]), axis=1)
+    spread = np.maximum(np.maximum(spread, min_spread), min_ratio * np.abs(median))
+    return np.abs(values - median) / spread
+
+
+def robust_scores(history, values, min_spread, min_ratio=0.0):
+    """
+    Écart de chaque valeur de ``values`` à la médiane des WINDOW valeurs qui
+    la précèdent (fin de ``history`` puis début de ``values``), en MAD
+    normalisés ; 0 tant que la série compte moins de MIN_HISTORY valeurs.
+    """
+    values = np.asarray(values, dtype=float)
+    series = np.concatenate([np.asarray(history[-WINDOW:], dtype=float), values])
+    offset = len(series) - len(values)
+    # Valeurs précédentes disponibles pour chaque valeur
+    depth = np.minimum(offset + np.arange(len(values)), WINDOW)
+    scores = np.zeros(len(values))
+    full = np.flatnonzero(depth == WINDOW)
+    if len(full):
+        windows = sliding_window_view(series, WINDOW)[offset + full - WINDOW]
+        scores[full] = _scores(windows, values[full], min_spread, min_ratio)
+    # Début de série : fenêtres plus courtes, une par valeur
+    for index in np.flatnonzero((depth >= MIN_HISTORY) & (depth < WINDOW)):
+        window = series[np.newaxis, :offset + index]
+        scores[index] = _scores(window, values[index:index + 1], min_spread, min_ratio)[0]
+    return scores
+
+
+def _series(keys):
+    """Références des séries, verrouillées jusqu'à la fin de la transaction."""
+    center_ids = {center_id for center_id, _ in keys}
+    WasteFlowBaseline.objects.bulk_create(
+        [
+            WasteFlowBaseline(tri_center_id=center_id, waste_type=waste_type)
+            for center_id, waste_type in keys
+        ],
+        ignore_conflicts=True,
+    )
+    return {
+        (baseline.tri_center_id, baseline.waste_type): baseline
+        for baseline in WasteFlowBaseline.objects.select_for_update().filter(tri_center_id__in=center_ids)
+        if (baseline.tri_center_id, baseline.waste_type) in keys
+    }
+
+
+def screen_flows(flows, now=None):
+    """
+    Juge des flux pas encore enregistrés, dans l'ordre donné : marque
+    ``anomaly_detected`` sur les pesées anormales, ajoute chaque pesée à sa
+    série et évalue les règles « pesée anormale ». Retourne les flux marqués
+    et leur écart.
+    """
+    if not flows:
+        return []
+    now = now or timezone.now()
+    series = defaultdict(list)
+    for flow in flows:
+        series[flow.tri_center_id, flow.waste_type].append(flow)
+    flagged = []
+    with transaction.atomic():
+        baselines = _series(set(series))
+        for key, members in series.items():
+            baseline = baselines[key]
+            quantities = [flow.quantity_kg for flow in members]
+            rates = [flow.recycling_rate for flow in members]
+            scores = np.maximum(
+                robust_scores(baseline.quantities, quantities, MIN_SPREAD_KG, MIN_SPREAD_RATIO),
+                robust_scores(baseline.recycling_rates, rates, MIN_SPREAD_RATE),
+            )
+            for flow, score in zip(members, scores.tolist()):
+                if score >= THRESHOLD:
+                    flow.anomaly_detected = True
+                    flagged.append((flow, score))
+            baseline.quantities = (baseline.quantities + quantities)[-WINDOW:]
+            baseline.recycling_rates = (baseline.recycling_rates + rates)[-WINDOW:]
+            baseline.count += len(members)
+            baseline.updated_at = now
+        WasteFlowBaseline.objects.bulk_update(
+            baselines.values(), ['quantities', 'recycling_rates', 'count', 'updated_at'],
+        )
+        alerts.evaluate_flows(flagged, now)
+    return flagged
@@ -47,4 +47,7 @@ class SmartBinConfig(AppConfig):
             'icon': '⚙️',
             'permissions': ['view_settings', 'manage_settings']
         }
-    } 
\ No newline at end of file
+    }
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
@@ -0,0 +1,84 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+from rest_framework.response import Response
+
+
+class AsyncViewSetMixin:
+    """
+    À placer avant les autres classes de base. Sous ASGI
+    (``SMARTBIN_ASYNC_VIEWS``, activé par config/asgi.py), les actions de
+    ``async_actions`` sont servies par la méthode asynchrone ``a<action>``
+    de la vue : requêtes via l'ORM asynchrone, authentification,
+    permissions et sérialisation dans un thread. Les autres actions, et
+    toutes sous WSGI, passent par la vue DRF habituelle.
+    """
+
+    async_actions = ('list', 'retrieve')
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        handled = {
+            method: action for method, action in actions.items() if action in cls.async_actions
+        }
+        if not handled or not getattr(settings, 'SMARTBIN_ASYNC_VIEWS', False):
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            action = handled.get(request.method.lower())
+            if action is None:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            return await self.async_dispatch(request, actions, action, *args, **kwargs)
+
+        # cls, initkwargs, actions et csrf_exempt, lus par le routeur
+        async_view.__dict__.update(view.__dict__)
+        async_view.__name__ = view.__name__
+        async_view.__doc__ = view.__doc__
+        return async_view
+
+    async def async_dispatch(self, request, actions, action, *args, **kwargs):
+        # Équivalent de la vue de ViewSetMixin.as_view et d'APIView.dispatch
+        self.action_map = actions
+        for method, name in actions.items():
+            setattr(self, method, getattr(self, name))
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await getattr(self, f'a{action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def _filtered_queryset(self):
+        # get_queryset peut lire des relations de l'utilisateur : dans un thread
+        return self.filter_queryset(self.get_queryset())
+
+    async def aserialize(self, instance, many=False):
+        return await sync_to_async(lambda: self.get_serializer(instance, many=many).data)()
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self._filtered_queryset)()
+        if self.paginator is None:
+            return Response(await self.aserialize([item async for item in queryset], many=True))
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        return self.get_paginated_response(await self.aserialize(page, many=True))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self._filtered_queryset)()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        await sync_to_async(self.check_object_permissions)(request, instance)
+        return Response(await self.aserialize(instance))
@@ -0,0 +1,103 @@
+"""
+Changements d'état d'un bac (relevé, statut, collecte) sans lecture-
+modification-écriture de toute la ligne : chaque transition est un
+``UPDATE ... WHERE id = %s AND version = %s`` qui n'écrit que les colonnes
+modifiées. Si un autre changement est passé entre la lecture du bac et
+l'UPDATE, aucune ligne n'est modifiée : l'état est relu et la transition
+recalculée. Les relevés antérieurs au dernier relevé appliqué sont
+écartés (historisés, mais sans effet sur l'état du bac).
+"""
+
+import copy
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import alerts, dashboard, realtime
+from .models import SmartBin
+
+# Relectures tolérées avant d'abandonner une transition très disputée
+MAX_ATTEMPTS = 20
+# Colonnes relues après un conflit
+STATE_FIELDS = (
+    'zone', 'fill_level', 'battery_level', 'status', 'last_collection',
+    'last_reading_at', 'fill_level_since', 'version',
+)
+
+
+class ConcurrentUpdate(Exception):
+    pass
+
+
+def _transition(bin, changes, on_applied=None):
+    """
+    Applique ``changes(bin)`` -> {champ: valeur}, ou None si la transition
+    est sans objet dans l'état courant. ``on_applied(avant, après)`` est
+    appelé dans la même transaction. Retourne True si l'état a changé ;
+    SmartBin.DoesNotExist si le bac a été supprimé entre-temps.
+    """
+    for _ in range(MAX_ATTEMPTS):
+        values = changes(bin)
+        if values is None:
+            return False
+        with transaction.atomic():
+            updated = SmartBin.objects.filter(pk=bin.pk, version=bin.version).update(
+                **values, version=F('version') + 1, updated_at=timezone.now(),
+            )
+            if updated:
+                previous = copy.copy(bin)
+                for field, value in values.items():
+                    setattr(bin, field, value)
+                bin.version += 1
+                # Pas de signal post_save : compteurs et temps réel ici
+                if 'fill_level' in values:
+                    dashboard.fill_levels_changed([previous], {bin.pk: bin.fill_level})
+                realtime.bins_changed([bin])
+                if on_applied is not None:
+                    on_applied(previous, bin)
+                return True
+        bin.refresh_from_db(fields=STATE_FIELDS)
+    raise ConcurrentUpdate(f'Bac {bin.pk} modifié en continu, transition abandonnée')
+
+
+def apply_reading(bin, reading):
+    """
+    Applique un relevé ``telemetry.Reading`` s'il n'est pas antérieur au
+    dernier relevé appliqué. Les règles d'alerte sont évaluées sur l'état
+    du bac avant le relevé.
+    """
+    def changes(bin):
+        if bin.last_reading_at is not None and reading.ts < bin.last_reading_at:
+            return None
+        values = {'fill_level': reading.fill_level, 'last_reading_at': reading.ts}
+        if reading.battery_level is not None:
+            values['battery_level'] = reading.battery_level
+        if bin.fill_level != reading.fill_level or bin.fill_level_since is None:
+            values['fill_level_since'] = reading.ts
+        return values
+
+    applied = _transition(
+        bin, changes, lambda previous, bin: alerts.evaluate_readings([reading], {bin.pk: previous}),
+    )
+    if not applied:
+        # Relevé en retard : évalué avec l'historique, comme à l'ingestion
+        alerts.evaluate_readings([reading], {bin.pk: bin})
+    return applied
+
+
+def set_status(bin, status):
+    return _transition(bin, lambda bin: None if bin.status == status else {'status': status})
+
+
+def collect(bin, date):
+    """Bac vidé à ``date`` ; sans effet si une collecte plus récente est déjà enregistrée."""
+    def changes(bin):
+        if bin.last_collection is not None and date <= bin.last_collection:
+            return None
+        values = {'last_collection': date}
+        if bin.last_reading_at is None or date >= bin.last_reading_at:
+            values.update(fill_level=0, fill_level_since=date)
+        return values
+
+    return _transition(bin, changes)
@@ -0,0 +1,227 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import CenterStatistics, CenterStatisticsDirty, TriCenter, WasteFlow, Watermark
+
+WATERMARK_NAME = 'center_statistics'
+# Les flux enregistrés par une transaction encore ouverte au passage
+# précédent ont un updated_at antérieur au repère : on relit cette marge.
+OVERLAP = timedelta(minutes=10)
+BACKFILL_CHUNK_SIZE = 20
+STAT_FIELDS = ['total_received', 'total_recycled', 'collection_count']
+
+
+def month_start(value):
+    value = timezone.localtime(value) if isinstance(value, datetime) else value
+    return date(value.year, value.month, 1)
+
+
+def _month_bounds(period):
+    start = timezone.make_aware(datetime(period.year, period.month, 1))
+    end = timezone.make_aware(datetime(period.year + period.month // 12, period.month % 12 + 1, 1))
+    return start, end
+
+
+def _aggregates():
+    # Un flux rattaché à un bac correspond à une collecte déchargée au centre
+    return {
+        'total_received': Sum('quantity_kg'),
+        'total_recycled': Sum(F('quantity_kg') * F('recycling_rate') / 100.0),
+        'collection_count': Count('pk', filter=Q(smart_bin__isnull=False)),
+    }
+
+
+def mark_dirty(tri_center_id, processing_date):
+    CenterStatisticsDirty.objects.bulk_create(
+        [CenterStatisticsDirty(tri_center_id=tri_center_id, period=month_start(processing_date))],
+        ignore_conflicts=True,
+    )
+
+
+def remember_period(flow):
+    flow._statistics_period = (flow.__dict__.get('tri_center_id'), flow.__dict__.get('processing_date'))
+
+
+def flow_saved(flow, created):
+    """Un flux déplacé (centre ou mois) laisse son ancien mois à recalculer."""
+    tri_center_id, processing_date = flow._statistics_period
+    if not created and processing_date is not None and tri_center_id is not None and (
+        tri_center_id != flow.tri_center_id
+        or month_start(processing_date) != month_start(flow.processing_date)
+    ):
+        mark_dirty(tri_center_id, processing_date)
+    remember_period(flow)
+
+
+def flow_deleted(flow):
+    tri_center_id, processing_date = flow._statistics_period
+    if tri_center_id is not None and processing_date is not None:
+        mark_dirty(tri_center_id, processing_date)
+
+
+def _upsert(rows):
+    CenterStatistics.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['tri_center', 'period', 'period_type'],
+        update_fields=STAT_FIELDS,
+    )
+
+
+def _rebuild_years(pairs):
+    """Agrégats annuels recalculés à partir des lignes mensuelles."""
+    by_year = defaultdict(set)
+    for tri_center_id, year in pairs:
+        by_year[year].add(tri_center_id)
+    written = 0
+    for year, center_ids in by_year.items():
+        totals = {
+            row['tri_center_id']: row
+            for row in CenterStatistics.objects.filter(
+                period_type='monthly', tri_center_id__in=center_ids,
+                period__gte=date(year, 1, 1), period__lt=date(year + 1, 1, 1),
+            ).values('tri_center_id').annotate(**{name: Sum(name) for name in STAT_FIELDS}).order_by()
+        }
+        _upsert([
+            CenterStatistics(
+                tri_center_id=tri_center_id, period=date(year, 1, 1), period_type='yearly',
+                **{name: row[name] for name in STAT_FIELDS},
+            )
+            for tri_center_id, row in totals.items()
+        ])
+        CenterStatistics.objects.filter(
+            period_type='yearly', period=date(year, 1, 1),
+            tri_center_id__in=center_ids - set(totals),
+        ).delete()
+        written += len(totals)
+    return written
+
+
+def recompute_months(pairs):
+    """
+    Recalcule les agrégats mensuels des couples (centre, mois) puis ceux des
+    années concernées ; un mois sans flux perd sa ligne.
+    """
+    by_month = defaultdict(set)
+    for tri_center_id, period in pairs:
+        by_month[period].add(tri_center_id)
+    written = 0
+    for period, center_ids in by_month.items():
+        start, end = _month_bounds(period)
+        rows = (
+            WasteFlow.objects.filter(
+                tri_center_id__in=center_ids, processing_date__gte=start, processing_date__lt=end,
+            )
+            .values('tri_center_id').annotate(**_aggregates()).order_by()
+        )
+        stats = [
+            CenterStatistics(
+                tri_center_id=row['tri_center_id'], period=period, period_type='monthly',
+                **{name: row[name] for name in STAT_FIELDS},
+            )
+            for row in rows
+        ]
+        _upsert(stats)
+        CenterStatistics.objects.filter(
+            period_type='monthly', period=period,
+            tri_center_id__in=center_ids - {stat.tri_center_id for stat in stats},
+        ).delete()
+        written += len(stats)
+    return written + _rebuild_years({(center, period.year) for center, period in pairs})
+
+
+def get_watermark():
+    return Watermark.objects.filter(name=WATERMARK_NAME).values_list('value', flat=True).first()
+
+
+def rollup_pending(now=None):
+    """
+    Recalcule les mois touchés depuis le dernier passage : flux créés ou
+    modifiés (updated_at postérieur au repère, y compris les flux datés du
+    passé) et anciens mois des flux déplacés ou supprimés. Premier passage :
+    reconstruction complète.
+    """
+    now = now or timezone.now()
+    watermark = get_watermark()
+    if watermark is None:
+        written = backfill()
+        Watermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': now})
+        return written
+    with transaction.atomic():
+        pairs = set(
+            WasteFlow.objects.filter(updated_at__gte=watermark - OVERLAP, updated_at__lt=now)
+            .annotate(month=TruncMonth('processing_date'))
+            .values_list('tri_center_id', 'month').distinct().order_by()
+        )
+        pairs = {(center, month_start(month)) for center, month in pairs}
+        dirty = list(
+            CenterStatisticsDirty.objects.select_for_update(skip_locked=True)
+            .values_list('pk', 'tri_center_id', 'period')
+        )
+        pairs.update((center, period) for _, center, period in dirty)
+        written = recompute_months(pairs) if pairs else 0
+        CenterStatisticsDirty.objects.filter(pk__in=[pk for pk, *_ in dirty]).delete()
+        Watermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': now})
+    return written
+
+
+def _backfill_chunk(center_ids):
+    rows = (
+        WasteFlow.objects.filter(tri_center_id__in=center_ids)
+        .annotate(month=TruncMonth('processing_date'))
+        .values('tri_center_id', 'month').annotate(**_aggregates()).order_by()
+    )
+    monthly, yearly = [], {}
+    for row in rows:
+        period = month_start(row['month'])
+        monthly.append(CenterStatistics(
+            tri_center_id=row['tri_center_id'], period=period, period_type='monthly',
+            **{name: row[name] for name in STAT_FIELDS},
+        ))
+        year = yearly.setdefault(
+            (row['tri_center_id'], period.year), dict.fromkeys(STAT_FIELDS, 0)
+        )
+        for name in STAT_FIELDS:
+            year[name] += row[name] or 0
+    with transaction.atomic():
+        # Les périodes sans flux ne sont pas conservées
+        CenterStatistics.objects.filter(tri_center_id__in=center_ids).delete()
+        _upsert(monthly)
+        _upsert([
+            CenterStatistics(
+                tri_center_id=tri_center_id, period=date(year, 1, 1), period_type='yearly', **values,
+            )
+            for (tri_center_id, year), values in yearly.items()
+        ])
+    return len(monthly) + len(yearly)
+
+
+def _backfill_chunk_in_thread(center_ids):
+    try:
+        return _backfill_chunk(center_ids)
+    finally:
+        # Chaque thread ouvre sa propre connexion
+        connections.close_all()
+
+
+def backfill(tri_center_ids=None, workers=4, chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Reconstruit tout l'historique, par lots de centres de tri traités en
+    parallèle (une connexion par thread). Retourne le nombre de lignes écrites.
+    """
+    if tri_center_ids is None:
+        tri_center_ids = list(TriCenter.objects.order_by('pk').values_list('pk', flat=True))
+    chunks = [tri_center_ids[i:i + chunk_size] for i in range(0, len(tri_center_ids), chunk_size)]
+    if connection.vendor == 'sqlite' or workers <= 1:
+        # SQLite n'accepte qu'un écrivain à la fois
+        return sum(map(_backfill_chunk, chunks))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_backfill_chunk_in_thread, chunks))
+
@@ -0,0 +1,299 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateTimeField, F, Max, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Alert, Collection, CollectorActivity, CollectorBin, DashboardCounter,
+    SmartBin, Zone,
+)
+
+GLOBAL_KEY = 'global'
+COUNTERS = ('bin_count', 'fill_level_sum', 'collection_count', 'alert_count')
+
+# Valeurs lues en base, mémorisées à l'instanciation (signal post_init) pour
+# calculer les écarts au moment du save() ou du delete()
+TRACKED_FIELDS = {
+    SmartBin: ('zone_id', 'fill_level'),
+    Collection: ('bin_id', 'collector_id', 'date'),
+    Alert: ('bin_id',),
+}
+
+
+def zone_key(zone_id):
+    return f'zone:{zone_id}'
+
+
+def _increment(model, lookup, deltas, defaults=None):
+    """UPDATE ... SET champ = champ + delta, ou création de la ligne."""
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Ligne créée entre-temps par une autre transaction (ou zone supprimée)
+        model.objects.filter(**lookup).update(**updates)
+
+
+def apply_deltas(changes):
+    """
+    Applique ``{zone_id: {compteur: delta}}`` aux lignes des zones et à la
+    ligne globale, qui reçoit la somme de toutes les zones (``None`` compris).
+    """
+    total = Counter()
+    rows = {}
+    for zone_id, deltas in changes.items():
+        total.update(deltas)
+        if zone_id is not None:
+            rows[zone_key(zone_id)] = (zone_id, deltas)
+    rows[GLOBAL_KEY] = (None, total)
+    # Ordre constant des mises à jour pour éviter les interblocages
+    for key in sorted(rows):
+        zone_id, deltas = rows[key]
+        deltas = {name: value for name, value in deltas.items() if value}
+        if deltas:
+            _increment(DashboardCounter, {'key': key}, deltas, {'zone_id': zone_id})
+
+
+def remember_state(instance):
+    instance._dashboard_state = tuple(
+        instance.__dict__.get(field) for field in TRACKED_FIELDS[type(instance)]
+    )
+
+
+def _saved_state(instance, update_fields):
+    """État précédent et nouvel état des champs suivis après un save()."""
+    fields = TRACKED_FIELDS[type(instance)]
+    old = instance._dashboard_state
+    new = tuple(
+        getattr(instance, field)
+        if update_fields is None or field in update_fields or field.removesuffix('_id') in update_fields
+        else value
+        for field, value in zip(fields, old)
+    )
+    return old, new
+
+
+def _zone_of(bin_id):
+    return SmartBin.objects.filter(pk=bin_id).values_list('zone_id', flat=True).first()
+
+
+def zone_created(zone):
+    DashboardCounter.objects.get_or_create(key=zone_key(zone.pk), defaults={'zone': zone})
+
+
+def bin_saved(bin, created, update_fields):
+    if created:
+        apply_deltas({bin.zone_id: {'bin_count': 1, 'fill_level_sum': bin.fill_level}})
+        remember_state(bin)
+        return
+    (old_zone, old_fill), (zone_id, fill_level) = _saved_state(bin, update_fields)
+    if fill_level is None:
+        # Champ différé (.only(), .defer()) : chargé à la demande
+        fill_level = bin.fill_level
+    if old_fill is None:
+        old_fill = fill_level
+    if old_zone == zone_id:
+        apply_deltas({zone_id: {'fill_level_sum': fill_level - old_fill}})
+    else:
+        # Le bac change de zone avec ses collectes et ses alertes
+        moved = {
+            'bin_count': 1,
+            'collection_count': Collection.objects.filter(bin=bin).count(),
+            'alert_count': Alert.objects.filter(bin=bin).count(),
+        }
+        apply_deltas({
+            old_zone: {**{name: -value for name, value in moved.items()}, 'fill_level_sum': -old_fill},
+            zone_id: {**moved, 'fill_level_sum': fill_level},
+        })
+    remember_state(bin)
+
+
+def bin_deleted(bin):
+    zone_id, fill_level = bin._dashboard_state
+    apply_deltas({zone_id: {'bin_count': -1, 'fill_level_sum': -(fill_level or 0)}})
+
+
+def fill_levels_changed(bins, fill_levels):
+    """
+    Ingestion en masse (sans signaux) : ``bins`` sont les bacs tels que lus
+    en base, ``fill_levels`` leurs nouveaux niveaux ``{id: niveau}``.
+    """
+    changes = defaultdict(Counter)
+    for bin in bins:
+        changes[bin.zone_id]['fill_level_sum'] += fill_levels[bin.pk] - bin.fill_level
+    apply_deltas(changes)
+
+
+def _count_collection(bin_id, collector_id, date, sign):
+    apply_deltas({_zone_of(bin_id): {'collection_count': sign}})
+    if collector_id is None:
+        return
+    day = {'collector_id': collector_id, 'day': timezone.localdate(date)}
+    _increment(CollectorActivity, day, {'collection_count': sign})
+    if sign > 0:
+        lookup = {'collector_id': collector_id, 'bin_id': bin_id}
+        if not CollectorBin.objects.filter(**lookup).update(
+            last_collected_at=Greatest('last_collected_at', Value(date, output_field=DateTimeField()))
+        ):
+            try:
+                with transaction.atomic():
+                    CollectorBin.objects.create(**lookup, last_collected_at=date)
+            except IntegrityError:
+                pass
+    else:
+        CollectorActivity.objects.filter(**day, collection_count__lte=0).delete()
+        _refresh_collector_bin(collector_id, bin_id)
+
+
+def _refresh_collector_bin(collector_id, bin_id):
+    # Ne crée jamais de ligne : pendant la suppression en cascade d'un bac,
+    # elle référencerait un bac supprimé
+    lookup = {'collector_id': collector_id, 'bin_id': bin_id}
+    latest = Collection.objects.filter(**lookup).aggregate(latest=Max('date'))['latest']
+    if latest is None:
+        CollectorBin.objects.filter(**lookup).delete()
+    else:
+        CollectorBin.objects.filter(**lookup).update(last_collected_at=latest)
+
+
+def collection_saved(collection, created, update_fields):
+    if created:
+        _count_collection(collection.bin_id, collection.collector_id, collection.date, 1)
+    else:
+        old, new = _saved_state(collection, update_fields)
+        if old != new:
+            _count_collection(*old, -1)
+            _count_collection(*new, 1)
+    remember_state(collection)
+
+
+def collection_deleted(collection):
+    _count_collection(*collection._dashboard_state, -1)
+
+
+def alert_saved(alert, created, update_fields):
+    if created:
+        apply_deltas({_zone_of(alert.bin_id): {'alert_count': 1}})
+    else:
+        (old_bin,), (bin_id,) = _saved_state(alert, update_fields)
+        if old_bin != bin_id:
+            apply_deltas({_zone_of(old_bin): {'alert_count': -1}})
+            apply_deltas({_zone_of(bin_id): {'alert_count': 1}})
+    remember_state(alert)
+
+
+def alert_deleted(alert):
+    bin_id, = alert._dashboard_state
+    apply_deltas({_zone_of(bin_id): {'alert_count': -1}})
+
+
+def collector_summary(collector_id, today=None):
+    today = today or timezone.localdate()
+    weekly = CollectorActivity.objects.filter(
+        collector_id=collector_id, day__gte=today - timedelta(days=7)
+    ).aggregate(total=Sum('collection_count'))['total']
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=30), time.min))
+    bins = CollectorBin.objects.filter(
+        collector_id=collector_id, last_collected_at__gte=since
+    ).count()
+    return {'weekly_collections': weekly or 0, 'bins_collected': bins}
+
+
+def _expected_counters():
+    # Une ligne par zone, même vide
+    expected = defaultdict(Counter, {GLOBAL_KEY: Counter()})
+    for zone_id in Zone.objects.values_list('pk', flat=True):
+        expected[zone_key(zone_id)] = Counter()
+    sources = (
+        (SmartBin.objects.values('zone_id'),
+         {'bin_count': Count('pk'), 'fill_level_sum': Sum('fill_level')}),
+        (Collection.objects.values(zone_id=F('bin__zone_id')), {'collection_count': Count('pk')}),
+        (Alert.objects.values(zone_id=F('bin__zone_id')), {'alert_count': Count('pk')}),
+    )
+    for queryset, aggregates in sources:
+        for row in queryset.annotate(**aggregates).order_by():
+            values = {name: row[name] or 0 for name in aggregates}
+            expected[GLOBAL_KEY].update(values)
+            if row['zone_id'] is not None:
+                expected[zone_key(row['zone_id'])].update(values)
+    return expected
+
+
+def _reconcile_rows(model, key_fields, expected, value_fields, fix, drifts, label):
+    """
+    Compare ``expected`` ({clé: {champ: valeur}}) aux lignes de ``model`` ;
+    corrige les écarts si ``fix`` et les ajoute à ``drifts``.
+    """
+    stored = {tuple(getattr(row, field) for field in key_fields): row for row in model.objects.all()}
+    to_create, to_update = [], []
+    for key, values in expected.items():
+        row = stored.pop(key, None)
+        if row is None:
+            drifts.append((label, key, None, values))
+            to_create.append(model(**dict(zip(key_fields, key)), **values))
+            continue
+        current = {field: getattr(row, field) for field in value_fields}
+        if any(current[field] != values.get(field, 0) for field in value_fields):
+            drifts.append((label, key, current, values))
+            for field in value_fields:
+                setattr(row, field, values.get(field, 0))
+            to_update.append(row)
+    for key, row in stored.items():
+        drifts.append((label, key, {field: getattr(row, field) for field in value_fields}, None))
+    if fix:
+        model.objects.bulk_create(to_create, batch_size=1000)
+        model.objects.bulk_update(to_update, value_fields, batch_size=1000)
+        model.objects.filter(pk__in=[row.pk for row in stored.values()]).delete()
+
+
+def reconcile(fix=True):
+    """
+    Recalcule tous les compteurs depuis les tables sources et retourne les
+    écarts constatés ``(table, clé, stocké, recalculé)`` ; les corrige si
+    ``fix``. Les lignes de DashboardCounter sont verrouillées pendant le
+    recalcul : les écritures concurrentes attendent la fin de la correction
+    au lieu d'être écrasées.
+    """
+    drifts = []
+    with transaction.atomic():
+        list(DashboardCounter.objects.select_for_update().values_list('pk'))
+
+        expected = {
+            (key,): {**values, 'zone_id': None if key == GLOBAL_KEY else int(key.split(':')[1])}
+            for key, values in _expected_counters().items()
+        }
+        _reconcile_rows(DashboardCounter, ('key',), expected, COUNTERS + ('zone_id',), fix, drifts, 'compteurs')
+
+        activity = (
+            Collection.objects.filter(collector__isnull=False)
+            .annotate(day=TruncDate('date'))
+            .values('collector_id', 'day')
+            .annotate(collection_count=Count('pk'))
+            .order_by()
+        )
+        expected = {
+            (row['collector_id'], row['day']): {'collection_count': row['collection_count']}
+            for row in activity
+        }
+        _reconcile_rows(CollectorActivity, ('collector_id', 'day'), expected,
+                        ('collection_count',), fix, drifts, 'activité des collecteurs')
+
+        latest = (
+            Collection.objects.filter(collector__isnull=False)
+            .values('collector_id', 'bin_id')
+            .annotate(last_collected_at=Max('date'))
+            .order_by()
+        )
+        expected = {
+            (row['collector_id'], row['bin_id']): {'last_collected_at': row['last_collected_at']}
+            for row in latest
+        }
+        _reconcile_rows(CollectorBin, ('collector_id', 'bin_id'), expected,
+                        ('last_collected_at',), fix, drifts, 'bacs des collecteurs')
+    return drifts
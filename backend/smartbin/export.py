@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotAcceptable
+
+from .renderers import CSVRenderer, NDJSONRenderer, ParquetRenderer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # export Parquet optionnel
+    pa = pq = None
+
+# Lignes lues par aller-retour avec la base (curseur côté serveur sous
+# PostgreSQL) : seules ces lignes sont en mémoire à un instant donné.
+CHUNK_SIZE = getattr(settings, 'SMARTBIN_EXPORT_CHUNK_SIZE', 2000)
+# Taille des morceaux envoyés au client (CSV, NDJSON)
+FLUSH_BYTES = 64 * 1024
+# Lignes par groupe Parquet : un groupe est construit en mémoire avant
+# d'être écrit, c'est le plafond mémoire de ce format.
+PARQUET_ROW_GROUP_SIZE = getattr(settings, 'SMARTBIN_EXPORT_PARQUET_ROW_GROUP_SIZE', 50000)
+
+
+def _field(model, lookup):
+    """Champ désigné par ``lookup`` ; une clé étrangère vaut la clé visée."""
+    *path, last = lookup.split('__')
+    for name in path:
+        model = model._meta.get_field(name).related_model
+    field = model._meta.get_field(last)
+    return field.target_field if field.is_relation else field
+
+
+def _arrow_type(field):
+    if isinstance(field, (models.AutoField, models.BigAutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    return pa.string()
+
+
+def _text(value):
+    return value if value is None else str(value)
+
+
+def _iso(value):
+    return value if value is None else value.isoformat()
+
+
+def _converted(rows, converters):
+    """Applique ``{index: fonction}`` aux colonnes concernées uniquement."""
+    if not converters:
+        yield from rows
+        return
+    for row in rows:
+        row = list(row)
+        for index, convert in converters:
+            row[index] = convert(row[index])
+        yield row
+
+
+def _csv(rows, headers, fields):
+    converters = [
+        (index, _iso if isinstance(field, models.DateTimeField) else _text)
+        for index, field in enumerate(fields)
+        if isinstance(field, (models.DateTimeField, models.UUIDField))
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in _converted(rows, converters):
+        writer.writerow(row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _json_default(value):
+    # Horodatages complets (DjangoJSONEncoder tronque à la milliseconde)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson(rows, headers, fields):
+    encoder = json.JSONEncoder(ensure_ascii=False, default=_json_default)
+    lines = []
+    size = 0
+    for row in rows:
+        line = encoder.encode(dict(zip(headers, row)))
+        lines.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines, size = [], 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _Sink(io.RawIOBase):
+    """Fichier en écriture dont le contenu est vidé après chaque groupe."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet(rows, headers, fields):
+    schema = pa.schema([(header, _arrow_type(field)) for header, field in zip(headers, fields)])
+    converters = [
+        (index, _text) for index, field in enumerate(fields) if isinstance(field, models.UUIDField)
+    ]
+    rows = _converted(rows, converters)
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        while True:
+            group = list(islice(rows, PARQUET_ROW_GROUP_SIZE))
+            if not group:
+                break
+            columns = zip(*group)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            del group, columns
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', _csv),
+    'ndjson': ('application/x-ndjson', _ndjson),
+    'parquet': ('application/vnd.apache.parquet', _parquet),
+}
+
+
+def stream_export(queryset, columns, export_format, filename):
+    """
+    Réponse en flux des lignes de ``queryset`` : ``columns`` est une liste
+    de (en-tête, lookup). Les lignes sont lues en tuples (values_list), par
+    lots, sans instancier de modèles.
+    """
+    if export_format == 'parquet' and pq is None:
+        raise NotAcceptable("Export Parquet indisponible : pyarrow n'est pas installé.")
+    headers = [header for header, _ in columns]
+    fields = [_field(queryset.model, lookup) for _, lookup in columns]
+    selected = [
+        # Sous PostgreSQL, le texte des UUID est produit par la base :
+        # psycopg2 construirait sinon un objet UUID par valeur.
+        Cast(lookup, models.CharField())
+        if connection.vendor == 'postgresql' and isinstance(field, models.UUIDField) else lookup
+        for (_, lookup), field in zip(columns, fields)
+    ]
+    rows = queryset.values_list(*selected).iterator(chunk_size=CHUNK_SIZE)
+    content_type, writer = FORMATS[export_format]
+    body = writer(rows, headers, fields)
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}-{timezone.localdate():%Y%m%d}.{export_format}"'
+    )
+    return response
+
+
+class ExportMixin:
+    """
+    Action ``export`` : toutes les lignes filtrées (mêmes paramètres que la
+    liste, sans pagination) en CSV, NDJSON ou Parquet selon ``?format=``.
+    La vue définit ``export_columns``, ``export_ordering`` et ``export_name``.
+    """
+    export_columns = ()
+    export_ordering = ('pk',)
+    export_name = 'export'
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer, ParquetRenderer])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Les préchargements du sérialiseur sont inutiles pour values_list()
+        queryset = queryset.prefetch_related(None).order_by(*self.export_ordering)
+        return stream_export(queryset, self.export_columns, request.accepted_renderer.format, self.export_name)
@@ -0,0 +1,47 @@
+"""
+Remplissage des bacs : pourcentage (SmartBin.fill_level), tranche (vide,
+à moitié plein, plein, débordement) et volume, calculés par la base. Une
+tranche est un intervalle de fill_level : filtrer ou trier par
+remplissage reste une lecture de l'index du niveau.
+"""
+
+from django.db.models import Case, CharField, ExpressionWrapper, F, FloatField, Q, Value, When
+
+# (tranche, libellé, pourcentage minimal)
+BANDS = (
+    ('empty', 'Vide', 0),
+    ('half', 'À moitié plein', 25),
+    ('full', 'Plein', 75),
+    ('overflow', 'Débordement', 100),
+)
+BAND_CHOICES = tuple((band, label) for band, label, _ in BANDS)
+
+
+def band_range(band):
+    """(minimum inclus, maximum exclu ou None) du pourcentage de la tranche."""
+    for index, (name, _, low) in enumerate(BANDS):
+        if name == band:
+            high = BANDS[index + 1][2] if index + 1 < len(BANDS) else None
+            return low, high
+    raise ValueError(f'Tranche de remplissage inconnue : {band}')
+
+
+def band_filter(band, field='fill_level'):
+    low, high = band_range(band)
+    condition = Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lt': high})
+    return condition
+
+
+def band_expression(field='fill_level'):
+    return Case(
+        *(When(**{f'{field}__gte': low}, then=Value(band)) for band, _, low in reversed(BANDS[1:])),
+        default=Value(BANDS[0][0]),
+        output_field=CharField(),
+    )
+
+
+def volume_expression(field='fill_level'):
+    # Litres contenus, nul si la capacité du bac n'est pas renseignée
+    return ExpressionWrapper(F('capacity') * F(field) / 100.0, output_field=FloatField())
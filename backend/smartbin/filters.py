@@ -1,42 +1,99 @@
 import django_filters
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+from . import fill_state
+from .geo import within_bbox, within_radius
 from .models import (
     SmartBin, Collection, Alert, CollectionRoute,
     BinReport, TriCenter, WasteFlow, CenterStatistics,
     PaymentPlan, PaymentMethod, Subscription, Payment, Invoice
 )
 
-class SmartBinFilter(django_filters.FilterSet):
+class FloatCSVFilter(django_filters.BaseCSVFilter, django_filters.NumberFilter):
+    pass
+
+class GeoFilterSet(django_filters.FilterSet):
+    """
+    ``?near=lat,lng&radius=500`` (mètres) : lignes dans le cercle, annotées
+    de ``distance_m`` ; ``?bbox=min_lng,min_lat,max_lng,max_lat``.
+    """
+    DEFAULT_RADIUS_M = 500
+    MAX_RADIUS_M = 50000
+    lat_field = 'latitude'
+    lng_field = 'longitude'
+
+    near = FloatCSVFilter(method='filter_near')
+    radius = django_filters.NumberFilter(method='filter_radius')
+    bbox = FloatCSVFilter(method='filter_bbox')
+
+    def filter_near(self, queryset, name, value):
+        if len(value) != 2:
+            raise ValidationError({'near': ['Format attendu : lat,lng']})
+        lat, lng = (float(coordinate) for coordinate in value)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'near': ['Coordonnées hors limites']})
+        radius = self.form.cleaned_data.get('radius')
+        radius = self.DEFAULT_RADIUS_M if radius is None else float(radius)
+        if not 0 < radius <= self.MAX_RADIUS_M:
+            raise ValidationError({'radius': [f'Le rayon doit être compris entre 0 et {self.MAX_RADIUS_M} m']})
+        return within_radius(queryset, lat, lng, radius, self.lat_field, self.lng_field)
+
+    def filter_radius(self, queryset, name, value):
+        # Lu par filter_near
+        return queryset
+
+    def filter_bbox(self, queryset, name, value):
+        if len(value) != 4:
+            raise ValidationError({'bbox': ['Format attendu : min_lng,min_lat,max_lng,max_lat']})
+        min_lng, min_lat, max_lng, max_lat = (float(coordinate) for coordinate in value)
+        if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90
+                and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise ValidationError({'bbox': ['Coordonnées hors limites']})
+        # min_lng > max_lng : boîte franchissant l'antiméridien
+        if min_lat > max_lat:
+            raise ValidationError({'bbox': ['Boîte invalide']})
+        return within_bbox(queryset, min_lat, min_lng, max_lat, max_lng,
+                           self.lat_field, self.lng_field)
+
+class SmartBinFilter(GeoFilterSet):
     zone = django_filters.NumberFilter(field_name='zone')
     status = django_filters.ChoiceFilter(choices=SmartBin.STATUS_CHOICES)
     fill_level = django_filters.NumberFilter(method='filter_fill_level')
+    fill_band = django_filters.ChoiceFilter(choices=fill_state.BAND_CHOICES, method='filter_fill_band')
+    # Bacs dont le remplissage est prévu avant cette date
+    full_before = django_filters.IsoDateTimeFilter(
+        field_name='forecast__predicted_full_at', lookup_expr='lte'
+    )
 
     class Meta:
         model = SmartBin
-        fields = ['zone', 'status', 'fill_level']
+        fields = ['zone', 'status', 'fill_level', 'fill_band']
 
     def filter_fill_level(self, queryset, name, value):
         return queryset.filter(fill_level__gte=value)
 
+    def filter_fill_band(self, queryset, name, value):
+        return queryset.filter(fill_state.band_filter(value))
+
 class CollectionFilter(django_filters.FilterSet):
-    bin = django_filters.NumberFilter(field_name='bin')
+    bin = django_filters.CharFilter(field_name='bin')
     collector = django_filters.NumberFilter(field_name='collector')
-    status = django_filters.ChoiceFilter(choices=CollectionRoute.STATUS_CHOICES)
     date = django_filters.DateFromToRangeFilter()
 
     class Meta:
         model = Collection
-        fields = ['bin', 'collector', 'status', 'date']
+        fields = ['bin', 'collector', 'date']
 
 class AlertFilter(django_filters.FilterSet):
     bin = django_filters.NumberFilter(field_name='bin')
-    type = django_filters.ChoiceFilter(choices=Alert.SEVERITY_CHOICES)
-    # status = django_filters.ChoiceFilter(choices=Alert.STATUS_CHOICES)
+    type = django_filters.CharFilter()
+    severity = django_filters.ChoiceFilter(choices=Alert.SEVERITY_CHOICES)
+    is_resolved = django_filters.BooleanFilter()
     date = django_filters.DateFromToRangeFilter()
 
     class Meta:
         model = Alert
-        fields = ['bin', 'type', 'date']
+        fields = ['bin', 'type', 'severity', 'is_resolved', 'date']
 
 class CollectionRouteFilter(django_filters.FilterSet):
     collector = django_filters.NumberFilter(field_name='collector')
@@ -58,7 +115,10 @@ class BinReportFilter(django_filters.FilterSet):
         model = BinReport
         fields = ['bin', 'reporter', 'issue_type', 'status', 'date']
 
-class TriCenterFilter(django_filters.FilterSet):
+class TriCenterFilter(GeoFilterSet):
+    lat_field = 'gps_lat'
+    lng_field = 'gps_lng'
+
     name = django_filters.CharFilter(lookup_expr='icontains')
     total_capacity = django_filters.NumberFilter(method='filter_capacity')
     date_created = django_filters.DateFromToRangeFilter(field_name='created_at')
@@ -71,8 +131,8 @@ class TriCenterFilter(django_filters.FilterSet):
         return queryset.filter(total_capacity__gte=value)
 
 class WasteFlowFilter(django_filters.FilterSet):
-    tri_center = django_filters.NumberFilter(field_name='tri_center')
-    smart_bin = django_filters.NumberFilter(field_name='smart_bin')
+    tri_center = django_filters.UUIDFilter(field_name='tri_center')
+    smart_bin = django_filters.CharFilter(field_name='smart_bin')
     waste_type = django_filters.ChoiceFilter(choices=WasteFlow.WASTE_TYPES)
     processing_date = django_filters.DateFromToRangeFilter()
     recycling_rate = django_filters.NumberFilter(method='filter_recycling_rate')
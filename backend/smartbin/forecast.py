@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import BinForecast, BinReading, Collection, Job, SmartBin
+
+# Prévision du remplissage des bacs. Le niveau d'un bac est modélisé comme
+# linéaire par morceaux : une vitesse (points par heure) par jour de la
+# semaine, apprise sur les intervalles entre relevés successifs, une
+# collecte remettant le niveau à zéro. Les statistiques de chaque bac sont
+# conservées dans BinForecast et complétées à chaque passage avec les seuls
+# relevés nouveaux, avec un oubli exponentiel des anciens intervalles.
+
+FULL_LEVEL = getattr(settings, 'SMARTBIN_FORECAST_FULL_LEVEL', 90)
+HISTORY = timedelta(days=getattr(settings, 'SMARTBIN_FORECAST_HISTORY_DAYS', 28))
+HALF_LIFE_HOURS = getattr(settings, 'SMARTBIN_FORECAST_HALF_LIFE_DAYS', 14) * 24
+HORIZON_DAYS = getattr(settings, 'SMARTBIN_FORECAST_HORIZON_DAYS', 30)
+REFIT_DELAY = timedelta(seconds=getattr(settings, 'SMARTBIN_FORECAST_REFIT_DELAY_SECONDS', 60))
+# Intervalles écartés : trop longs pour être attribués à un jour, ou baisse
+# trop forte pour du bruit de capteur (vidage sans collecte enregistrée)
+MAX_INTERVAL_HOURS = 24
+MAX_NOISE_DROP = 15
+# Poids (en heures d'observation) de la vitesse moyenne du bac dans la
+# vitesse d'un jour peu observé
+PRIOR_HOURS = 24
+# Intervalles nécessaires pour une confiance pleine
+MIN_SAMPLES = 10
+CHUNK_SIZE = 2000
+DB_BATCH_SIZE = 1000
+
+STAT_FIELDS = ('hours', 'rise', 'rise_sq')
+
+
+def schedule_refit():
+    """
+    Programme un réajustement dans REFIT_DELAY, sauf s'il y en a déjà un en
+    file : les relevés arrivés entre-temps sont traités par le même passage.
+    """
+    def schedule():
+        if not Job.objects.filter(name='refit_forecasts', status='queued').exists():
+            enqueue('refit_forecasts', run_at=timezone.now() + REFIT_DELAY)
+    transaction.on_commit(schedule)
+
+
+def pending_bins(now=None):
+    """Bacs ayant un relevé ou une collecte postérieurs à leur dernier ajustement."""
+    now = now or timezone.now()
+    start = now - HISTORY
+    readings = SmartBin.objects.filter(last_reading_at__gte=start).filter(
+        Q(forecast__isnull=True) | Q(last_reading_at__gt=F('forecast__last_ts'))
+    ).values_list('pk', flat=True)
+    collections = Collection.objects.filter(date__gte=start, date__lte=now).filter(
+        Q(bin__forecast__isnull=True) | Q(date__gt=F('bin__forecast__last_ts'))
+    ).values_list('bin_id', flat=True)
+    return sorted(set(readings) | set(collections))
+
+
+def refit(bin_ids=None, now=None):
+    """
+    Réajuste les bacs donnés, ou ceux qui ont reçu des données depuis le
+    dernier passage. Retourne le nombre de bacs réajustés.
+    """
+    now = now or timezone.now()
+    if bin_ids is None:
+        bin_ids = pending_bins(now)
+    for start in range(0, len(bin_ids), CHUNK_SIZE):
+        with transaction.atomic():
+            _refit_chunk(bin_ids[start:start + CHUNK_SIZE], now)
+    return len(bin_ids)
+
+
+def _seconds(values):
+    return np.array([value.timestamp() for value in values], dtype=float)
+
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(seconds, dt_timezone.utc)
+
+
+def _local_days(seconds, offset):
+    # Jours écoulés depuis le 01/01/1970 (un jeudi) en heure locale
+    return np.floor((seconds + offset) / 86400)
+
+
+def _refit_chunk(bin_ids, now):
+    n = len(bin_ids)
+    index = {bin_id: position for position, bin_id in enumerate(bin_ids)}
+    start = now - HISTORY
+    now_s = now.timestamp()
+    offset = timezone.localtime(now).utcoffset().total_seconds()
+
+    stats = {name: np.zeros((n, 7)) for name in STAT_FIELDS}
+    samples = np.zeros(n)
+    anchor_t = np.full(n, np.nan)
+    anchor_level = np.zeros(n)
+    state = BinForecast.objects.filter(bin_id__in=bin_ids).values_list(
+        'bin_id', *STAT_FIELDS, 'samples', 'last_ts', 'last_level', 'fitted_at'
+    )
+    for bin_id, *values, count, last_ts, last_level, fitted_at in state:
+        position = index[bin_id]
+        # Oubli des statistiques depuis le dernier ajustement
+        decay = 0.5 ** ((now - fitted_at).total_seconds() / 3600 / HALF_LIFE_HOURS)
+        for name, value in zip(STAT_FIELDS, values):
+            if value:
+                stats[name][position] = np.array(value) * decay
+        samples[position] = count * decay
+        if last_ts is not None:
+            anchor_t[position] = last_ts.timestamp()
+            anchor_level[position] = last_level
+
+    # Points nouveaux : relevés, collectes (niveau 0) et point d'ancrage de
+    # chaque bac (dernier point déjà intégré)
+    newer = Q(bin__forecast__isnull=True) | Q(ts__gt=F('bin__forecast__last_ts'))
+    readings = list(
+        BinReading.objects.filter(bin_id__in=bin_ids, ts__gte=start).filter(newer)
+        .values_list('bin_id', 'ts', 'fill_level')
+    )
+    collections = list(
+        Collection.objects.filter(bin_id__in=bin_ids, date__gte=start, date__lte=now)
+        .filter(Q(bin__forecast__isnull=True) | Q(date__gt=F('bin__forecast__last_ts')))
+        .values_list('bin_id', 'date')
+    )
+    anchored = np.flatnonzero(~np.isnan(anchor_t))
+    bins = np.concatenate([
+        np.array([index[row[0]] for row in readings], dtype=np.int64),
+        np.array([index[row[0]] for row in collections], dtype=np.int64),
+        anchored,
+    ])
+    times = np.concatenate([
+        _seconds(row[1] for row in readings),
+        _seconds(row[1] for row in collections),
+        anchor_t[anchored],
+    ])
+    levels = np.concatenate([
+        np.array([row[2] for row in readings], dtype=float),
+        np.zeros(len(collections)),
+        anchor_level[anchored],
+    ])
+    resets = np.concatenate([
+        np.zeros(len(readings), dtype=bool),
+        np.ones(len(collections), dtype=bool),
+        np.zeros(len(anchored), dtype=bool),
+    ])
+    # Par bac puis par date ; à date égale, la collecte avant le relevé
+    order = np.lexsort((~resets, times, bins))
+    bins, times, levels, resets = bins[order], times[order], levels[order], resets[order]
+
+    if len(bins):
+        # Intervalles entre points successifs d'un même bac ; celui qui
+        # aboutit à une collecte n'est pas une hausse observée
+        dt = np.diff(times) / 3600
+        rise = np.diff(levels)
+        valid = (
+            (bins[1:] == bins[:-1]) & ~resets[1:] & (dt > 0)
+            & (dt <= MAX_INTERVAL_HOURS) & (rise >= -MAX_NOISE_DROP)
+        )
+        owner = bins[1:][valid]
+        dt, rise = dt[valid], rise[valid]
+        middle = (times[1:][valid] + times[:-1][valid]) / 2
+        weight = 0.5 ** ((now_s - middle) / 3600 / HALF_LIFE_HOURS)
+        cell = owner * 7 + (_local_days(middle, offset).astype(np.int64) + 3) % 7
+        for name, values in (('hours', dt), ('rise', rise), ('rise_sq', rise ** 2 / dt)):
+            stats[name] += np.bincount(cell, weight * values, minlength=n * 7).reshape(n, 7)
+        samples += np.bincount(owner, weight, minlength=n)
+        # Nouveau point d'ancrage : dernier point de chaque bac
+        last = np.flatnonzero(np.r_[bins[1:] != bins[:-1], True])
+        anchor_t[bins[last]] = times[last]
+        anchor_level[bins[last]] = levels[last]
+
+    rates, base, confidence_factors = _rates(stats, samples)
+    hours_ahead = _hours_to_full(anchor_t, anchor_level, rates, offset)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Erreur relative sur la date : bruit accumulé jusqu'au remplissage
+        # et incertitude sur la vitesse elle-même
+        spread = confidence_factors * np.sqrt(1 / np.maximum(hours_ahead, 1) + 1 / stats['hours'].sum(1))
+    confidence = np.nan_to_num(np.minimum(1, samples / MIN_SAMPLES) / (1 + spread))
+
+    forecasts = []
+    for bin_id, position in index.items():
+        known = not np.isnan(anchor_t[position])
+        predicted = not np.isnan(hours_ahead[position])
+        forecasts.append(BinForecast(
+            bin_id=bin_id,
+            **{name: stats[name][position].round(4).tolist() for name in STAT_FIELDS},
+            samples=float(samples[position]),
+            last_ts=_datetime(anchor_t[position]) if known else None,
+            last_level=int(anchor_level[position]) if known else None,
+            rate=None if np.isnan(base[position]) else round(float(base[position]), 4),
+            predicted_full_at=(
+                _datetime(anchor_t[position] + hours_ahead[position] * 3600) if predicted else None
+            ),
+            confidence=round(float(confidence[position]), 3) if predicted else None,
+            fitted_at=now,
+        ))
+    BinForecast.objects.bulk_create(
+        forecasts,
+        batch_size=DB_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['bin'],
+        update_fields=[*STAT_FIELDS, 'samples', 'last_ts', 'last_level', 'rate',
+                       'predicted_full_at', 'confidence', 'fitted_at'],
+    )
+
+
+def _rates(stats, samples):
+    """
+    Vitesse par jour de la semaine, ramenée vers la vitesse moyenne du bac
+    quand le jour est peu observé, et écart type relatif du bruit autour du
+    modèle (moindres carrés pondérés par la durée des intervalles).
+    """
+    hours, rise, rise_sq = stats['hours'], stats['rise'], stats['rise_sq']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base = np.where(hours.sum(1) > 0, rise.sum(1) / hours.sum(1), np.nan)
+        rates = np.maximum((rise + PRIOR_HOURS * base[:, None]) / (hours + PRIOR_HOURS), 0)
+        residual = np.maximum((rise_sq - 2 * rates * rise + rates ** 2 * hours).sum(1), 0)
+        sigma = np.sqrt(residual / samples)
+        relative = np.where(base > 0, sigma / base, np.inf)
+    return rates, base, relative
+
+
+def _hours_to_full(anchor_t, anchor_level, rates, offset):
+    """
+    Heures entre le point d'ancrage et FULL_LEVEL en suivant la vitesse de
+    chaque jour, NaN au-delà de HORIZON_DAYS ou sans vitesse connue.
+    """
+    n = len(anchor_t)
+    rows = np.arange(n)
+    known = ~np.isnan(anchor_t)
+    start = np.where(known, anchor_t, 0) + offset
+    day = np.floor(start / 86400)
+    # Premier segment jusqu'à minuit, puis des journées entières
+    lengths = np.full((n, HORIZON_DAYS + 1), 24.0)
+    lengths[:, 0] = ((day + 1) * 86400 - start) / 3600
+    weekdays = (day.astype(np.int64)[:, None] + 3 + np.arange(HORIZON_DAYS + 1)) % 7
+    segment_rates = np.take_along_axis(rates, weekdays, 1)
+    gains = lengths * segment_rates
+    reached = np.cumsum(gains, 1)
+    remaining = FULL_LEVEL - anchor_level
+    hit = reached >= remaining[:, None]
+    found = known & hit.any(1)
+    segment = hit.argmax(1)
+    elapsed = np.cumsum(lengths, 1) - lengths
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hours = (
+            elapsed[rows, segment]
+            + (remaining - (reached - gains)[rows, segment]) / segment_rates[rows, segment]
+        )
+    hours = np.where(remaining <= 0, 0, hours)
+    return np.where(found | (known & (remaining <= 0)), hours, np.nan)
@@ -0,0 +1,211 @@
+import math
+
+from django.db.models import F, FloatField, Func, Q
+
+# Les géohashs sont stockés à 12 caractères (précision infra-métrique) ; les
+# recherches portent sur des préfixes plus courts.
+GEOHASH_PRECISION = 12
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Nombre maximal de cellules couvrant la zone recherchée : la précision
+# retenue est la plus fine qui reste sous cette limite.
+MAX_CELLS = 32
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+# Borne de la recherche du plus proche voisin (demi-circonférence terrestre)
+MAX_SEARCH_RADIUS_M = math.pi * EARTH_RADIUS_M
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, interval = (lng, lng_range) if even else (lat, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            interval[0] = middle
+        else:
+            bits *= 2
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def set_geohash(instance, lat_field, lng_field, update_fields=None):
+    """
+    Recalcule ``instance.geohash`` avant un save() ; retourne les
+    ``update_fields`` à utiliser (complétés du géohash si besoin).
+    """
+    if update_fields is not None:
+        update_fields = set(update_fields)
+        if not update_fields & {lat_field, lng_field}:
+            return update_fields
+        update_fields.add('geohash')
+    instance.geohash = encode(getattr(instance, lat_field), getattr(instance, lng_field))
+    return update_fields
+
+
+def cell_size(precision):
+    """(hauteur, largeur) en degrés d'une cellule de ``precision`` caractères."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _next_cell(cell):
+    """Cellule suivante dans l'ordre lexicographique, None après la dernière."""
+    chars = list(cell)
+    for position in range(len(chars) - 1, -1, -1):
+        index = BASE32.index(chars[position])
+        if index < len(BASE32) - 1:
+            chars[position] = BASE32[index + 1]
+            return ''.join(chars[:position + 1])
+        chars[position] = BASE32[0]
+    return None
+
+
+def covering_ranges(min_lat, min_lng, max_lat, max_lng):
+    """
+    Intervalles [début, fin) de géohashs couvrant la boîte, cellules
+    contiguës fusionnées. ``fin`` vaut None pour la toute dernière cellule.
+    """
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        first_row = int((min_lat + 90) // height)
+        last_row = min(int((max_lat + 90) // height), int(180 // height) - 1)
+        first_col = int((min_lng + 180) // width)
+        last_col = min(int((max_lng + 180) // width), int(360 // width) - 1)
+        if (last_row - first_row + 1) * (last_col - first_col + 1) <= MAX_CELLS:
+            break
+    cells = sorted({
+        encode(-90 + (row + 0.5) * height, -180 + (col + 0.5) * width, precision)
+        for row in range(first_row, last_row + 1)
+        for col in range(first_col, last_col + 1)
+    })
+    ranges = []
+    for cell in cells:
+        end = _next_cell(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = end
+        else:
+            ranges.append([cell, end])
+    return [tuple(bounds) for bounds in ranges]
+
+
+def geohash_q(ranges, field='geohash'):
+    condition = Q()
+    for start, end in ranges:
+        bounds = {f'{field}__gte': start}
+        if end is not None:
+            bounds[f'{field}__lt'] = end
+        condition |= Q(**bounds)
+    return condition
+
+
+def radius_bbox(lat, lng, radius_m):
+    """
+    Boîte (min_lat, min_lng, max_lat, max_lng) contenant le cercle ;
+    min_lng > max_lng si elle franchit l'antiméridien.
+    """
+    delta_lat = radius_m / METERS_PER_DEGREE
+    # Le cercle est le plus large (en degrés) du côté du pôle
+    cos_lat = math.cos(math.radians(min(abs(lat) + delta_lat, 90.0)))
+    if cos_lat < 1e-6:
+        delta_lng = 180.0
+    else:
+        delta_lng = min(radius_m / (METERS_PER_DEGREE * cos_lat), 180.0)
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if delta_lng >= 180.0:
+        min_lng, max_lng = -180.0, 180.0
+    elif min_lng < -180.0:
+        min_lng += 360.0
+    elif max_lng > 180.0:
+        max_lng -= 360.0
+    return lat - delta_lat, min_lng, lat + delta_lat, max_lng
+
+
+class HaversineDistance(Func):
+    """
+    Distance haversine (m) entre un point fixe et deux colonnes. Le SQL est
+    écrit d'un bloc : un arbre d'expressions Django équivalent coûte plus à
+    compiler que la requête elle-même à exécuter.
+    """
+    output_field = FloatField()
+
+    def __init__(self, lat, lng, lat_field, lng_field):
+        super().__init__(F(lat_field), F(lng_field))
+        self.origin = (lat, lng)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        lat_sql, lat_params = compiler.compile(self.source_expressions[0])
+        lng_sql, lng_params = compiler.compile(self.source_expressions[1])
+        # Les arrondis peuvent dépasser 1, hors du domaine de ASIN
+        least = 'MIN' if connection.vendor == 'sqlite' else 'LEAST'
+        sql = (
+            f'(%s * ASIN(SQRT({least}(1.0, '
+            f'POWER(SIN((RADIANS({lat_sql}) - %s) / 2), 2) '
+            f'+ %s * COS(RADIANS({lat_sql})) * POWER(SIN((RADIANS({lng_sql}) - %s) / 2), 2)))))'
+        )
+        lat, lng = self.origin
+        params = [
+            2 * EARTH_RADIUS_M, *lat_params, math.radians(lat),
+            math.cos(math.radians(lat)), *lat_params, *lng_params, math.radians(lng),
+        ]
+        return sql, params
+
+
+def within_bbox(queryset, min_lat, min_lng, max_lat, max_lng,
+                lat_field='latitude', lng_field='longitude'):
+    """
+    Préfiltre indexé sur les géohashs puis bornes exactes de la boîte. Une
+    boîte qui franchit l'antiméridien (min_lng > max_lng) est couverte par
+    ses deux parties, de min_lng à 180° et de -180° à max_lng.
+    """
+    if min_lng <= max_lng:
+        ranges = covering_ranges(min_lat, min_lng, max_lat, max_lng)
+        longitude = Q(**{f'{lng_field}__gte': min_lng, f'{lng_field}__lte': max_lng})
+    else:
+        ranges = (
+            covering_ranges(min_lat, min_lng, max_lat, 180.0)
+            + covering_ranges(min_lat, -180.0, max_lat, max_lng)
+        )
+        longitude = Q(**{f'{lng_field}__gte': min_lng}) | Q(**{f'{lng_field}__lte': max_lng})
+    return queryset.filter(
+        geohash_q(ranges), longitude,
+        **{f'{lat_field}__gte': min_lat, f'{lat_field}__lte': max_lat},
+    )
+
+
+def within_radius(queryset, lat, lng, radius_m,
+                  lat_field='latitude', lng_field='longitude'):
+    """Lignes à moins de ``radius_m`` mètres, annotées de ``distance_m``."""
+    queryset = within_bbox(queryset, *radius_bbox(lat, lng, radius_m),
+                           lat_field=lat_field, lng_field=lng_field)
+    return queryset.annotate(
+        distance_m=HaversineDistance(lat, lng, lat_field, lng_field)
+    ).filter(distance_m__lte=radius_m)
+
+
+def nearest(queryset, lat, lng, limit=1, lat_field='latitude', lng_field='longitude',
+            start_radius_m=1000):
+    """
+    Les ``limit`` lignes les plus proches, par rayons croissants : dès que
+    le cercle en contient ``limit``, aucune ligne extérieure n'est plus proche.
+    """
+    radius = start_radius_m
+    while True:
+        found = list(
+            within_radius(queryset, lat, lng, radius, lat_field, lng_field)
+            .order_by('distance_m')[:limit]
+        )
+        if len(found) >= limit or radius >= MAX_SEARCH_RADIUS_M:
+            return found
+        radius = min(radius * 8, MAX_SEARCH_RADIUS_M)
@@ -0,0 +1,306 @@
+import csv
+import hashlib
+import io
+import logging
+import math
+from datetime import date, datetime, time, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .anomalies import screen_flows
+from .jobs import enqueue
+from .models import SmartBin, TriCenter, WasteFlow, WasteFlowImport
+
+try:
+    import openpyxl
+except ImportError:  # import XLSX optionnel
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+# Lignes validées puis insérées par lot (une requête de dédoublonnage, un
+# INSERT et une mise à jour de la progression par lot)
+BATCH_SIZE = getattr(settings, 'SMARTBIN_IMPORT_BATCH_SIZE', 1000)
+# Erreurs conservées sur l'import ; les suivantes sont seulement comptées
+MAX_ERRORS = 500
+
+FORMATS = {'.csv': 'csv', '.txt': 'csv', '.xlsx': 'xlsx'}
+REQUIRED_COLUMNS = ('processing_date', 'waste_type', 'quantity_kg', 'recycling_rate')
+TRUE_VALUES = {'1', 'true', 'vrai', 'oui', 'yes', 'x'}
+FALSE_VALUES = {'', '0', 'false', 'faux', 'non', 'no'}
+# Codes et libellés acceptés pour waste_type
+WASTE_TYPES = {
+    name.casefold(): code for code, label in WasteFlow.WASTE_TYPES for name in (code, label)
+}
+
+
+def file_format(name):
+    for extension, kind in FORMATS.items():
+        if name.lower().endswith(extension):
+            return kind
+    return None
+
+
+def _header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    # Séparateur le plus fréquent de l'en-tête : les exports Excel français
+    # utilisent le point-virgule (et la virgule décimale dans les lignes)
+    first_line = text.readline()
+    text.seek(0)
+    delimiter = max(',;\t', key=first_line.count)
+    reader = csv.reader(text, delimiter=delimiter)
+    headers = [_header(value) for value in next(reader, [])]
+    return headers, (dict(zip(headers, row)) for row in reader if any(row))
+
+
+def _csv_line_count(file):
+    count = 0
+    for chunk in iter(lambda: file.read(1024 * 1024), b''):
+        count += chunk.count(b'\n')
+    file.seek(0)
+    return count
+
+
+def _xlsx_rows(file):
+    # read_only : les lignes sont lues au fil de l'eau, sans charger la feuille
+    sheet = openpyxl.load_workbook(file, read_only=True, data_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    headers = [_header(value) for value in next(rows, ())]
+    return headers, (
+        dict(zip(headers, row)) for row in rows
+        if any(value not in (None, '') for value in row)
+    ), sheet.max_row
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Identifiants numériques lus dans une cellule XLSX
+        value = int(value)
+    return str(value).strip()
+
+
+def _number(row, field, errors, low=0, high=None):
+    value = row.get(field)
+    if value in (None, ''):
+        errors[field] = ['Ce champ est requis.']
+        return None
+    try:
+        number = float(value.replace(',', '.') if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number):
+        errors[field] = ['Un nombre est requis.']
+        return None
+    if number < low:
+        errors[field] = ['La valeur doit être positive.']
+        return None
+    if high is not None and number > high:
+        errors[field] = [f'La valeur doit être comprise entre {low} et {high}.']
+        return None
+    return number
+
+
+def _processing_date(value, errors):
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime.combine(value, time.min)
+    else:
+        value = _text(value)
+        if not value:
+            errors['processing_date'] = ['Ce champ est requis.']
+            return None
+        try:
+            moment = parse_datetime(value)
+            if moment is None and parse_date(value) is not None:
+                moment = datetime.combine(parse_date(value), time.min)
+        except ValueError:
+            moment = None
+        if moment is None:
+            errors['processing_date'] = ['Date invalide (ISO 8601 attendu).']
+            return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _boolean(value, errors):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = _text(value).casefold()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    errors['anomaly_detected'] = ['Valeur booléenne attendue (oui/non, 1/0).']
+    return None
+
+
+def import_key(flow, ticket):
+    """
+    Clé naturelle d'une pesée : le numéro de ticket du pont-bascule s'il est
+    fourni, sinon le centre, le bac, la date, le type et les quantités.
+    """
+    if ticket:
+        parts = (str(flow.tri_center_id), 'ticket', ticket)
+    else:
+        parts = (
+            str(flow.tri_center_id), flow.smart_bin_id or '',
+            flow.processing_date.astimezone(dt_timezone.utc).isoformat(),
+            flow.waste_type, repr(flow.quantity_kg), repr(flow.recycling_rate),
+        )
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def parse_flow(row, centers, bins, default_center_id=None):
+    """
+    Valide une ligne ; retourne ``(WasteFlow, None)`` ou ``(None, erreurs)``.
+    ``centers`` associe identifiants et noms (en minuscules) des centres à
+    leur clé, ``bins`` est l'ensemble des identifiants de bacs.
+    """
+    errors = {}
+    center = _text(row.get('tri_center'))
+    if center:
+        center_id = centers.get(center) or centers.get(center.casefold())
+        if center_id is None:
+            errors['tri_center'] = ['Centre de tri inconnu.']
+    else:
+        center_id = default_center_id
+        if center_id is None:
+            errors['tri_center'] = ['Ce champ est requis.']
+    bin_id = _text(row.get('smart_bin')) or None
+    if bin_id is not None and bin_id not in bins:
+        errors['smart_bin'] = ['Bac inconnu.']
+    processing_date = _processing_date(row.get('processing_date'), errors)
+    waste_type = WASTE_TYPES.get(_text(row.get('waste_type')).casefold())
+    if waste_type is None:
+        errors['waste_type'] = ['Type de déchet inconnu.']
+    quantity = _number(row, 'quantity_kg', errors)
+    rate = _number(row, 'recycling_rate', errors, high=100)
+    anomaly = _boolean(row.get('anomaly_detected'), errors)
+    if errors:
+        return None, errors
+    flow = WasteFlow(
+        tri_center_id=center_id,
+        smart_bin_id=bin_id,
+        processing_date=processing_date,
+        waste_type=waste_type,
+        quantity_kg=quantity,
+        recycling_rate=rate,
+        anomaly_detected=anomaly,
+        comment=_text(row.get('comment')),
+    )
+    flow.import_key = import_key(flow, _text(row.get('ticket')))
+    return flow, None
+
+
+def _lookups():
+    """Centres et bacs chargés une fois pour tout le fichier."""
+    centers = {}
+    for pk, name in TriCenter.objects.values_list('pk', 'name'):
+        centers.setdefault(name.strip().casefold(), pk)
+        centers[str(pk)] = pk
+    bins = set(SmartBin.objects.values_list('pk', flat=True))
+    return centers, bins
+
+
+def _insert(job, flows, seen):
+    """Insère les flux du lot absents de la base et du début du fichier."""
+    batch = {}
+    for flow in flows:
+        if flow.import_key not in seen and flow.import_key not in batch:
+            batch[flow.import_key] = flow
+    existing = set(
+        WasteFlow.objects.filter(import_key__in=list(batch)).values_list('import_key', flat=True)
+    )
+    new = [flow for key, flow in batch.items() if key not in existing]
+    # Jugées dans l'ordre du fichier, avant insertion
+    screen_flows(new)
+    # Pas de signaux : les statistiques des centres suivent updated_at,
+    # renseigné par bulk_create (voir center_statistics.py)
+    WasteFlow.objects.bulk_create(new, ignore_conflicts=True)
+    seen.update(batch)
+    job.created_count += len(new)
+    job.duplicate_count += len(flows) - len(new)
+
+
+def _process(job, headers, rows):
+    missing = [
+        name for name in REQUIRED_COLUMNS + (() if job.tri_center_id else ('tri_center',))
+        if name not in headers
+    ]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+    centers, bins = _lookups()
+    # Clés déjà vues dans le fichier (dizaines de milliers de lignes au plus)
+    seen = set()
+    # La ligne 1 est l'en-tête
+    numbered = enumerate(rows, start=2)
+    while True:
+        batch = list(islice(numbered, BATCH_SIZE))
+        if not batch:
+            break
+        flows = []
+        for line, row in batch:
+            flow, errors = parse_flow(row, centers, bins, job.tri_center_id)
+            if errors:
+                job.error_count += 1
+                if len(job.errors) < MAX_ERRORS:
+                    job.errors.append({'row': line, 'errors': errors})
+            else:
+                flows.append(flow)
+        with transaction.atomic():
+            _insert(job, flows, seen)
+            job.processed_rows += len(batch)
+            job.save(update_fields=[
+                'processed_rows', 'created_count', 'duplicate_count', 'error_count', 'errors',
+            ])
+
+
+def run_import(job_id):
+    """
+    Traite un import en attente : lecture en flux du fichier, validation
+    ligne par ligne et insertion par lots. Sans effet si l'import a déjà été
+    pris en charge.
+    """
+    if not WasteFlowImport.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    ):
+        return None
+    job = WasteFlowImport.objects.get(pk=job_id)
+    try:
+        with job.file.open('rb') as upload:
+            file = upload.file
+            if file_format(job.file_name) == 'xlsx':
+                headers, rows, max_row = _xlsx_rows(file)
+                job.total_rows = max_row - 1 if max_row else None
+            else:
+                job.total_rows = max(_csv_line_count(file) - 1, 0)
+                headers, rows = _csv_rows(file)
+            job.save(update_fields=['total_rows'])
+            _process(job, headers, rows)
+    except Exception as exc:
+        logger.exception("Échec de l'import %s", job.pk)
+        job.status = 'failed'
+        job.message = str(exc)
+    else:
+        job.status = 'done'
+        job.total_rows = job.processed_rows
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'total_rows', 'finished_at'])
+    return job
+
+
+def start_import(job):
+    """Confie le traitement aux workers (``runworkers``)."""
+    return enqueue('import_waste_flows', {'import_id': str(job.pk)}, created_by=job.created_by)
@@ -0,0 +1,426 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject, empty
+
+from . import realtime
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # profils pyinstrument optionnels, cProfile sinon
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+# Mesures par requête (durée, requêtes SQL, sérialisation, taille de la
+# réponse), agrégées par route, méthode et rôle dans un registre propre au
+# processus. Chaque processus publie périodiquement son registre dans le
+# cache partagé : /metrics expose ceux de tous les workers, distingués par
+# le label ``worker`` (les séries d'un worker arrêté disparaissent à
+# l'expiration de sa publication). Avec le cache local par défaut, /metrics
+# ne voit que le processus qui répond.
+ENABLED = getattr(settings, 'SMARTBIN_INSTRUMENTATION', True)
+SLOW_REQUEST_MS = getattr(settings, 'SMARTBIN_SLOW_REQUEST_MS', 500)
+# Part des requêtes dont le SQL est conservé pour le journal des requêtes lentes
+SLOW_REQUEST_SAMPLE_RATE = getattr(settings, 'SMARTBIN_SLOW_REQUEST_SAMPLE_RATE', 0.1)
+PUBLISH_INTERVAL = getattr(settings, 'SMARTBIN_METRICS_PUBLISH_INTERVAL', 10)
+PUBLISH_TIMEOUT = getattr(settings, 'SMARTBIN_METRICS_PUBLISH_TIMEOUT', 300)
+PROFILE_LIMIT = getattr(settings, 'SMARTBIN_PROFILE_LIMIT', 60)
+CACHE_ALIAS = getattr(settings, 'SMARTBIN_METRICS_CACHE_ALIAS', 'default')
+
+CACHE_PREFIX = 'smartbin:metrics'
+WORKER = f'{socket.gethostname()}:{os.getpid()}'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Requêtes SQL conservées par requête échantillonnée
+MAX_RECORDED_QUERIES = 1000
+
+_current = ContextVar('smartbin_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'db_time', 'serializer_time', 'serializing', 'sql')
+
+    def __init__(self, sampled=False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        # (durée, SQL) des requêtes, si la requête est échantillonnée
+        self.sql = [] if sampled else None
+
+
+def record_query(execute, sql, params, many, context):
+    """Wrapper d'exécution installé sur chaque connexion (voir signals.py)."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.sql is not None and len(stats.sql) < MAX_RECORDED_QUERIES:
+            stats.sql.append((elapsed, sql))
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """Temps de sérialisation compté dans les mesures de la requête en cours."""
+
+    def to_representation(self, instance):
+        stats = _current.get()
+        if stats is None or stats.serializing:
+            # Hors requête, ou sérialiseur imbriqué déjà compté
+            return super().to_representation(instance)
+        stats.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_time += time.perf_counter() - start
+            stats.serializing = False
+
+
+def _bucket(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (route, méthode, rôle, statut) -> nombre de requêtes
+        self.requests = Counter()
+        # (route, méthode, rôle) -> [compteurs des histogrammes, sommes]
+        self.series = {}
+        self.published_at = 0.0
+
+    def record(self, labels, status, duration, stats, size):
+        """Enregistre une requête ; vrai si le registre doit être publié."""
+        with self.lock:
+            self.requests[(*labels, status)] += 1
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {
+                    'duration': [0] * (len(DURATION_BUCKETS) + 1),
+                    'queries': [0] * (len(QUERY_BUCKETS) + 1),
+                    'count': 0, 'duration_sum': 0.0, 'queries_sum': 0,
+                    'db_seconds': 0.0, 'serializer_seconds': 0.0, 'response_bytes': 0,
+                }
+            series['duration'][_bucket(DURATION_BUCKETS, duration)] += 1
+            series['queries'][_bucket(QUERY_BUCKETS, stats.queries)] += 1
+            series['count'] += 1
+            series['duration_sum'] += duration
+            series['queries_sum'] += stats.queries
+            series['db_seconds'] += stats.db_time
+            series['serializer_seconds'] += stats.serializer_time
+            series['response_bytes'] += size
+            return time.monotonic() - self.published_at >= PUBLISH_INTERVAL
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'series': {labels: {
+                    key: list(value) if isinstance(value, list) else value
+                    for key, value in series.items()
+                } for labels, series in self.series.items()},
+            }
+
+    def publish(self):
+        self.published_at = time.monotonic()
+        cache = caches[CACHE_ALIAS]
+        cache.set(f'{CACHE_PREFIX}:{WORKER}', self.snapshot(), PUBLISH_TIMEOUT)
+        workers = cache.get(f'{CACHE_PREFIX}:workers') or set()
+        if WORKER not in workers:
+            # Ajout concurrent perdu : rattrapé à la publication suivante
+            cache.set(f'{CACHE_PREFIX}:workers', workers | {WORKER}, None)
+
+
+registry = Registry()
+
+
+def collect():
+    """Registres publiés par worker, dont celui du processus courant, à jour."""
+    registry.publish()
+    cache = caches[CACHE_ALIAS]
+    workers = cache.get(f'{CACHE_PREFIX}:workers') or {WORKER}
+    snapshots = cache.get_many([f'{CACHE_PREFIX}:{worker}' for worker in workers])
+    alive = {key[len(CACHE_PREFIX) + 1:] for key in snapshots}
+    if alive != workers:
+        cache.set(f'{CACHE_PREFIX}:workers', alive | {WORKER}, None)
+    snapshots = {key[len(CACHE_PREFIX) + 1:]: snapshot for key, snapshot in snapshots.items()}
+    snapshots[WORKER] = registry.snapshot()
+    return snapshots
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+def _histogram(lines, name, buckets, worker, labels, counts, total, count):
+    cumulative = 0
+    for bound, bucket_count in zip((*buckets, '+Inf'), counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{_labels(**labels, worker=worker, le=bound)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels, worker=worker)} {total}')
+    lines.append(f'{name}_count{_labels(**labels, worker=worker)} {count}')
+
+
+def render_metrics(snapshots):
+    """Format d'exposition texte de Prometheus."""
+    lines = [
+        '# HELP smartbin_http_requests_total Requêtes HTTP traitées.',
+        '# TYPE smartbin_http_requests_total counter',
+    ]
+    for worker, snapshot in sorted(snapshots.items()):
+        for (route, method, role, status), count in sorted(snapshot['requests'].items()):
+            labels = _labels(route=route, method=method, role=role, status=status, worker=worker)
+            lines.append(f'smartbin_http_requests_total{labels} {count}')
+
+    histograms = [
+        ('smartbin_http_request_duration_seconds', 'Durée des requêtes HTTP.',
+         DURATION_BUCKETS, 'duration', 'duration_sum'),
+        ('smartbin_http_db_queries', 'Requêtes SQL par requête HTTP.',
+         QUERY_BUCKETS, 'queries', 'queries_sum'),
+    ]
+    for name, help_text, buckets, key, sum_key in histograms:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for worker, snapshot in sorted(snapshots.items()):
+            for (route, method, role), series in sorted(snapshot['series'].items()):
+                _histogram(lines, name, buckets, worker, {'route': route, 'method': method, 'role': role},
+                           series[key], series[sum_key], series['count'])
+
+    counters = [
+        ('smartbin_http_db_duration_seconds_total', 'Temps passé en base.', 'db_seconds'),
+        ('smartbin_http_serializer_duration_seconds_total', 'Temps passé dans les sérialiseurs.',
+         'serializer_seconds'),
+        ('smartbin_http_response_bytes_total', 'Taille des réponses.', 'response_bytes'),
+    ]
+    for name, help_text, key in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for worker, snapshot in sorted(snapshots.items()):
+            for (route, method, role), series in sorted(snapshot['series'].items()):
+                labels = _labels(route=route, method=method, role=role, worker=worker)
+                lines.append(f'{name}{labels} {series[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _route(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or match.route
+
+
+def _role(request):
+    user = getattr(request, 'user', None)
+    # Utilisateur de session non évalué : pas de requête pour le résoudre
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return 'anonymous'
+    if not user.is_authenticated:
+        return 'anonymous'
+    return getattr(user, 'role', None) or 'unknown'
+
+
+def staff_user(request):
+    """Utilisateur staff de la requête (jeton JWT ou session), sinon None."""
+    user = realtime.authenticate(request)
+    return user if user is not None and user.is_staff else None
+
+
+class InstrumentationMiddleware:
+    """
+    À placer en tête de MIDDLEWARE. Mesure chaque requête (voir Registry) et
+    journalise les requêtes lentes échantillonnées avec leur SQL. Les
+    requêtes profilées (ProfileMiddleware) ne sont pas mesurées.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not ENABLED:
+            return self.get_response(request)
+        stats = self._start()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if self._finish(request, response, stats):
+            registry.publish()
+        return response
+
+    async def __acall__(self, request):
+        if not ENABLED:
+            return await self.get_response(request)
+        stats = self._start()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        if self._finish(request, response, stats):
+            await sync_to_async(registry.publish)()
+        return response
+
+    def _start(self):
+        return RequestStats(sampled=random.random() < SLOW_REQUEST_SAMPLE_RATE)
+
+    def _finish(self, request, response, stats):
+        """Vrai si le registre doit être publié."""
+        if _route(request) == 'metrics' or getattr(request, '_smartbin_profiled', False):
+            return False
+        if not response.streaming:
+            return self._record(request, response, stats, len(response.content))
+        if response.is_async:
+            # Flux asynchrones (SSE) : mesurés jusqu'à l'envoi des en-têtes
+            return self._record(request, response, stats, 0)
+        response.streaming_content = self._measured_stream(
+            request, response, stats, iter(response.streaming_content)
+        )
+        return False
+
+    def _measured_stream(self, request, response, stats, iterator):
+        # Contenu produit pendant la lecture du flux (exports) : requêtes et
+        # durée comptées jusqu'au dernier fragment
+        size = 0
+        try:
+            while True:
+                token = _current.set(stats)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    _current.reset(token)
+                size += len(chunk)
+                yield chunk
+        finally:
+            if self._record(request, response, stats, size):
+                registry.publish()
+
+    def _record(self, request, response, stats, size):
+        duration = time.perf_counter() - stats.start
+        labels = (_route(request), request.method, _role(request))
+        if stats.sql is not None and duration * 1000 >= SLOW_REQUEST_MS:
+            self._log_slow(request, response, stats, duration, size)
+        return registry.record(labels, response.status_code, duration, stats, size)
+
+    def _log_slow(self, request, response, stats, duration, size):
+        slowest = sorted(stats.sql, key=lambda query: query[0], reverse=True)[:5]
+        repeated = Counter(sql for _, sql in stats.sql).most_common(1)
+        lines = [
+            f'Requête lente {request.method} {request.get_full_path()} ({_route(request)}, {_role(request)}) : '
+            f'{response.status_code}, {duration * 1000:.0f} ms, {stats.queries} requêtes SQL '
+            f'({stats.db_time * 1000:.0f} ms), sérialisation {stats.serializer_time * 1000:.0f} ms, '
+            f'{size} octets',
+            *(f'  {elapsed * 1000:.1f} ms : {sql[:500]}' for elapsed, sql in slowest),
+        ]
+        if repeated and repeated[0][1] > 1:
+            sql, count = repeated[0]
+            lines.append(f'  exécutée {count} fois : {sql[:500]}')
+        logger.warning('\n'.join(lines))
+
+
+class ProfileMiddleware:
+    """
+    À placer après AuthenticationMiddleware, pour que la session soit lue.
+    Avec ``?_profile=1``, un utilisateur staff (jeton JWT ou session) reçoit
+    à la place de la réponse le profil de son exécution (pyinstrument si
+    installé, cProfile sinon) ; le paramètre est ignoré pour les autres.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.GET.get('_profile') and staff_user(request) is not None:
+            return self._profile(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.GET.get('_profile') and await sync_to_async(staff_user)(request) is not None:
+            # Exécution synchrone dans un thread, seul profilé : les vues
+            # asynchrones y exécutent l'ORM et la sérialisation
+            return await sync_to_async(self._profile)(request, async_to_sync(self.get_response))
+        return await self.get_response(request)
+
+    def _profile(self, request, get_response):
+        request._smartbin_profiled = True
+        stats = RequestStats()
+        token = _current.set(stats)
+        if Profiler is not None:
+            profiler = Profiler(async_mode='disabled')
+            start, stop = profiler.start, profiler.stop
+        else:
+            profiler = cProfile.Profile()
+            start, stop = profiler.enable, profiler.disable
+        start()
+        try:
+            response = get_response(request)
+            if response.streaming and not response.is_async:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = 0 if response.streaming else len(response.content)
+        finally:
+            stop()
+            _current.reset(token)
+        duration = time.perf_counter() - stats.start
+        summary = (
+            f'{request.method} {request.get_full_path()} : {response.status_code}, {duration * 1000:.1f} ms, '
+            f'{stats.queries} requêtes SQL ({stats.db_time * 1000:.1f} ms), '
+            f'sérialisation {stats.serializer_time * 1000:.1f} ms, {size} octets\n\n'
+        )
+        if Profiler is not None:
+            report = profiler.output_text(unicode=True, color=False)
+        else:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LIMIT)
+            report = output.getvalue()
+        return HttpResponse(summary + report, content_type='text/plain; charset=utf-8')
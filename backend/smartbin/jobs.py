@@ -0,0 +1,133 @@
+import time
+import traceback
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+# Délai avant un nouvel essai : BACKOFF × 2^(essai - 1), plafonné
+BACKOFF = timedelta(seconds=getattr(settings, 'SMARTBIN_JOB_BACKOFF_SECONDS', 30))
+MAX_BACKOFF = timedelta(hours=1)
+# Un job « en cours » depuis plus longtemps appartient à un worker arrêté
+STALE_AFTER = timedelta(minutes=getattr(settings, 'SMARTBIN_JOB_TIMEOUT_MINUTES', 60))
+# Attente entre deux lectures de la file quand elle est vide
+POLL_INTERVAL = getattr(settings, 'SMARTBIN_JOB_POLL_SECONDS', 1.0)
+STALE_CHECK_INTERVAL = 60
+
+Task = namedtuple('Task', ['function', 'max_attempts', 'priority'])
+
+# Tâches exécutables, déclarées avec @task (voir tasks.py)
+TASKS = {}
+
+
+def task(name, max_attempts=3, priority=0):
+    def register(function):
+        TASKS[name] = Task(function, max_attempts, priority)
+        return function
+    return register
+
+
+def enqueue(name, params=None, priority=None, run_at=None, created_by=None):
+    """Ajoute un job à la file ; ``params`` sont les arguments nommés de la tâche."""
+    if name not in TASKS:
+        raise ValueError(f'Tâche inconnue : {name}')
+    spec = TASKS[name]
+    return Job.objects.create(
+        name=name,
+        params=params or {},
+        priority=spec.priority if priority is None else priority,
+        max_attempts=spec.max_attempts,
+        run_at=run_at or timezone.now(),
+        created_by=created_by,
+    )
+
+
+def claim(worker):
+    """
+    Réserve le prochain job exécutable (priorité puis date). Les lignes déjà
+    verrouillées par un autre worker sont sautées (FOR UPDATE SKIP LOCKED).
+    """
+    now = timezone.now()
+    queued = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'pk')
+    # Sous SQLite (sans FOR UPDATE), pas de transaction autour de la lecture :
+    # elle bloquerait l'écriture des autres workers. La condition sur le
+    # statut empêche alors deux workers de prendre le même job.
+    row_locks = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if row_locks else nullcontext():
+        if row_locks:
+            queued = queued.select_for_update(skip_locked=True)
+        job = queued.first()
+        if job is None:
+            return None
+        if not Job.objects.filter(pk=job.pk, status='queued').update(
+            status='running', attempts=F('attempts') + 1,
+            locked_by=worker, locked_at=now, started_at=now,
+        ):
+            return None
+    job.refresh_from_db()
+    return job
+
+
+def _finish(job, **fields):
+    # Sans effet si le job a été annulé ou repris entre-temps
+    return Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(**fields)
+
+
+def execute(job):
+    spec = TASKS.get(job.name)
+    try:
+        if spec is None:
+            raise LookupError(f'Tâche inconnue : {job.name}')
+        result = spec.function(**job.params)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = min(BACKOFF * 2 ** (job.attempts - 1), MAX_BACKOFF)
+            _finish(job, status='queued', run_at=timezone.now() + delay, locked_by='', error=error)
+        else:
+            _finish(job, status='failed', finished_at=timezone.now(), error=error)
+        return False
+    _finish(job, status='done', result=result, finished_at=timezone.now(), error='')
+    return True
+
+
+def requeue_stale(now=None):
+    """Remet en file (ou en échec) les jobs d'un worker arrêté en cours d'exécution."""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - STALE_AFTER)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, error="Délai d'exécution dépassé",
+    )
+    requeued = stale.update(status='queued', run_at=now, locked_by='')
+    return requeued + failed
+
+
+def work(worker, should_stop=lambda: False, burst=False):
+    """
+    Boucle d'un worker : exécute les jobs un par un jusqu'à ``should_stop()``,
+    ou jusqu'à ce que la file soit vide avec ``burst``. Retourne le nombre de
+    jobs exécutés.
+    """
+    processed = 0
+    last_stale_check = None
+    while not should_stop():
+        if last_stale_check is None or time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+            requeue_stale()
+            last_stale_check = time.monotonic()
+        job = claim(worker)
+        if job is None:
+            ready = Job.objects.filter(status='queued', run_at__lte=timezone.now())
+            if burst and not ready.exists():
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        execute(job)
+        processed += 1
+        close_old_connections()
+    return processed
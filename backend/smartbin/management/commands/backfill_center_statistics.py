@@ -0,0 +1,44 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from smartbin.center_statistics import BACKFILL_CHUNK_SIZE, WATERMARK_NAME, backfill
+from smartbin.models import TriCenter, Watermark
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule l'historique complet des statistiques des centres de tri, "
+        "par lots de centres traités en parallèle. Les statistiques existantes "
+        "des centres traités sont remplacées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tri-center', action='append', dest='tri_centers',
+                            help="Identifiant d'un centre (répétable) ; tous par défaut")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE,
+                            help='Nombre de centres par lot')
+
+    def handle(self, *args, **options):
+        center_ids = None
+        if options['tri_centers']:
+            try:
+                center_ids = list(
+                    TriCenter.objects.filter(pk__in=options['tri_centers']).values_list('pk', flat=True)
+                )
+            except ValidationError:
+                raise CommandError('Identifiant de centre de tri invalide')
+            if len(center_ids) != len(set(options['tri_centers'])):
+                raise CommandError('Centre de tri inconnu')
+        started_at = timezone.now()
+        start = time.perf_counter()
+        written = backfill(center_ids, workers=options['workers'], chunk_size=options['chunk_size'])
+        if center_ids is None:
+            # Les passages incrémentaux reprennent à partir du début du calcul
+            Watermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': started_at})
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} statistiques écrites en {time.perf_counter() - start:.1f} s'
+        ))
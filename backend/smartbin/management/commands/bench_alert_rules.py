@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from smartbin.alerts import evaluate_readings, invalidate_rules
+from smartbin.models import Alert, AlertRule, SmartBin, Zone
+from smartbin.telemetry import _fetch_bins, ingest_readings, parse_reading
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit d'ingestion des relevés sans règle d'alerte puis avec "
+        "N règles actives, et le temps d'évaluation des règles seul. Les "
+        "données créées sont annulées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', type=int, default=500)
+        parser.add_argument('--bins', type=int, default=5000)
+        parser.add_argument('--zones', type=int, default=50)
+        parser.add_argument('--batch', type=int, default=10000, help="Relevés par lot")
+        parser.add_argument('--batches', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            zones, bin_ids = self._setup(options['zones'], options['bins'])
+            batches = self._batches(rng, bin_ids, options['batch'], options['batches'])
+            AlertRule.objects.update(is_active=False)
+            self.stdout.write(
+                f"{len(bin_ids)} bacs, {options['batches']} lots de {options['batch']} relevés"
+            )
+            self.stdout.write(f"{'scénario':<20}{'relevés/s':>12}{'ms/lot':>10}{'alertes':>10}")
+            self._scenario('sans règle', batches)
+            self._create_rules(rng, zones, options['rules'])
+            self._scenario(f"{options['rules']} règles", batches)
+            self._evaluation(batches)
+            transaction.set_rollback(True)
+        invalidate_rules()
+
+    def _setup(self, zone_count, bin_count):
+        zones = Zone.objects.bulk_create(
+            [Zone(name=f'bench-alertes-{i}') for i in range(zone_count)]
+        )
+        bins = SmartBin.objects.bulk_create([
+            SmartBin(
+                id=f'bench-alertes-{i}', location='bench', latitude=5.3, longitude=-4.0,
+                zone=zones[i % zone_count], fill_level=0,
+            )
+            for i in range(bin_count)
+        ])
+        return zones, [bin.pk for bin in bins]
+
+    def _batches(self, rng, bin_ids, size, count):
+        # Remplissage croissant par bac, vidages (dont certains sans
+        # collecte) et batteries qui baissent
+        start = timezone.now() - timedelta(hours=count)
+        levels = {bin_id: rng.randint(0, 60) for bin_id in bin_ids}
+        batteries = {bin_id: rng.randint(10, 100) for bin_id in bin_ids}
+        batches = []
+        for number in range(count):
+            batch = []
+            for index in range(size):
+                bin_id = rng.choice(bin_ids)
+                level = levels[bin_id] + rng.randint(0, 8)
+                if level > 100 or rng.random() < 0.01:
+                    level = rng.randint(0, 10)
+                levels[bin_id] = level
+                batteries[bin_id] = max(batteries[bin_id] - rng.random(), 0)
+                ts = start + timedelta(hours=number, seconds=index * 3600 / size)
+                batch.append({
+                    'id': bin_id, 'fill_level': level,
+                    'battery': round(batteries[bin_id]), 'ts': ts.isoformat(),
+                })
+            batches.append(batch)
+        return batches
+
+    def _create_rules(self, rng, zones, count):
+        rules = []
+        for i in range(count):
+            # Une règle sur dix s'applique à toutes les zones
+            zone = None if i % 10 == 0 else zones[i % len(zones)]
+            kind = rng.random()
+            if kind < 0.5:
+                rule = AlertRule(
+                    condition='fill_level', operator=rng.choice(['gt', 'gte']),
+                    threshold=rng.randint(75, 98), consecutive=rng.randint(1, 3),
+                )
+            elif kind < 0.7:
+                rule = AlertRule(condition='battery_level', operator='lt', threshold=rng.randint(5, 20))
+            elif kind < 0.8:
+                rule = AlertRule(condition='level_drop', operator='gte', threshold=rng.randint(30, 60))
+            elif kind < 0.85:
+                rule = AlertRule(condition='level_jump', operator='gte', threshold=rng.randint(40, 70))
+            elif kind < 0.9:
+                rule = AlertRule(condition='stuck', operator='gte', threshold=rng.randint(2, 48))
+            else:
+                rule = AlertRule(condition='no_reading', threshold=rng.randint(2, 12))
+            rule.name = f'bench-{i}'
+            rule.zone = zone
+            rule.alert_type = f'bench-{rule.condition}-{i % 5}'
+            rule.severity = rng.choice(['low', 'medium', 'high'])
+            rules.append(rule)
+        AlertRule.objects.bulk_create(rules)
+        invalidate_rules()
+
+    def _scenario(self, label, batches):
+        with transaction.atomic():
+            alerts = Alert.objects.count()
+            start = time.perf_counter()
+            for batch in batches:
+                ingest_readings(batch)
+            elapsed = time.perf_counter() - start
+            created = Alert.objects.count() - alerts
+            transaction.set_rollback(True)
+        readings = sum(len(batch) for batch in batches)
+        self.stdout.write(
+            f'{label:<20}{readings / elapsed:>12.0f}{elapsed / len(batches) * 1000:>10.1f}{created:>10}'
+        )
+
+    def _evaluation(self, batches):
+        # Évaluation seule (lecture de l'historique et écriture des alertes
+        # comprises), sur le premier lot
+        with transaction.atomic():
+            readings = [parse_reading(row)[0] for row in batches[0]]
+            bins = _fetch_bins({reading.bin_id for reading in readings})
+            start = time.perf_counter()
+            stats = evaluate_readings(readings, bins)
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f"Évaluation des règles seule : {elapsed * 1000:.1f} ms pour {len(readings)} relevés "
+            f"({stats['created']} alertes créées, {stats['suppressed']} écartées)"
+        )
@@ -0,0 +1,113 @@
+import copy
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from smartbin.postgresql_pool.base import pools
+
+# Modes comparés : (libellé, ENGINE, CONN_MAX_AGE)
+MODES = [
+    ('connexion par requête', 'django.db.backends.postgresql', 0),
+    ('connexion persistante', 'django.db.backends.postgresql', None),
+    ('pool', 'smartbin.postgresql_pool', 0),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût de la connexion à PostgreSQL dans le cycle d'une "
+        "requête HTTP (ouverture ou emprunt, requête, fermeture ou retour), "
+        "avec une connexion par requête, une connexion persistante par "
+        "thread et le pool de smartbin.postgresql_pool, sur la base "
+        "configurée (ou derrière PgBouncer selon POSTGRES_HOST/PORT)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requêtes par thread")
+        parser.add_argument('--threads', type=int, default=4, help="Threads simulant les requêtes concurrentes")
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--pool-size', type=int, help="max_size du pool (défaut : réglage courant)")
+
+    def handle(self, *args, **options):
+        if connections[options['database']].vendor != 'postgresql':
+            raise CommandError('Réservé à PostgreSQL')
+        base_settings = connections[options['database']].settings_dict
+        self.stdout.write(
+            f"{options['threads']} threads × {options['requests']} requêtes, "
+            f"{base_settings['HOST'] or 'socket local'}:{base_settings['PORT'] or 5432}"
+        )
+        self.stdout.write(
+            f"{'mode':<24}{'p50 ms':>9}{'p95 ms':>9}{'connexion p50 ms':>18}"
+            f"{'req/s':>9}{'connexions':>12}"
+        )
+        for label, engine, max_age in MODES:
+            settings_dict = copy.deepcopy(base_settings)
+            settings_dict.update(ENGINE=engine, CONN_MAX_AGE=max_age)
+            settings_dict['OPTIONS'].pop('pool', None)
+            if engine == 'smartbin.postgresql_pool':
+                pool_options = dict(base_settings['OPTIONS'].get('pool') or {})
+                if options['pool_size']:
+                    pool_options.update(max_size=options['pool_size'])
+                settings_dict['OPTIONS']['pool'] = pool_options
+            # Alias propre à la mesure : pool neuf, sans connexion ouverte
+            alias = f"bench_connections_{label.replace(' ', '_')}"
+            samples, connect_samples, backends, elapsed = self._run(settings_dict, alias, options)
+            p50, p95 = np.percentile(samples, [50, 95]).tolist()
+            self.stdout.write(
+                f'{label:<24}{p50:>9.2f}{p95:>9.2f}{np.percentile(connect_samples, 50):>18.3f}'
+                f'{len(samples) / elapsed:>9.0f}{len(backends):>12}'
+            )
+            pool = pools().get(alias)
+            if pool is not None:
+                self.stdout.write(f"    pool : {pool.stats()}")
+                pool.close()
+
+    def _run(self, settings_dict, alias, options):
+        samples, connect_samples, backends = [], [], set()
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+        errors = []
+
+        def worker():
+            # Une enveloppe par thread, comme django.db.connections
+            wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+            local_samples, local_connect, local_backends = [], [], set()
+            try:
+                barrier.wait()
+                for _ in range(options['requests']):
+                    start = time.perf_counter()
+                    # request_started, puis request_finished : fermeture des
+                    # connexions dont CONN_MAX_AGE est dépassé
+                    wrapper.close_if_unusable_or_obsolete()
+                    wrapper.ensure_connection()
+                    connected = time.perf_counter()
+                    with wrapper.cursor() as cursor:
+                        cursor.execute('SELECT pg_backend_pid()')
+                        local_backends.add(cursor.fetchone()[0])
+                    wrapper.close_if_unusable_or_obsolete()
+                    end = time.perf_counter()
+                    local_samples.append((end - start) * 1000)
+                    local_connect.append((connected - start) * 1000)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                wrapper.close()
+            with lock:
+                samples.extend(local_samples)
+                connect_samples.extend(local_connect)
+                backends.update(local_backends)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise CommandError(f'{alias} : {errors[0]}')
+        return samples, connect_samples, backends, elapsed
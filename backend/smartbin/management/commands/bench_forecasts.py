@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from smartbin.forecast import pending_bins, refit
+from smartbin.models import BinForecast, BinReading, Collection, SmartBin, Zone
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le réajustement des prévisions de remplissage : premier "
+        "ajustement sur un historique, puis passage incrémental après un "
+        "nouveau relevé par bac. Les données créées sont annulées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bins', type=int, default=100000)
+        parser.add_argument('--readings', type=int, default=12, help="Relevés d'historique par bac")
+        parser.add_argument('--interval', type=int, default=6, help="Heures entre deux relevés")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        interval = timedelta(hours=options['interval'])
+        with transaction.atomic():
+            start = time.perf_counter()
+            levels, rates = self._setup(rng, now, options['bins'], options['readings'], interval)
+            self.stdout.write(
+                f"{options['bins']} bacs, {options['readings']} relevés par bac "
+                f"(préparation {time.perf_counter() - start:.1f} s)"
+            )
+            self._measure('premier ajustement', now)
+            later = now + interval
+            self._readings(rng, levels, rates, later, interval)
+            self._measure('incrémental', later)
+            predicted = BinForecast.objects.filter(predicted_full_at__isnull=False).count()
+            self.stdout.write(f"{predicted} bacs avec une date de remplissage prévue")
+            transaction.set_rollback(True)
+
+    def _setup(self, rng, now, bin_count, reading_count, interval):
+        zone = Zone.objects.create(name='bench-prevision')
+        bin_ids = [f'bench-prevision-{i}' for i in range(bin_count)]
+        SmartBin.objects.bulk_create(
+            [SmartBin(id=bin_id, location='bench', latitude=5.3, longitude=-4.0, zone=zone)
+             for bin_id in bin_ids],
+            batch_size=5000,
+        )
+        levels = {bin_id: rng.uniform(0, 30) for bin_id in bin_ids}
+        rates = {bin_id: rng.uniform(0.2, 2.0) for bin_id in bin_ids}
+        for step in range(reading_count, 0, -1):
+            self._readings(rng, levels, rates, now - interval * (step - 1), interval)
+        return levels, rates
+
+    def _readings(self, rng, levels, rates, ts, interval):
+        # Une valeur par bac à la date ts, plus rapide le week-end ; vidage
+        # (avec collecte) au-delà de 95 %
+        weekend = 2 if timezone.localtime(ts).weekday() >= 5 else 1
+        readings, collections = [], []
+        for bin_id, level in levels.items():
+            level += rates[bin_id] * weekend * interval.total_seconds() / 3600 + rng.gauss(0, 1)
+            if level > 95:
+                collections.append(Collection(bin_id=bin_id, date=ts - interval / 2))
+                level = rng.uniform(0, 5)
+            levels[bin_id] = level
+            readings.append(BinReading(bin_id=bin_id, ts=ts, fill_level=max(0, round(level))))
+        BinReading.objects.bulk_create(readings, batch_size=5000)
+        Collection.objects.bulk_create(collections, batch_size=5000)
+        SmartBin.objects.update(last_reading_at=ts)
+
+    def _measure(self, label, now):
+        start = time.perf_counter()
+        bins = pending_bins(now)
+        selected = time.perf_counter()
+        refit(bins, now)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label:<20}{len(bins):>8} bacs  {elapsed:>6.1f} s "
+            f"(sélection {selected - start:.1f} s, {len(bins) / elapsed:.0f} bacs/s)"
+        )
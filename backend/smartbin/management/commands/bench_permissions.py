@@ -0,0 +1,108 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from smartbin.apps import SmartBinConfig
+from smartbin.models import ModulePermission, User, UserRole
+from smartbin.permissions import HasModulePermission
+from smartbin.role_permissions import invalidate_role_permissions
+from smartbin.serializers import CustomTokenObtainPairSerializer
+
+MODULE_PERMISSION = ('reporting', 'view_reports')
+
+
+class LegacyHasModulePermission(BasePermission):
+    # Implémentation d'origine de User.has_module_permission : chargement du
+    # rôle puis JOIN sur la table M2M à chaque requête.
+    def has_permission(self, request, view):
+        user = request.user
+        if user.is_superuser:
+            return True
+        if not user.user_role:
+            return False
+        module, permission = MODULE_PERMISSION
+        return user.user_role.permissions.filter(
+            module=module,
+            permission=permission
+        ).exists()
+
+
+class LegacyView(APIView):
+    permission_classes = [LegacyHasModulePermission]
+
+    def get(self, request):
+        return Response({})
+
+
+class GatedView(APIView):
+    permission_classes = [HasModulePermission]
+    module_permission = MODULE_PERMISSION
+
+    def get(self, request):
+        return Response({})
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le nombre de requêtes SQL et le temps par requête HTTP du "
+        "contrôle HasModulePermission : implémentation d'origine, permissions "
+        "en cache et claims JWT. Les données créées sont annulées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with transaction.atomic():
+            user = self._setup()
+            scenarios = [
+                ('origine (requête M2M)', LegacyView, AccessToken.for_user(user)),
+                ('cache des rôles', GatedView, AccessToken.for_user(user)),
+                ('claims JWT', GatedView, CustomTokenObtainPairSerializer.get_token(user).access_token),
+            ]
+            self.stdout.write(f'{count} requêtes par scénario (authentification exclue)')
+            self.stdout.write(f"{'scénario':<24}{'requêtes SQL/req':>18}{'µs/req':>10}")
+            for label, view_class, token in scenarios:
+                queries, elapsed = self._run(view_class, user, token, count)
+                self.stdout.write(
+                    f'{label:<24}{queries / count:>18.2f}{elapsed / count * 1e6:>10.1f}'
+                )
+            transaction.set_rollback(True)
+        invalidate_role_permissions()
+
+    def _setup(self):
+        role = UserRole.objects.create(name='supervisor', description='bench')
+        permissions = [
+            ModulePermission.objects.get_or_create(
+                module=module, permission=permission,
+                defaults={'description': permission},
+            )[0]
+            for module, config in SmartBinConfig.MODULES.items()
+            for permission in config['permissions']
+        ]
+        role.permissions.set(permissions)
+        return User.objects.create(username='bench-permissions', role='supervisor', user_role=role)
+
+    def _run(self, view_class, user, token, count):
+        factory = APIRequestFactory()
+        view = view_class.as_view()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for _ in range(count):
+                # L'utilisateur est rechargé à chaque requête, comme le fait
+                # JWTAuthentication.
+                request = factory.get('/bench/')
+                force_authenticate(request, user=User.objects.get(pk=user.pk), token=token)
+                response = view(request)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - start
+        # La requête de rechargement de l'utilisateur n'est pas comptée.
+        return len(context.captured_queries) - count, elapsed
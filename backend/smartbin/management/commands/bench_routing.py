@@ -0,0 +1,129 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from smartbin.routing import BIN_CAPACITY_KG, solve
+
+# Centre-ville fictif ; 1 degré de latitude ≈ 111 km
+CITY_CENTER = (5.35, -4.0)
+KM = 1 / 111.0
+
+
+def _uniform(rng, n):
+    return rng.uniform(-10, 10, size=(n, 2))
+
+
+def _clustered(rng, n):
+    # Quartiers denses répartis dans la ville
+    centers = rng.uniform(-9, 9, size=(25, 2))
+    return centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.8, size=(n, 2))
+
+
+def _radial(rng, n):
+    # Densité décroissante du centre vers la périphérie
+    radius = np.minimum(rng.exponential(3.5, n), 14)
+    angle = rng.uniform(0, 2 * np.pi, n)
+    return np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
+
+
+def _corridor(rng, n):
+    # Bacs alignés le long de trois axes routiers
+    angles = np.array([0.2, 1.3, 2.5])
+    axis = angles[rng.integers(0, len(angles), n)]
+    along = rng.uniform(-12, 12, n)
+    across = rng.normal(0, 0.4, n)
+    return np.column_stack([
+        along * np.cos(axis) - across * np.sin(axis),
+        along * np.sin(axis) + across * np.cos(axis),
+    ])
+
+
+LAYOUTS = {
+    'uniform': _uniform,
+    'clustered': _clustered,
+    'radial': _radial,
+    'corridor': _corridor,
+}
+
+
+def _to_degrees(offsets_km):
+    return np.column_stack([
+        CITY_CENTER[0] + offsets_km[:, 0] * KM,
+        CITY_CENTER[1] + offsets_km[:, 1] * KM,
+    ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le planificateur de tournées sur des villes synthétiques : "
+        "temps de calcul, distance obtenue par plus proche voisin puis après "
+        "recherche locale, et validité des tournées (chaque bac servi une "
+        "fois, capacité respectée). Échoue si une instance dépasse --max-seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bins', type=int, default=5000)
+        parser.add_argument('--trucks', type=int, default=50)
+        parser.add_argument('--capacity', type=float, default=2000, help='Capacité d\'un camion (kg)')
+        parser.add_argument('--centers', type=int, default=4)
+        parser.add_argument('--time-budget', type=float, default=5.0)
+        parser.add_argument('--max-seconds', type=float, default=10.0)
+        parser.add_argument('--layout', choices=sorted(LAYOUTS), action='append')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        layouts = options['layout'] or list(LAYOUTS)
+        self.stdout.write(
+            f"{options['bins']} bacs, {options['trucks']} camions de {options['capacity']:.0f} kg, "
+            f"{options['centers']} centres de tri, budget {options['time_budget']} s"
+        )
+        self.stdout.write(
+            f"{'ville':<11}{'temps (s)':>10}{'trajets':>9}{'km (PPV)':>11}"
+            f"{'km (opt.)':>11}{'gain':>8}{'max/camion':>12}"
+        )
+        failures = []
+        for name in layouts:
+            rng = np.random.default_rng(options['seed'])
+            bins = _to_degrees(LAYOUTS[name](rng, options['bins']))
+            demands = rng.uniform(70, 100, options['bins']) / 100 * BIN_CAPACITY_KG
+            angles = np.linspace(0, 2 * np.pi, options['centers'], endpoint=False)
+            centers = _to_degrees(np.column_stack([11 * np.cos(angles), 11 * np.sin(angles)]))
+            depot = _to_degrees(np.array([[-12.0, 0.0]]))[0]
+
+            baseline, _ = solve(depot, bins, demands, centers, options['trucks'],
+                                options['capacity'], time_budget=0)
+            start = time.perf_counter()
+            plan, _ = solve(depot, bins, demands, centers, options['trucks'],
+                            options['capacity'], time_budget=options['time_budget'])
+            elapsed = time.perf_counter() - start
+
+            error = self._validate(plan, demands, len(centers), options['capacity'])
+            trips = sum(len(truck) for truck in plan.trucks)
+            longest = max(sum(trip.distance_km for trip in truck) for truck in plan.trucks)
+            gain = 1 - plan.distance_km / baseline.distance_km
+            self.stdout.write(
+                f'{name:<11}{elapsed:>10.2f}{trips:>9}{baseline.distance_km:>11.0f}'
+                f'{plan.distance_km:>11.0f}{gain:>8.1%}{longest:>12.0f}'
+            )
+            if error:
+                failures.append(f'{name} : {error}')
+            elif elapsed > options['max_seconds']:
+                failures.append(f"{name} : {elapsed:.1f} s > {options['max_seconds']} s")
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def _validate(self, plan, demands, n_centers, capacity):
+        first_bin = 1 + n_centers
+        visits = np.zeros(len(demands), dtype=int)
+        for truck in plan.trucks:
+            for trip in truck:
+                bins = np.array([point - first_bin for point in trip.points if point >= first_bin], dtype=int)
+                visits[bins] += 1
+                if demands[bins].sum() > capacity + 1e-6:
+                    return 'capacité dépassée'
+                if not 1 <= trip.points[-1] < first_bin:
+                    return 'trajet sans déchargement'
+        if (visits[np.setdiff1d(np.arange(len(demands)), plan.unserved)] != 1).any():
+            return 'bac non servi ou servi plusieurs fois'
+        return None
@@ -0,0 +1,334 @@
+import json
+import platform
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from smartbin import alerts, anomalies, center_statistics, dashboard, forecast, tasks, timeseries
+from smartbin.models import Collection, SmartBin, TriCenter, User, WasteFlow
+from smartbin.telemetry import ingest_readings
+
+BASELINE = getattr(settings, 'SMARTBIN_BENCHMARK_BASELINE', Path(settings.BASE_DIR) / 'benchmark_baseline.json')
+
+# Endpoints mesurés : (cas, rôle, chemin). Les champs entre accolades sont
+# remplacés à partir des données en base (voir _context).
+ENDPOINTS = [
+    ('bins.list', 'admin', '/api/bins/'),
+    ('bins.filtered', 'admin', '/api/bins/?status=active&fill_level=80'),
+    ('bins.zone', 'admin', '/api/bins/?zone={zone}'),
+    ('bins.near', 'admin', '/api/bins/?near={lat},{lng}&radius=1000'),
+    ('bins.full_before', 'admin', '/api/bins/?full_before={tomorrow}'),
+    ('bins.detail', 'admin', '/api/bins/{bin}/'),
+    ('bins.history_raw', 'admin', '/api/bins/{bin}/history/?bucket=raw'),
+    ('bins.history_month', 'admin', '/api/bins/{bin}/history/?from={month_ago}&bucket=hour'),
+    ('bins.history_year', 'admin', '/api/bins/{bin}/history/?from={year_ago}&bucket=day'),
+    ('bins.autocomplete', 'admin', '/api/bins/autocomplete/?q={bin}'),
+    ('alerts.open', 'admin', '/api/alerts/?is_resolved=false'),
+    ('alerts.citizen', 'citizen', '/api/alerts/'),
+    ('reports.pending', 'admin', '/api/reports/?status=pending'),
+    ('reports.citizen', 'citizen', '/api/reports/'),
+    ('collections.collector', 'collector', '/api/collections/'),
+    ('collections.period', 'admin', '/api/collections/?date_after={week_ago}&date_before={tomorrow}'),
+    ('collections.export', 'admin', '/api/collections/export/?format=csv&date_after={week_ago}'),
+    ('waste_flows.period', 'admin', '/api/waste-flows/?processing_date_after={month_ago}'),
+    ('waste_flows.by_type', 'admin', '/api/waste-flows/by_waste_type/?waste_type=plastic'),
+    ('waste_flows.export', 'admin', '/api/waste-flows/export/?format=ndjson&processing_date_after={month_ago}'),
+    ('center_statistics.monthly', 'admin', '/api/center-statistics/monthly_summary/'),
+    ('tri_centers.nearest', 'admin', '/api/tri-centers/nearest/?lat={lat}&lng={lng}&limit=3'),
+    ('statistics.admin', 'admin', '/api/statistics/'),
+    ('zones.list', 'admin', '/api/zones/'),
+    ('payment_plans.list', 'citizen', '/api/payment-plans/'),
+    ('modules.list', 'admin', '/api/modules/'),
+]
+
+# Écarts sous ces seuils ignorés (bruit de mesure)
+MIN_DELTA_MS = 5.0
+MIN_DELTA_RSS_MB = 10.0
+
+
+def _reset_peak_rss():
+    # Linux : remet à zéro le pic de mémoire résidente (VmHWM) du processus,
+    # mesuré ensuite cas par cas
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Pic depuis le démarrage du processus : ko sous Linux, octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque endpoint de l'API et chaque traitement périodique sur "
+        "les données en base (voir seed_scale) : latences p50/p95/p99, nombre "
+        "de requêtes SQL et pic de mémoire résidente, comparés à une base de "
+        "référence enregistrée avec --save-baseline. Chaque exécution est "
+        "annulée : la base n'est pas modifiée. Avec --check, code de sortie "
+        "non nul en cas de régression."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Mesures par endpoint")
+        parser.add_argument('--job-repeat', type=int, default=3, help="Mesures par traitement")
+        parser.add_argument('--ingest', type=int, default=10000,
+                            help="Relevés ingérés avant les traitements qui les consomment")
+        parser.add_argument('--telemetry-batch', type=int, default=1000,
+                            help="Relevés par requête d'ingestion mesurée")
+        parser.add_argument('--only', action='append', help="Cas dont le nom contient ce texte (répétable)")
+        parser.add_argument('--baseline', default=str(BASELINE))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Enregistre les mesures comme nouvelle référence")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Hausse relative tolérée de la latence médiane et de la mémoire")
+        parser.add_argument('--check', action='store_true')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options['seed'])
+        self.options = options
+        context = self._context()
+        cases = [
+            *((name, self._endpoint(role, path.format(**context['values'])), None, options['repeat'])
+              for name, role, path in ENDPOINTS),
+            ('telemetry.bulk', self._telemetry(), None, options['repeat']),
+            *((name, run, setup, options['job_repeat']) for name, run, setup in self._jobs()),
+        ]
+        if options['only']:
+            cases = [case for case in cases if any(part in case[0] for part in options['only'])]
+        if not cases:
+            raise CommandError("Aucun cas sélectionné")
+
+        meta = {
+            'vendor': connection.vendor,
+            'bins': context['bins'],
+            'python': platform.python_version(),
+            'date': timezone.now().isoformat(),
+        }
+        self.stdout.write(f"{connection.vendor}, {context['bins']} bacs")
+        baseline = self._load_baseline(options['baseline'], meta)
+        self.stdout.write(
+            f"{'cas':<30}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL':>7}{'RSS Mo':>9}  référence"
+        )
+        results, regressions = {}, []
+        for name, run, setup, repeat in cases:
+            result = self._measure(run, setup, repeat)
+            results[name] = result
+            issues = self._compare(result, baseline.get(name), options['tolerance'])
+            if issues:
+                regressions.append(f"{name} ({', '.join(issues)})")
+            self.stdout.write(self._row(name, result, baseline.get(name), issues))
+
+        if options['save_baseline']:
+            Path(options['baseline']).write_text(json.dumps({'meta': meta, 'cases': results}, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Référence enregistrée : {options['baseline']}"))
+        if regressions:
+            message = f"Régressions : {'; '.join(regressions)}"
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        elif baseline:
+            self.stdout.write(self.style.SUCCESS('Aucune régression'))
+
+    def _context(self):
+        bins = SmartBin.objects.count()
+        if not bins:
+            raise CommandError("Aucun bac en base : lancer d'abord seed_scale")
+        bin = (
+            SmartBin.objects.filter(status='active', last_reading_at__isnull=False, zone__isnull=False)
+            .order_by('pk').first()
+        )
+        collector_id = (
+            Collection.objects.filter(collector__role='collector')
+            .order_by('-date').values_list('collector_id', flat=True).first()
+        )
+        users = {
+            'admin': User.objects.filter(role='admin', is_staff=True).order_by('pk').first(),
+            'collector': User.objects.filter(pk=collector_id).first(),
+            'citizen': User.objects.filter(role='citizen', zone__isnull=False).order_by('pk').first(),
+        }
+        missing = [role for role, user in users.items() if user is None] + ([] if bin else ['bac actif'])
+        if missing or not TriCenter.objects.exists():
+            raise CommandError(f"Données incomplètes ({', '.join(missing) or 'centre de tri'}) : lancer seed_scale")
+        self.users = users
+        today = timezone.localdate()
+        return {
+            'bins': bins,
+            'values': {
+                'bin': bin.pk, 'zone': bin.zone_id, 'lat': bin.latitude, 'lng': bin.longitude,
+                'tomorrow': (today + timedelta(days=1)).isoformat(),
+                'week_ago': (today - timedelta(days=7)).isoformat(),
+                'month_ago': (today - timedelta(days=30)).isoformat(),
+                'year_ago': (today - timedelta(days=365)).isoformat(),
+            },
+        }
+
+    def _client(self, role):
+        client = APIClient()
+        client.force_authenticate(user=self.users[role])
+        return client
+
+    def _endpoint(self, role, path):
+        client = self._client(role)
+
+        def run():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{path} : HTTP {response.status_code}')
+            # Les exports sont produits pendant la lecture du flux
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        return run
+
+    def _telemetry(self):
+        client = self._client('admin')
+        batch = self.options['telemetry_batch']
+        bin_ids = list(SmartBin.objects.filter(status='active').order_by('pk').values_list('pk', flat=True)[:batch])
+
+        def run():
+            rows = [
+                {'id': bin_id, 'fill_level': int(level), 'battery': 80}
+                for bin_id, level in zip(bin_ids, self.rng.integers(0, 101, len(bin_ids)))
+            ]
+            response = client.post('/api/bins/telemetry/bulk/', rows, format='json')
+            if response.status_code != 200:
+                raise CommandError(f'telemetry/bulk : HTTP {response.status_code}')
+        return run
+
+    def _jobs(self):
+        bin_ids = list(
+            SmartBin.objects.filter(status='active').order_by('pk')
+            .values_list('pk', flat=True)[:self.options['ingest']]
+        )
+        centers = list(TriCenter.objects.order_by('pk'))
+        bin = SmartBin.objects.get(pk=bin_ids[0]) if bin_ids else None
+
+        def ingest():
+            # Un relevé par bac, comme un passage de l'ingestion
+            ingest_readings([
+                {'id': bin_id, 'fill_level': int(level), 'battery': 80}
+                for bin_id, level in zip(bin_ids, self.rng.integers(0, 101, len(bin_ids)))
+            ])
+
+        def new_flows():
+            now = timezone.now()
+            return [
+                WasteFlow(
+                    tri_center=center, processing_date=now, waste_type=waste_type,
+                    quantity_kg=float(self.rng.lognormal(5, 0.35)), recycling_rate=float(self.rng.uniform(20, 90)),
+                )
+                for center in centers for waste_type, _ in WasteFlow.WASTE_TYPES
+            ]
+
+        def plan_routes():
+            tasks.route_plan({
+                'zone': bin.zone, 'scheduled_date': timezone.localdate(),
+                'depot_lat': bin.latitude, 'depot_lng': bin.longitude, 'trucks': 3,
+                'truck_capacity_kg': 2000, 'fill_threshold': 70, 'tri_centers': centers, 'time_budget': 1,
+            })
+
+        return [
+            ('job.ingest_readings', ingest, None),
+            ('job.rollup_readings', lambda: timeseries.rollup_pending(), ingest),
+            ('job.refit_forecasts', lambda: forecast.refit(), ingest),
+            ('job.check_silent_bins', lambda: alerts.check_silent_bins(), None),
+            ('job.reconcile_statistics', lambda: dashboard.reconcile(fix=False), None),
+            ('job.rollup_center_statistics', lambda: center_statistics.rollup_pending(),
+             lambda: WasteFlow.objects.bulk_create(new_flows())),
+            ('job.screen_flows', lambda: anomalies.screen_flows(new_flows()), None),
+            ('job.plan_routes', plan_routes, None),
+        ]
+
+    def _measure(self, run, setup, repeat):
+        samples, queries = [], 0
+        # Première exécution non mesurée (connexion, caches, imports)
+        for attempt in range(repeat + 1 if setup is None else repeat):
+            with transaction.atomic():
+                if setup is not None:
+                    setup()
+                if attempt == 0:
+                    _reset_peak_rss()
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            if setup is not None or attempt > 0:
+                samples.append(elapsed * 1000)
+            queries = max(queries, len(captured.captured_queries))
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]).tolist()
+        rss = _peak_rss_mb()
+        return {
+            'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2),
+            'queries': queries, 'rss_mb': None if rss is None else round(rss, 1),
+        }
+
+    def _load_baseline(self, path, meta):
+        path = Path(path)
+        if not path.exists():
+            if not self.options['save_baseline']:
+                self.stdout.write(f"Pas de référence ({path}) : --save-baseline pour l'enregistrer")
+            return {}
+        stored = json.loads(path.read_text())
+        reference = stored.get('meta', {})
+        for key in ('vendor', 'bins'):
+            if reference.get(key) != meta[key]:
+                self.stdout.write(self.style.WARNING(
+                    f"Référence mesurée avec {key}={reference.get(key)} (ici {meta[key]}) : comparaison indicative"
+                ))
+        return stored.get('cases', {})
+
+    def _compare(self, result, reference, tolerance):
+        if reference is None:
+            return []
+        issues = []
+        # Médiane seule : les queues de distribution sont trop bruitées sur
+        # quelques mesures
+        if result['p50'] > reference['p50'] * (1 + tolerance) and result['p50'] - reference['p50'] > MIN_DELTA_MS:
+            issues.append(f"p50 {reference['p50']:.1f} → {result['p50']:.1f} ms")
+        if result['queries'] > reference['queries']:
+            issues.append(f"SQL {reference['queries']} → {result['queries']}")
+        if (
+            result['rss_mb'] is not None and reference.get('rss_mb') is not None
+            and result['rss_mb'] > reference['rss_mb'] * (1 + tolerance)
+            and result['rss_mb'] - reference['rss_mb'] > MIN_DELTA_RSS_MB
+        ):
+            issues.append(f"RSS {reference['rss_mb']:.0f} → {result['rss_mb']:.0f} Mo")
+        return issues
+
+    def _row(self, name, result, reference, issues):
+        rss = '-' if result['rss_mb'] is None else f"{result['rss_mb']:.0f}"
+        row = (
+            f"{name:<30}{result['p50']:>9.1f}{result['p95']:>9.1f}{result['p99']:>9.1f}"
+            f"{result['queries']:>7}{rss:>9}"
+        )
+        if reference is None:
+            return row
+        change = (result['p50'] / reference['p50'] - 1) * 100 if reference['p50'] else 0.0
+        row += f"  p50 {change:+.0f} %"
+        return self.style.ERROR(row) if issues else row
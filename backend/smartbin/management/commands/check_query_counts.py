@@ -0,0 +1,101 @@
+import uuid
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from smartbin.models import (
+    Alert, BinReport, CenterStatistics, Collection, CollectionRoute,
+    SmartBin, TriCenter, User, UserProfile, WasteFlow, Zone
+)
+
+# Endpoints de liste contrôlés (noms de routes du DefaultRouter)
+LIST_ROUTES = [
+    'user-list', 'zone-list', 'smartbin-list', 'collection-list',
+    'alert-list', 'collectionroute-list', 'binreport-list',
+    'tricenter-list', 'wasteflow-list', 'centerstatistics-list',
+]
+
+
+def seed(rows, offset):
+    """``rows`` lignes de chaque modèle listé (aussi utilisé par les tests)."""
+    for i in range(offset, offset + rows):
+        suffix = f'{uuid.uuid4().hex[:8]}-{i}'
+        user = User.objects.create(username=f'querycount-{suffix}', role='collector')
+        UserProfile.objects.create(user=user)
+        zone = Zone.objects.create(name=f'Zone {i}')
+        bin = SmartBin.objects.create(
+            id=f'QC-{suffix}', location=f'Rue {i}',
+            latitude=5.3, longitude=-4.0, zone=zone,
+        )
+        Collection.objects.create(bin=bin, collector=user)
+        Alert.objects.create(bin=bin, type='fill', severity='low', message='test')
+        route = CollectionRoute.objects.create(
+            name=f'Tournée {i}', collector=user, scheduled_date=date.today()
+        )
+        route.bins.add(bin)
+        BinReport.objects.create(bin=bin, reporter=user, issue_type='full', message='test')
+        center = TriCenter.objects.create(
+            name=f'Centre {i}', address='-', gps_lat=5.3, gps_lng=-4.0,
+            email_contact='centre@example.com', phone='-', total_capacity=1000,
+        )
+        WasteFlow.objects.create(
+            tri_center=center, smart_bin=bin, waste_type='plastic',
+            quantity_kg=10, recycling_rate=50,
+        )
+        CenterStatistics.objects.create(
+            tri_center=center, period=date.today(), period_type='monthly',
+            total_received=10, total_recycled=5, collection_count=1,
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie que chaque endpoint de liste exécute un nombre constant de "
+        "requêtes SQL quel que soit le nombre de lignes renvoyées (absence de "
+        "N+1). Les données créées sont annulées ; code de sortie non nul en "
+        "cas d'écart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5,
+                            help="Lignes ajoutées par modèle à chaque palier")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            admin = User.objects.create(
+                username=f'querycount-{uuid.uuid4().hex[:8]}', role='admin',
+                is_staff=True, is_superuser=True,
+            )
+            client = APIClient()
+            client.force_authenticate(user=admin)
+
+            seed(rows, 0)
+            first = self._count(client)
+            seed(rows, rows)
+            second = self._count(client)
+            transaction.set_rollback(True)
+
+        failures = []
+        self.stdout.write(f"{'endpoint':<26}{rows:>8}{rows * 2:>8}")
+        for route in LIST_ROUTES:
+            self.stdout.write(f'{route:<26}{first[route]:>8}{second[route]:>8}')
+            if first[route] != second[route]:
+                failures.append(route)
+        if failures:
+            raise CommandError(f"Requêtes par ligne détectées : {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('Nombre de requêtes constant sur tous les endpoints'))
+
+    def _count(self, client):
+        counts = {}
+        for route in LIST_ROUTES:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(reverse(route))
+            if response.status_code != 200:
+                raise CommandError(f'{route} : HTTP {response.status_code}')
+            counts[route] = len(context.captured_queries)
+        return counts
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from smartbin.replicas import MAX_LAG, REPLICAS, replica_lag
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche le poids et le retard de chaque réplica en lecture "
+        "(SMARTBIN_READ_REPLICAS), et s'il reçoit des lectures. Échoue si "
+        "aucun réplica n'est utilisable."
+    )
+
+    def handle(self, *args, **options):
+        if not REPLICAS:
+            self.stdout.write('Aucun réplica configuré : toutes les lectures sur la base principale')
+            return
+        available = 0
+        for alias, weight in REPLICAS.items():
+            lag = replica_lag(alias)
+            if lag is None:
+                state = 'injoignable'
+            elif lag > MAX_LAG:
+                state = f'retard {lag:.1f} s > {MAX_LAG} s, écarté'
+            else:
+                state = f'retard {lag:.1f} s'
+                available += 1
+            self.stdout.write(f'{alias:<16} poids {weight:<4} {state}')
+        if not available:
+            raise CommandError('Aucun réplica utilisable : lectures sur la base principale')
+        self.stdout.write(self.style.SUCCESS(f'{available}/{len(REPLICAS)} réplicas utilisables'))
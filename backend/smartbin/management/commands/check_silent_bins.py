@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from smartbin.alerts import check_silent_bins
+
+
+class Command(BaseCommand):
+    help = (
+        "Évalue les règles d'alerte « absence de relevé » sur les bacs actifs. "
+        "À lancer périodiquement (cron, toutes les 15 minutes)."
+    )
+
+    def handle(self, *args, **options):
+        stats = check_silent_bins()
+        self.stdout.write(
+            f"{stats['created']} alertes créées, {stats['repeated']} déjà ouvertes, "
+            f"{stats['suppressed']} écartées"
+        )
+        self.stdout.write(self.style.SUCCESS('Terminé'))
@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from smartbin import bin_state
+from smartbin.dashboard import GLOBAL_KEY
+from smartbin.models import BinReading, Collection, DashboardCounter, SmartBin
+from smartbin.telemetry import Reading
+
+STATUSES = [status for status, _ in SmartBin.STATUS_CHOICES]
+
+
+class Command(BaseCommand):
+    help = (
+        "Soumet un bac de test à des changements d'état concurrents depuis "
+        "de nombreux threads (relevés livrés dans le désordre, changements "
+        "de statut, collectes), puis vérifie qu'aucune transition n'est "
+        "perdue : version, dernier relevé, historique et compteurs du "
+        "tableau de bord. Le bac est supprimé en fin d'exécution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--operations', type=int, default=200, help="Opérations par thread")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        threads, per_thread = options['threads'], options['operations']
+        # Horodatages distincts, répartis au hasard entre les threads : les
+        # relevés arrivent dans le désordre
+        start = timezone.now() - timedelta(days=1)
+        plan = []
+        for offset in rng.sample(range(threads * per_thread * 10), threads * per_thread):
+            kind = rng.choices(('reading', 'status', 'collect'), (8, 1, 1))[0]
+            plan.append((kind, start + timedelta(milliseconds=offset), rng.randint(0, 100)))
+
+        before = self._fill_level_sum()
+        bin = SmartBin.objects.create(
+            id=f'hammer-{uuid.uuid4().hex[:12]}', location='Test de concurrence',
+            latitude=0, longitude=0, status='inactive',
+        )
+        try:
+            results = self._hammer(bin.pk, [plan[i::threads] for i in range(threads)])
+            self._verify(bin.pk, plan, results, before)
+        finally:
+            SmartBin.objects.filter(pk=bin.pk).delete()
+
+    def _hammer(self, bin_id, batches):
+        results = {'applied': 0, 'skipped': 0, 'conflicts': 0, 'errors': []}
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(batches))
+
+        def worker(operations):
+            counts = {'applied': 0, 'skipped': 0, 'conflicts': 0}
+            try:
+                barrier.wait()
+                for kind, ts, level in operations:
+                    try:
+                        applied = self._apply(bin_id, kind, ts, level)
+                    except bin_state.ConcurrentUpdate:
+                        counts['conflicts'] += 1
+                        continue
+                    counts['applied' if applied else 'skipped'] += 1
+            except DatabaseError as exc:
+                with lock:
+                    results['errors'].append(exc)
+            finally:
+                connection.close()
+            with lock:
+                for name, value in counts.items():
+                    results[name] += value
+
+        workers = [threading.Thread(target=worker, args=(batch,)) for batch in batches]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        operations = sum(len(batch) for batch in batches)
+        self.stdout.write(
+            f"{operations} opérations sur {len(batches)} threads en {elapsed:.1f} s "
+            f"({operations / elapsed:.0f}/s) : {results['applied']} appliquées, "
+            f"{results['skipped']} sans effet, {results['conflicts']} abandonnées"
+        )
+        if results['errors']:
+            raise CommandError(f"{len(results['errors'])} threads en erreur : {results['errors'][0]}")
+        return results
+
+    def _apply(self, bin_id, kind, ts, level):
+        # Comme les vues : bac lu, puis transition conditionnelle
+        bin = SmartBin.objects.get(pk=bin_id)
+        with transaction.atomic():
+            if kind == 'reading':
+                reading = Reading(None, bin_id, level, None, ts)
+                BinReading.objects.create(bin=bin, ts=ts, fill_level=level)
+                return bin_state.apply_reading(bin, reading)
+            if kind == 'status':
+                return bin_state.set_status(bin, STATUSES[level % len(STATUSES)])
+            applied = bin_state.collect(bin, ts)
+            Collection.objects.create(bin=bin, date=ts)
+            return applied
+
+    def _verify(self, bin_id, plan, results, before):
+        bin = SmartBin.objects.get(pk=bin_id)
+        readings = [(ts, level) for kind, ts, level in plan if kind == 'reading']
+        checks = [
+            ('version = transitions appliquées', bin.version, results['applied']),
+            ('dernier relevé', bin.last_reading_at, max(readings)[0] if readings else None),
+            ('relevés historisés', BinReading.objects.filter(bin_id=bin_id).count(), len(readings)),
+            ('collectes enregistrées', Collection.objects.filter(bin_id=bin_id).count(),
+             sum(1 for kind, _, _ in plan if kind == 'collect')),
+            ('somme des niveaux du tableau de bord', self._fill_level_sum() - before, bin.fill_level),
+        ]
+        failed = False
+        for label, actual, expected in checks:
+            ok = actual == expected
+            failed |= not ok
+            self.stdout.write(f"{'OK ' if ok else 'ÉCHEC'} {label} : {actual} (attendu {expected})")
+        if failed:
+            raise CommandError('Transitions perdues ou compteurs incohérents')
+        self.stdout.write(self.style.SUCCESS('Aucune transition perdue'))
+
+    def _fill_level_sum(self):
+        counter = DashboardCounter.objects.filter(key=GLOBAL_KEY).first()
+        return counter.fill_level_sum if counter else 0
@@ -0,0 +1,232 @@
+import json
+import random
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from smartbin.alerts import check_silent_bins
+from smartbin.models import (
+    Alert, BinForecast, BinReport, Collection, SmartBin, TriCenter, User, WasteFlow, Zone
+)
+
+# Requêtes chaudes rejouées : listes de l'API avec les filtres et les
+# querysets par rôle réellement utilisés, puis les traitements périodiques.
+# {zone}, {center}, {since} et {until} sont remplacés après le peuplement.
+API_PATTERNS = [
+    ('bacs actifs par niveau', 'admin', '/api/bins/?status=active&fill_level=90'),
+    ("bacs d'une zone", 'admin', '/api/bins/?zone={zone}'),
+    ('bacs bientôt pleins', 'admin', '/api/bins/?full_before={until}'),
+    ('bacs pleins', 'admin', '/api/bins/?fill_band=full'),
+    ('bacs par remplissage', 'admin', '/api/bins/?ordering=-fill_level'),
+    ('alertes ouvertes', 'admin', '/api/alerts/?is_resolved=false'),
+    ('alertes ouvertes graves', 'admin', '/api/alerts/?is_resolved=false&severity=high'),
+    ('alertes de la zone (citoyen)', 'citizen', '/api/alerts/'),
+    ('signalements en attente', 'admin', '/api/reports/?status=pending'),
+    ('signalements de la zone (citoyen)', 'citizen', '/api/reports/'),
+    ('collectes du collecteur', 'collector', '/api/collections/'),
+    ('collectes sur une période', 'admin', '/api/collections/?date_after={since}&date_before={until}'),
+    ('flux par type et période', 'admin',
+     '/api/waste-flows/?waste_type=plastic&processing_date_after={since}&processing_date_before={until}'),
+    ('flux anormaux', 'admin', '/api/waste-flows/?anomaly_detected=true'),
+    ("flux d'un centre", 'admin', '/api/waste-flows/?tri_center={center}'),
+]
+
+# Tables peuplées, analysées avant les EXPLAIN
+SEEDED_MODELS = (Alert, BinForecast, BinReport, Collection, SmartBin, TriCenter, User, WasteFlow, Zone)
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue les requêtes chaudes (listes filtrées de l'API, querysets par "
+        "rôle, bacs silencieux) sur une base peuplée, les passe à EXPLAIN et "
+        "signale les parcours séquentiels de tables volumineuses. Sous "
+        "PostgreSQL, les plans sont calculés avec enable_seqscan=off : un "
+        "parcours séquentiel restant désigne une requête sans index "
+        "utilisable, quelle que soit la taille des tables. Avec --check, code "
+        "de sortie non nul si une requête en fait un. Les données créées sont "
+        "annulées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Bacs créés ; alertes, collectes et flux du même ordre")
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="Taille à partir de laquelle un parcours séquentiel est signalé")
+        parser.add_argument('--check', action='store_true')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f"Base non prise en charge : {connection.vendor}")
+        with transaction.atomic():
+            context = self._seed(random.Random(options['seed']), options['rows'])
+            self._analyze()
+            sizes = {}
+            results = [
+                (label, self._explain(queries, sizes))
+                for label, queries in self._replay(context)
+            ]
+            transaction.set_rollback(True)
+
+        failures = []
+        self.stdout.write(f"{'requête':<40}{'SQL':>5}  parcours séquentiels")
+        for label, plans in results:
+            scans = sorted({
+                table for _, tables in plans for table in tables
+                if sizes[table] >= options['min_rows']
+            })
+            self.stdout.write(f"{label:<40}{len(plans):>5}  {', '.join(scans) or '-'}")
+            if scans:
+                failures.append(label)
+            if options['verbosity'] >= 2:
+                for plan, _ in plans:
+                    self.stdout.write(f"    {plan}")
+        if failures and options['check']:
+            raise CommandError(f"Parcours séquentiels : {', '.join(failures)}")
+        if not failures:
+            self.stdout.write(self.style.SUCCESS('Aucun parcours séquentiel sur les requêtes chaudes'))
+
+    def _seed(self, rng, rows):
+        now = timezone.now()
+        zones = Zone.objects.bulk_create([Zone(name=f'advisor-{i}') for i in range(50)])
+        admin = User.objects.create(username='advisor-admin', role='admin', is_staff=True, is_superuser=True)
+        citizen = User.objects.create(username='advisor-citizen', role='citizen', zone=zones[0])
+        collectors = User.objects.bulk_create([
+            User(username=f'advisor-collector-{i}', role='collector') for i in range(50)
+        ])
+        centers = TriCenter.objects.bulk_create([
+            TriCenter(name=f'advisor-{i}', address='-', gps_lat=5.3, gps_lng=-4.0,
+                      email_contact='advisor@example.com', phone='-', total_capacity=10000)
+            for i in range(20)
+        ])
+        bins = SmartBin.objects.bulk_create([
+            SmartBin(
+                id=f'advisor-{i}', location='-', latitude=5.3, longitude=-4.0,
+                zone=rng.choice(zones), fill_level=rng.randint(0, 100),
+                status='active' if rng.random() < 0.9 else rng.choice(['maintenance', 'inactive']),
+                # Quelques bacs silencieux depuis plusieurs jours
+                last_reading_at=now - timedelta(hours=rng.uniform(72, 240) if rng.random() < 0.02 else rng.uniform(0, 2)),
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+        BinForecast.objects.bulk_create([
+            BinForecast(bin=bin, predicted_full_at=now + timedelta(days=rng.uniform(0, 30)), fitted_at=now)
+            for bin in bins
+        ], batch_size=5000)
+        alert_types = ['high_fill', 'low_battery', 'no_reading', 'level_jump']
+        Alert.objects.bulk_create([
+            Alert(
+                bin=bin, type=alert_type, severity=rng.choice(['low', 'medium', 'high']),
+                message='-', is_resolved=rng.random() < 0.95,
+            )
+            for bin in bins for alert_type in rng.sample(alert_types, rng.randint(0, 3))
+        ], batch_size=5000)
+        BinReport.objects.bulk_create([
+            BinReport(
+                bin=rng.choice(bins), reporter=citizen, issue_type='full', message='-',
+                status='pending' if rng.random() < 0.05 else 'completed',
+            )
+            for _ in range(rows // 2)
+        ], batch_size=5000)
+        Collection.objects.bulk_create([
+            Collection(bin=rng.choice(bins), collector=rng.choice(collectors),
+                       date=now - timedelta(days=rng.uniform(0, 365)))
+            for _ in range(rows)
+        ], batch_size=5000)
+        WasteFlow.objects.bulk_create([
+            WasteFlow(
+                tri_center=rng.choice(centers), processing_date=now - timedelta(days=rng.uniform(0, 365)),
+                waste_type=rng.choice(WasteFlow.WASTE_TYPES)[0], quantity_kg=rng.uniform(10, 500),
+                recycling_rate=rng.uniform(0, 100), anomaly_detected=rng.random() < 0.01,
+            )
+            for _ in range(rows)
+        ], batch_size=5000)
+        return {
+            'now': now,
+            'users': {'admin': admin, 'citizen': citizen, 'collector': collectors[0]},
+            'values': {
+                'zone': zones[1].pk,
+                'center': centers[0].pk,
+                'since': (now - timedelta(days=7)).date().isoformat(),
+                'until': (now + timedelta(days=1)).date().isoformat(),
+            },
+        }
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in SEEDED_MODELS)
+                cursor.execute(f'ANALYZE {tables}')
+                # Jusqu'à la fin de la transaction
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            else:
+                cursor.execute('ANALYZE')
+
+    def _replay(self, context):
+        """(libellé, [(sql, params)]) des SELECT exécutés par chaque requête chaude."""
+        for label, role, path in API_PATTERNS:
+            client = APIClient()
+            client.force_authenticate(user=context['users'][role])
+            url = path.format(**context['values'])
+            queries, response = self._capture(lambda: client.get(url))
+            if response.status_code != 200:
+                raise CommandError(f'{url} : HTTP {response.status_code}')
+            yield label, queries
+        queries, _ = self._capture(lambda: check_silent_bins(context['now']))
+        yield 'bacs silencieux', queries
+
+    def _capture(self, run):
+        queries = []
+
+        def collect(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            result = run()
+        return queries, result
+
+    def _explain(self, queries, sizes):
+        """[(plan résumé, tables parcourues séquentiellement)] ; complète sizes."""
+        plans = []
+        tables = set(connection.introspection.table_names())
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    nodes = list(_pg_nodes(plan[0]['Plan']))
+                    scanned = {node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'}
+                    summary = ' > '.join(
+                        f"{node['Node Type']}"
+                        + (f" {node['Relation Name']}" if 'Relation Name' in node else '')
+                        + (f" ({node['Index Name']})" if 'Index Name' in node else '')
+                        for node in nodes
+                    )
+                else:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                    details = [row[3] for row in cursor.fetchall()]
+                    # Les alias (T3...) des auto-jointures ne sont pas des tables
+                    scanned = {
+                        match.group(1) for match in map(SQLITE_SCAN.match, details) if match
+                    } & tables
+                    summary = ' > '.join(details)
+                for table in scanned - sizes.keys():
+                    cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                    sizes[table] = cursor.fetchone()[0]
+                plans.append((summary, scanned))
+        return plans
+
+
+def _pg_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _pg_nodes(child)
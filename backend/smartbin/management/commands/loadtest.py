@@ -0,0 +1,196 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from smartbin.models import SmartBin, User
+
+DEFAULT_PATHS = ('/api/bins/', '/api/bins/{bin}/', '/api/alerts/', '/api/statistics/')
+# Serveurs comparés sans --url : (libellé, application, classe de worker, vues asynchrones)
+SERVERS = (
+    ('WSGI', 'config.wsgi:application', 'sync', '0'),
+    ('ASGI', 'config.asgi:application', 'uvicorn.workers.UvicornWorker', '1'),
+)
+STARTUP_TIMEOUT = 30
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connexion fermée par le serveur')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    keep_alive = headers.get('connection') != 'close'
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        keep_alive = False
+    return int(status_line.split()[1]), keep_alive
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge des chemins de lecture de l'API : connexions HTTP/1.1 "
+        "persistantes, débit (req/s) et latences (p50, p99) par chemin. Sans "
+        "--url, démarre gunicorn en WSGI (workers sync) puis en ASGI (workers "
+        "uvicorn, vues asynchrones) sur la même base pour les comparer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Serveur déjà démarré, par exemple http://127.0.0.1:8000")
+        parser.add_argument('--user', required=True, help="Utilisateur dont le jeton authentifie les requêtes")
+        parser.add_argument(
+            '--path', action='append',
+            help="Chemin à charger (répétable) ; {bin} est remplacé par un identifiant de bac",
+        )
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--duration', type=float, default=10.0, help="Secondes de mesure par serveur")
+        parser.add_argument('--workers', type=int, default=2, help="Workers gunicorn des serveurs démarrés")
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['user']}")
+        token = str(RefreshToken.for_user(user).access_token)
+        paths = self._paths(options['path'] or DEFAULT_PATHS)
+        self.stdout.write(
+            f"{len(paths)} chemins, {options['concurrency']} connexions, "
+            f"{options['duration']:.0f} s par serveur"
+        )
+        if options['url']:
+            host, _, port = options['url'].split('://')[-1].rstrip('/').partition(':')
+            self._report('serveur', self._run(host, int(port or 80), paths, token, options))
+            return
+        for label, app, worker_class, async_views in SERVERS:
+            server = self._start(app, worker_class, async_views, options)
+            try:
+                self._report(label, self._run('127.0.0.1', options['port'], paths, token, options))
+            finally:
+                server.terminate()
+                server.wait()
+
+    def _paths(self, templates):
+        bin_id = SmartBin.objects.order_by('pk').values_list('pk', flat=True).first()
+        paths = []
+        for template in templates:
+            if '{bin}' in template:
+                if bin_id is None:
+                    self.stderr.write(f"Aucun bac : {template} ignoré")
+                    continue
+                template = template.replace('{bin}', bin_id)
+            paths.append(template)
+        if not paths:
+            raise CommandError("Aucun chemin à charger")
+        return paths
+
+    def _start(self, app, worker_class, async_views, options):
+        env = dict(os.environ, SMARTBIN_ASYNC_VIEWS=async_views, GUNICORN_ACCESS_LOG='')
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', '-c', 'config/gunicorn.conf.py',
+                '--bind', f"127.0.0.1:{options['port']}", '--workers', str(options['workers']),
+                '--worker-class', worker_class, '--max-requests', '0', app,
+            ],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn ({app}) s'est arrêté au démarrage")
+            try:
+                socket.create_connection(('127.0.0.1', options['port']), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"gunicorn ({app}) ne répond pas après {STARTUP_TIMEOUT} s")
+
+    def _run(self, host, port, paths, token, options):
+        requests = [
+            (path, (
+                f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                f"Authorization: Bearer {token}\r\nAccept: application/json\r\n\r\n"
+            ).encode())
+            for path in paths
+        ]
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+
+        async def client(offset, deadline):
+            connection = None
+            sent = offset
+            while time.perf_counter() < deadline:
+                path, request = requests[sent % len(requests)]
+                sent += 1
+                start = time.perf_counter()
+                try:
+                    if connection is None:
+                        connection = await asyncio.open_connection(host, port)
+                    reader, writer = connection
+                    writer.write(request)
+                    await writer.drain()
+                    status, keep_alive = await _read_response(reader)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status, keep_alive = None, False
+                if status is not None:
+                    latencies[path].append(time.perf_counter() - start)
+                if status is None or status >= 400:
+                    errors[path] += 1
+                if not keep_alive and connection is not None:
+                    connection[1].close()
+                    connection = None
+            if connection is not None:
+                connection[1].close()
+
+        async def main():
+            # Une passe de chauffe (connexions, caches) avant la mesure
+            await asyncio.gather(*(
+                client(i, time.perf_counter() + 1) for i in range(options['concurrency'])
+            ))
+            latencies.clear()
+            errors.clear()
+            start = time.perf_counter()
+            deadline = start + options['duration']
+            await asyncio.gather(*(client(i, deadline) for i in range(options['concurrency'])))
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(main())
+        return paths, latencies, errors, elapsed
+
+    def _report(self, label, result):
+        paths, latencies, errors, elapsed = result
+        self.stdout.write(f"\n{label}")
+        self.stdout.write(f"{'chemin':<40}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'erreurs':>9}")
+        rows = [(path, latencies[path], errors[path]) for path in paths]
+        rows.append(('total', sum(latencies.values(), []), sum(errors.values())))
+        for path, values, error_count in rows:
+            if values:
+                p50, p99 = np.percentile(values, [50, 99]) * 1000
+                self.stdout.write(
+                    f"{path:<40}{len(values) / elapsed:>9.0f}{p50:>9.1f}{p99:>9.1f}{error_count:>9}"
+                )
+            else:
+                self.stdout.write(f"{path:<40}{0:>9}{'-':>9}{'-':>9}{error_count:>9}")
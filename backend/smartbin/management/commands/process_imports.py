@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from smartbin.imports import run_import
+from smartbin.models import WasteFlowImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite immédiatement les imports de flux (WasteFlowImport) en attente, "
+        "sans attendre les workers (runworkers)."
+    )
+
+    def handle(self, *args, **options):
+        pending = WasteFlowImport.objects.filter(status='pending').order_by('created_at')
+        for job_id in pending.values_list('pk', flat=True):
+            job = run_import(job_id)
+            if job is None:
+                continue
+            self.stdout.write(
+                f'{job.file_name} : {job.status}, {job.created_count} flux créés, '
+                f'{job.duplicate_count} doublons, {job.error_count} erreurs'
+            )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from smartbin.dashboard import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les compteurs du tableau de bord depuis les tables sources, "
+        "signale les écarts avec les valeurs tenues à jour en continu et les "
+        "corrige. À lancer périodiquement (cron, toutes les nuits) et après "
+        "la migration qui crée les compteurs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Signale les écarts sans les corriger",
+        )
+
+    def handle(self, *args, **options):
+        drifts = reconcile(fix=not options['dry_run'])
+        for table, key, stored, expected in drifts:
+            key = ', '.join(str(part) for part in key)
+            if stored is None:
+                self.stdout.write(f'{table} [{key}] : ligne manquante')
+            elif expected is None:
+                self.stdout.write(f'{table} [{key}] : ligne en trop')
+            else:
+                for field, value in stored.items():
+                    if value != expected.get(field, 0):
+                        self.stdout.write(
+                            f'{table} [{key}] {field} : {value} au lieu de {expected.get(field, 0)}'
+                        )
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS('Aucun écart'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifts)} écarts'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(drifts)} écarts corrigés'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from smartbin.forecast import refit
+
+
+class Command(BaseCommand):
+    help = (
+        "Réajuste la prévision de remplissage des bacs ayant reçu des relevés "
+        "ou des collectes depuis le dernier passage. Programmé automatiquement "
+        "après l'ingestion ; à lancer aussi périodiquement (cron, toutes les heures)."
+    )
+
+    def handle(self, *args, **options):
+        fitted = refit()
+        self.stdout.write(f"{fitted} bacs réajustés")
+        self.stdout.write(self.style.SUCCESS('Terminé'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from smartbin.center_statistics import rollup_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Met à jour les statistiques mensuelles et annuelles des centres de tri "
+        "(CenterStatistics) à partir des flux (WasteFlow) créés, modifiés ou "
+        "supprimés depuis le dernier passage. À lancer périodiquement (cron, "
+        "toutes les 15 minutes)."
+    )
+
+    def handle(self, *args, **options):
+        written = rollup_pending()
+        self.stdout.write(self.style.SUCCESS(f'{written} statistiques écrites'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from smartbin.realtime import purge_events
+from smartbin.timeseries import apply_retention, ensure_reading_partitions, rollup_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Crée les partitions mensuelles de BinReading, agrège les relevés en "
+        "min/max/moyenne horaires et journaliers puis applique la rétention "
+        "(relevés, agrégats et journal temps réel). "
+        "À lancer périodiquement (cron, toutes les heures)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-retention', action='store_true',
+            help="Ne supprime ni relevés bruts ni agrégats horaires",
+        )
+
+    def handle(self, *args, **options):
+        for name in ensure_reading_partitions():
+            self.stdout.write(f'Partition créée : {name}')
+
+        written = rollup_pending()
+        self.stdout.write(f'{written} agrégats écrits')
+
+        if not options['no_retention']:
+            purged = apply_retention()
+            for name in purged['partitions']:
+                self.stdout.write(f'Partition supprimée : {name}')
+            self.stdout.write(
+                f"{purged['readings']} relevés bruts et "
+                f"{purged['hourly_rollups']} agrégats horaires supprimés"
+            )
+            self.stdout.write(f'{purge_events()} événements temps réel supprimés')
+        self.stdout.write(self.style.SUCCESS('Terminé'))
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker(stop, burst):
+    # Point d'entrée d'un processus du pool (fork ou spawn)
+    import django
+    django.setup()
+    from smartbin.jobs import work
+
+    # Ctrl+C et SIGTERM sont gérés par le processus principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    work(f'{socket.gethostname()}:{os.getpid()}', stop.is_set, burst)
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance les workers de la file de jobs (modèle Job, voir smartbin/jobs.py). "
+        "Les jobs sont réservés en base avec SELECT ... FOR UPDATE SKIP LOCKED : "
+        "plusieurs instances peuvent tourner en parallèle, sans Redis ni Celery."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1,
+                            help='Nombre de processus (par défaut, un par cœur)')
+        parser.add_argument('--burst', action='store_true',
+                            help="S'arrête quand la file est vide")
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        burst = options['burst']
+        context = multiprocessing.get_context()
+        stop = context.Event()
+
+        def request_stop(*args):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        # Les connexions ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+        pool = {}
+        self.stdout.write(f'{concurrency} workers démarrés')
+        try:
+            while True:
+                for index in range(concurrency):
+                    process = pool.get(index)
+                    if process is not None and (process.is_alive() or process.exitcode == 0 or stop.is_set()):
+                        continue
+                    if process is not None:
+                        self.stderr.write(f'Worker {index} arrêté (code {process.exitcode}), relancé')
+                    pool[index] = context.Process(target=_worker, args=(stop, burst), daemon=True)
+                    pool[index].start()
+                if not any(process.is_alive() for process in pool.values()):
+                    break
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        # Les jobs en cours se terminent avant l'arrêt
+        stop.set()
+        for process in pool.values():
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Workers arrêtés'))
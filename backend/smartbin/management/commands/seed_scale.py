@@ -0,0 +1,527 @@
+import io
+import itertools
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from smartbin import alerts, center_statistics, dashboard, forecast, geo, timeseries
+from smartbin.anomalies import WINDOW
+from smartbin.models import (
+    Alert, AlertRule, BinReading, BinReadingRollup, BinReport, Collection, Payment,
+    PaymentMethod, PaymentPlan, SmartBin, Subscription, TriCenter, User, Watermark, WasteFlow,
+    WasteFlowBaseline, Zone
+)
+from smartbin.response_cache import invalidate
+
+# Ville simulée (Abidjan) : centres des zones tirés dans ce carré (degrés)
+CITY = (5.35, -4.0)
+CITY_SPAN = 0.15
+ZONE_SPREAD = 0.01
+# Bacs simulés puis insérés ensemble, dans une transaction
+BINS_PER_CHUNK = 1000
+SILENT_SHARE = 0.01
+# Pesées par type de déchet : (kg moyen, taux de valorisation moyen en %)
+WASTE_PROFILES = {
+    'plastic': (220, 55), 'glass': (140, 80), 'paper': (180, 70),
+    'metal': (60, 85), 'organic': (400, 35), 'other': (90, 15),
+}
+ANOMALY_SHARE = 0.005
+SUBSCRIBER_SHARE = 0.3
+PLAN_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+DEFAULT_PLANS = (
+    ('Essentiel', 'monthly', Decimal('2000.00')),
+    ('Essentiel', 'quarterly', Decimal('5500.00')),
+    ('Essentiel', 'yearly', Decimal('20000.00')),
+)
+# Colonnes des tuples passés à _copy()
+READING_FIELDS = ('bin_id', 'ts', 'fill_level', 'battery_level')
+ROLLUP_FIELDS = ('bin_id', 'bucket', 'ts', 'count', 'fill_min', 'fill_max', 'fill_avg', 'battery_min')
+COLLECTION_FIELDS = ('bin_id', 'collector_id', 'date', 'notes', 'created_at')
+# Modèles dont les dates de création et de modification sont fournies
+TIMESTAMPED_MODELS = (
+    SmartBin, Collection, Alert, BinReport, WasteFlow, PaymentMethod, Subscription, Payment,
+)
+
+
+@contextmanager
+def _explicit_timestamps(models):
+    # auto_now et auto_now_add écrasent les dates fournies, y compris dans
+    # bulk_create : suspendus le temps de dater l'historique généré
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données à l'échelle de la production sur --days "
+        "jours : zones, utilisateurs, centres de tri, bacs, relevés, collectes, "
+        "alertes, signalements, flux et paiements, insérés par bulk_create en "
+        "lots de --batch-size lignes. Les relevés bruts couvrent la période de "
+        "rétention, les jours plus anciens sont générés en agrégats "
+        "journaliers. Calcule ensuite les données dérivées (agrégats, "
+        "prévisions, compteurs, statistiques des centres). À lancer sur une "
+        "base dédiée ; les données ne sont pas annulées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bins', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--interval', type=int, default=6, help="Heures entre deux relevés (diviseur de 24)")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Lignes par INSERT")
+        parser.add_argument('--prefix', default='SCALE', help="Préfixe des identifiants et noms générés")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if not 1 <= interval <= 24 or 24 % interval:
+            raise CommandError("--interval doit diviser 24")
+        if options['bins'] < 1 or options['days'] < 1:
+            raise CommandError("--bins et --days doivent être positifs")
+        self.prefix = options['prefix']
+        if SmartBin.objects.filter(pk__startswith=f'{self.prefix}-').exists():
+            raise CommandError(
+                f"Des bacs {self.prefix}-… existent déjà : utiliser une base vide ou un autre --prefix"
+            )
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.days = options['days']
+        self.interval = interval
+        self.steps_per_day = 24 // interval
+        self.now = timezone.now()
+        self.start = timeseries.floor_ts(self.now - timedelta(days=self.days), 'day')
+        step_count = int((self.now - self.start) / timedelta(hours=interval)) + 1
+        self.times = [self.start + timedelta(hours=interval * step) for step in range(step_count)]
+        # Relevés bruts sur la période de rétention, à partir d'un début de jour
+        raw_start = timeseries.floor_ts(
+            self.now - timedelta(days=min(self.days, timeseries.RAW_RETENTION_DAYS)), 'day'
+        )
+        self.raw_first = next(step for step, ts in enumerate(self.times) if ts >= raw_start)
+        # Agrégats générés jusqu'à l'heure entamée, comme après rollup_pending
+        self.watermark = timeseries.floor_ts(self.now, 'hour')
+        rules = {rule.condition: rule for rule in AlertRule.objects.filter(is_active=True, zone__isnull=True)}
+        self.fill_rule = rules.get('fill_level')
+        self.battery_rule = rules.get('battery_level')
+
+        started = time.perf_counter()
+        with _explicit_timestamps(TIMESTAMPED_MODELS):
+            self._stage('zones et utilisateurs', self._people, options['bins'])
+            self._stage('centres de tri', self._centers, options['bins'])
+            months = (
+                (self.now.year - raw_start.year) * 12 + self.now.month - raw_start.month
+                + timeseries.PARTITIONS_AHEAD
+            )
+            timeseries.ensure_reading_partitions(now=raw_start, months_ahead=months)
+            self._stage('bacs, relevés, collectes, alertes', self._bins, options['bins'])
+            self._stage('flux des centres de tri', self._flows)
+            self._stage('abonnements et paiements', self._payments)
+        Watermark.objects.get_or_create(name=timeseries.WATERMARK_NAME, defaults={'value': self.watermark})
+        self._stage('prévisions de remplissage', lambda: forecast.refit(now=self.now))
+        self._stage('bacs silencieux', lambda: alerts.check_silent_bins(self.now)['created'])
+        self._stage('compteurs du tableau de bord', lambda: len(dashboard.reconcile(fix=True)))
+        self._stage(
+            'statistiques des centres',
+            lambda: center_statistics.backfill([center.pk for center in self.centers]),
+        )
+        # Passages suivants incrémentaux, comme après rollup_center_statistics
+        Watermark.objects.get_or_create(name=center_statistics.WATERMARK_NAME, defaults={'value': self.now})
+        # bulk_create ne déclenche pas les signaux d'invalidation du cache
+        for instance in (self.zones[0], self.centers[0], *self.plans[:1]):
+            invalidate(instance)
+        self.stdout.write(self.style.SUCCESS(f'Terminé en {time.perf_counter() - started:.0f} s'))
+
+    def _stage(self, label, function, *args):
+        start = time.perf_counter()
+        rows = function(*args)
+        self.stdout.write(f"{label:<36}{rows:>12} lignes {time.perf_counter() - start:>8.1f} s")
+
+    def _insert(self, model, objects):
+        """Insère ``objects`` (itérable, consommé au fur et à mesure) par lots."""
+        count = 0
+        objects = iter(objects)
+        while batch := list(itertools.islice(objects, self.batch_size)):
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            count += len(batch)
+        return count
+
+    def _copy(self, model, fields, rows):
+        """
+        Insère des tuples de valeurs de ``fields`` : COPY sous PostgreSQL,
+        bulk_create sinon. Réservé aux tables les plus volumineuses, dont
+        les valeurs (texte sans tabulation, nombres, dates) se passent de
+        la préparation par les champs du modèle.
+        """
+        if connection.vendor != 'postgresql':
+            return self._insert(model, (model(**dict(zip(fields, row))) for row in rows))
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column) for field in fields
+        )
+        sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN'
+        # Les mêmes instants reviennent pour tous les bacs
+        dates = {}
+
+        def text(value):
+            if value is None:
+                return r'\N'
+            if isinstance(value, datetime):
+                if value not in dates:
+                    dates[value] = value.isoformat()
+                return dates[value]
+            return str(value)
+
+        for start in range(0, len(rows), self.batch_size):
+            buffer = io.StringIO()
+            for row in rows[start:start + self.batch_size]:
+                buffer.write('\t'.join(map(text, row)))
+                buffer.write('\n')
+            buffer.seek(0)
+            with connection.cursor() as cursor:
+                cursor.cursor.copy_expert(sql, buffer)
+        return len(rows)
+
+    def _random_time(self):
+        seconds = float(self.rng.uniform(0, (self.now - self.start).total_seconds()))
+        return self.start + timedelta(seconds=seconds)
+
+    def _people(self, bin_count):
+        rng = self.rng
+        zone_count = max(5, bin_count // 2000)
+        self.zones = Zone.objects.bulk_create([
+            Zone(name=f'{self.prefix} Zone {i}', description='Zone générée') for i in range(zone_count)
+        ])
+        self.zone_centers = np.column_stack([
+            CITY[0] + rng.uniform(-CITY_SPAN, CITY_SPAN, zone_count),
+            CITY[1] + rng.uniform(-CITY_SPAN, CITY_SPAN, zone_count),
+        ])
+        password = make_password(None)
+        username = self.prefix.lower()
+        User.objects.get_or_create(
+            username=f'{username}-admin',
+            defaults={'role': 'admin', 'is_staff': True, 'is_superuser': True, 'password': password},
+        )
+        collectors = User.objects.bulk_create([
+            User(username=f'{username}-collector-{i}', role='collector', password=password,
+                 zone=self.zones[i % zone_count])
+            for i in range(max(zone_count, bin_count // 200))
+        ], batch_size=self.batch_size)
+        self.citizens = User.objects.bulk_create([
+            User(username=f'{username}-citizen-{i}', role='citizen', password=password,
+                 zone=self.zones[i % zone_count])
+            for i in range(max(10, bin_count // 10))
+        ], batch_size=self.batch_size)
+        self.zone_collectors = [[] for _ in range(zone_count)]
+        self.zone_citizens = [[] for _ in range(zone_count)]
+        index = {zone.pk: i for i, zone in enumerate(self.zones)}
+        for user in collectors:
+            self.zone_collectors[index[user.zone_id]].append(user.pk)
+        for user in self.citizens:
+            self.zone_citizens[index[user.zone_id]].append(user.pk)
+        return zone_count + len(collectors) + len(self.citizens) + 1
+
+    def _centers(self, bin_count):
+        rng = self.rng
+        centers = []
+        for i in range(max(3, bin_count // 5000)):
+            lat = CITY[0] + float(rng.uniform(-CITY_SPAN, CITY_SPAN))
+            lng = CITY[1] + float(rng.uniform(-CITY_SPAN, CITY_SPAN))
+            centers.append(TriCenter(
+                name=f'{self.prefix} Centre {i}', address=f'Centre de tri {i}', gps_lat=lat, gps_lng=lng,
+                email_contact=f'centre{i}@example.com', phone='+225 00 00 00 00',
+                total_capacity=int(rng.integers(50, 500)) * 1000, geohash=geo.encode(lat, lng),
+            ))
+        self.centers = TriCenter.objects.bulk_create(centers)
+        return len(centers)
+
+    def _bins(self, bin_count):
+        written = 0
+        for offset in range(0, bin_count, BINS_PER_CHUNK):
+            with transaction.atomic():
+                written += self._bin_chunk(offset, min(BINS_PER_CHUNK, bin_count - offset))
+            if self.verbosity >= 2:
+                self.stdout.write(f'  {offset + BINS_PER_CHUNK} bacs')
+        return written
+
+    def _bin_chunk(self, offset, size):
+        """Simule le remplissage de ``size`` bacs sur la période puis les insère."""
+        rng = self.rng
+        hours = self.interval
+        step_count = len(self.times)
+        ids = [f'{self.prefix}-{i:07d}' for i in range(offset, offset + size)]
+        zones = rng.integers(len(self.zones), size=size)
+        positions = self.zone_centers[zones] + rng.normal(0, ZONE_SPREAD, (size, 2))
+        # Points de remplissage par heure : un bac plein en 3 à 15 jours
+        rates = rng.lognormal(np.log(0.6), 0.5, size)
+        levels = rng.uniform(0, 60, size)
+        battery = rng.uniform(30, 100, size)
+        drain = rng.uniform(0.005, 0.03, size)
+        silent_from = np.full(size, step_count)
+        silent = rng.random(size) < SILENT_SHARE
+        silent_from[silent] = step_count - rng.integers(
+            self.steps_per_day, 10 * self.steps_per_day, silent.sum()
+        )
+
+        last_step = np.full(size, -1)
+        last_level = np.zeros(size, dtype=int)
+        last_battery = np.zeros(size, dtype=int)
+        last_collection = [None] * size
+        open_alerts = {}
+        day = {
+            'count': np.zeros(size, dtype=int), 'sum': np.zeros(size),
+            'min': np.full(size, 101), 'max': np.full(size, -1), 'battery': np.full(size, 101),
+        }
+        readings, rollups, collections, alert_rows = [], [], [], []
+
+        def close_day(step):
+            day_ts = self.times[step - step % self.steps_per_day]
+            rollups.extend(
+                (ids[i], 'day', day_ts, int(day['count'][i]), int(day['min'][i]), int(day['max'][i]),
+                 float(day['sum'][i] / day['count'][i]), int(day['battery'][i]))
+                for i in np.nonzero(day['count'])[0].tolist()
+            )
+            day['count'][:] = 0
+            day['sum'][:] = 0
+            day['min'][:] = 101
+            day['max'][:] = -1
+            day['battery'][:] = 101
+
+        for step, ts in enumerate(self.times):
+            weekend = 1.5 if timezone.localtime(ts).weekday() >= 5 else 1.0
+            levels += rates * hours * weekend + rng.normal(0, 1, size)
+            np.clip(levels, 0, 100, out=levels)
+            battery -= drain * hours
+            reporting = step < silent_from
+            level_values = np.rint(levels).astype(int)
+            battery_values = np.rint(np.clip(battery, 0, 100)).astype(int)
+            reported = np.nonzero(reporting)[0]
+            last_step[reported] = step
+            last_level[reported] = level_values[reported]
+            last_battery[reported] = battery_values[reported]
+
+            values = list(zip(
+                reported.tolist(), level_values[reported].tolist(), battery_values[reported].tolist()
+            ))
+            if step >= self.raw_first:
+                readings.extend((ids[i], ts, level, charge) for i, level, charge in values)
+            # Agrégats de ce que rollup_readings aurait déjà traité : un relevé
+            # par heure au plus, donc un agrégat horaire par relevé
+            if ts < self.watermark:
+                if step >= self.raw_first:
+                    rollups.extend(
+                        (ids[i], 'hour', ts, 1, level, level, float(level), charge)
+                        for i, level, charge in values
+                    )
+                day['count'][reported] += 1
+                day['sum'][reported] += level_values[reported]
+                np.minimum.at(day['min'], reported, level_values[reported])
+                np.maximum.at(day['max'], reported, level_values[reported])
+                np.minimum.at(day['battery'], reported, battery_values[reported])
+                if step % self.steps_per_day == self.steps_per_day - 1:
+                    close_day(step)
+            elif day['count'].any():
+                close_day(step - 1)
+
+            # Alertes ouvertes au franchissement des seuils des règles par défaut
+            for rule, values in ((self.fill_rule, level_values), (self.battery_rule, battery_values)):
+                if rule is None:
+                    continue
+                triggered = alerts.OPERATORS[rule.operator](values, rule.threshold) & reporting
+                for i in np.nonzero(triggered)[0].tolist():
+                    alert = open_alerts.get((i, rule.pk))
+                    if alert is None:
+                        open_alerts[i, rule.pk] = Alert(
+                            bin_id=ids[i], rule=rule, type=rule.alert_type, severity=rule.severity,
+                            message=alerts.alert_message(rule, ids[i], float(values[i])),
+                            created_at=ts, last_seen_at=ts,
+                        )
+                    else:
+                        alert.occurrences += 1
+                        alert.last_seen_at = ts
+
+            # Collecte des bacs presque pleins, systématique au-delà de 95 %
+            due = (levels >= 95) | ((levels >= 80) & (rng.random(size) < 0.3))
+            for i in np.nonzero(due)[0].tolist():
+                collectors = self.zone_collectors[zones[i]]
+                date = min(ts + timedelta(minutes=int(rng.integers(0, hours * 60))), self.now)
+                collections.append((ids[i], collectors[rng.integers(len(collectors))], date, '', date))
+                last_collection[i] = date
+                if self.fill_rule is not None:
+                    self._resolve(open_alerts, alert_rows, i, self.fill_rule, date)
+            levels[due] = rng.uniform(0, 5, due.sum())
+            # Remplacement des piles presque vides
+            replaced = battery < 5
+            if self.battery_rule is not None:
+                for i in np.nonzero(replaced)[0].tolist():
+                    self._resolve(open_alerts, alert_rows, i, self.battery_rule, ts)
+            battery[replaced] = 100
+
+        alert_rows.extend(open_alerts.values())
+        bins = []
+        for i, bin_id in enumerate(ids):
+            lat, lng = positions[i].tolist()
+            last_reading_at = self.times[last_step[i]] if last_step[i] >= 0 else None
+            bins.append(SmartBin(
+                id=bin_id, location=f'{self.zones[zones[i]].name}, emplacement {offset + i}',
+                latitude=lat, longitude=lng, zone=self.zones[zones[i]], geohash=geo.encode(lat, lng),
+                fill_level=int(last_level[i]), battery_level=int(last_battery[i]),
+                status=str(rng.choice(['active', 'maintenance', 'inactive'], p=[0.95, 0.03, 0.02])),
+                last_collection=last_collection[i], last_reading_at=last_reading_at,
+                fill_level_since=last_reading_at,
+                created_at=self.start - timedelta(days=1), updated_at=last_reading_at or self.start,
+            ))
+        if day['count'].any():
+            close_day(len(self.times) - 1)
+        written = self._insert(SmartBin, bins)
+        written += self._copy(BinReading, READING_FIELDS, readings)
+        written += self._copy(BinReadingRollup, ROLLUP_FIELDS, rollups)
+        written += self._copy(Collection, COLLECTION_FIELDS, collections)
+        written += self._insert(Alert, alert_rows)
+        written += self._insert(BinReport, self._reports(ids, zones))
+        return written
+
+    def _resolve(self, open_alerts, alert_rows, i, rule, ts):
+        alert = open_alerts.pop((i, rule.pk), None)
+        if alert is not None:
+            alert.is_resolved = True
+            alert.resolved_at = ts
+            alert_rows.append(alert)
+
+    def _reports(self, ids, zones):
+        rng = self.rng
+        issue_types = [value for value, _ in BinReport.ISSUE_TYPES]
+        # Un signalement par bac tous les 100 jours en moyenne
+        for _ in range(rng.poisson(len(ids) * self.days / 100)):
+            i = int(rng.integers(len(ids)))
+            citizens = self.zone_citizens[zones[i]] or [self.citizens[0].pk]
+            created_at = self._random_time()
+            if self.now - created_at < timedelta(days=3):
+                status = 'pending'
+            else:
+                status = 'completed' if rng.random() < 0.9 else 'failed'
+            resolved = status != 'pending'
+            yield BinReport(
+                bin_id=ids[i], reporter_id=citizens[rng.integers(len(citizens))],
+                issue_type=str(rng.choice(issue_types)), status=status, message='Signalement généré',
+                is_resolved=resolved, created_at=created_at,
+                resolved_at=created_at + timedelta(hours=float(rng.uniform(2, 72))) if resolved else None,
+            )
+
+    def _flows(self):
+        rng = self.rng
+        series = {}
+        flows = []
+        for center in self.centers:
+            for day in range(self.days + 1):
+                day_start = self.start + timedelta(days=day)
+                for waste_type, (mean_kg, mean_rate) in WASTE_PROFILES.items():
+                    if rng.random() > 0.7:
+                        continue
+                    processing_date = day_start + timedelta(hours=float(rng.uniform(8, 18)))
+                    if processing_date > self.now:
+                        continue
+                    quantity = float(rng.lognormal(np.log(mean_kg), 0.35))
+                    rate = float(np.clip(rng.normal(mean_rate, 8), 0, 100))
+                    anomaly = rng.random() < ANOMALY_SHARE
+                    if anomaly:
+                        quantity *= float(rng.uniform(4, 8))
+                    flows.append(WasteFlow(
+                        tri_center=center, processing_date=processing_date, waste_type=waste_type,
+                        quantity_kg=round(quantity, 1), recycling_rate=round(rate, 1),
+                        anomaly_detected=anomaly, updated_at=processing_date,
+                    ))
+                    series.setdefault((center.pk, waste_type), []).append(flows[-1])
+        written = self._insert(WasteFlow, flows)
+        # Référence de la détection des pesées anormales : dernières pesées de chaque série
+        written += self._insert(WasteFlowBaseline, (
+            WasteFlowBaseline(
+                tri_center_id=center_id, waste_type=waste_type, count=len(members),
+                quantities=[flow.quantity_kg for flow in members[-WINDOW:]],
+                recycling_rates=[flow.recycling_rate for flow in members[-WINDOW:]],
+            )
+            for (center_id, waste_type), members in series.items()
+        ))
+        return written
+
+    def _payments(self):
+        rng = self.rng
+        self.plans = list(PaymentPlan.objects.filter(is_active=True))
+        if not self.plans:
+            self.plans = PaymentPlan.objects.bulk_create([
+                PaymentPlan(
+                    name=name, description=f'Formule {name.lower()}', price=price,
+                    plan_type=plan_type, features=['Collecte hebdomadaire', 'Signalements prioritaires'],
+                )
+                for name, plan_type, price in DEFAULT_PLANS
+            ])
+        payment_types = [value for value, _ in PaymentMethod.PAYMENT_TYPES]
+        subscribers = [user for user in self.citizens if rng.random() < SUBSCRIBER_SHARE]
+        methods = []
+        for i, user in enumerate(subscribers):
+            created_at = self._random_time()
+            methods.append(PaymentMethod(
+                user=user, payment_type=str(rng.choice(payment_types)), account_number=f'{self.prefix}-{i:07d}',
+                is_default=True, is_verified=True, created_at=created_at, updated_at=created_at,
+            ))
+        methods = PaymentMethod.objects.bulk_create(methods, batch_size=self.batch_size)
+
+        subscriptions, periods = [], []
+        for method in methods:
+            plan = self.plans[rng.integers(len(self.plans))]
+            length = timedelta(days=round(30.44 * PLAN_MONTHS.get(plan.plan_type, 1)))
+            start = method.created_at
+            renewals = None if rng.random() < 0.8 else int(rng.integers(1, 4))
+            bounds = []
+            while start <= self.now and (renewals is None or len(bounds) < renewals):
+                bounds.append(start)
+                start += length
+            if renewals is None:
+                status = 'active'
+            else:
+                status = 'cancelled' if rng.random() < 0.5 else 'expired'
+                if start > self.now:
+                    status = 'active'
+            subscriptions.append(Subscription(
+                user_id=method.user_id, payment_plan=plan, payment_method=method, status=status,
+                start_date=bounds[0], end_date=start, auto_renew=renewals is None,
+                created_at=bounds[0], updated_at=bounds[-1],
+            ))
+            periods.append(bounds)
+        subscriptions = Subscription.objects.bulk_create(subscriptions, batch_size=self.batch_size)
+
+        def payments():
+            for subscription, bounds in zip(subscriptions, periods):
+                for k, paid_at in enumerate(bounds):
+                    fields = {
+                        'subscription': subscription, 'amount': subscription.payment_plan.price,
+                        'payment_method_id': subscription.payment_method_id,
+                    }
+                    reference = f'{self.prefix}-{subscription.pk}-{k}'
+                    if rng.random() < 0.05:
+                        # Échec, puis nouvel essai réussi le lendemain
+                        yield Payment(
+                            **fields, status='failed', transaction_id=f'{reference}-f',
+                            error_message='Solde insuffisant', created_at=paid_at, updated_at=paid_at,
+                        )
+                        paid_at = min(paid_at + timedelta(days=1), self.now)
+                    yield Payment(
+                        **fields, status='completed', transaction_id=reference, payment_date=paid_at,
+                        created_at=paid_at, updated_at=paid_at,
+                    )
+
+        return len(methods) + len(subscriptions) + self._insert(Payment, payments())
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smartbin",
+            name="battery_level",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="smartbin",
+            name="last_reading_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
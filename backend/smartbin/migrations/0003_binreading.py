@@ -0,0 +1,143 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+POSTGRESQL_READING_TABLE = [
+    """
+    CREATE TABLE smartbin_binreading (
+        id bigserial NOT NULL,
+        bin_id varchar(50) NOT NULL
+            REFERENCES smartbin_smartbin (id) DEFERRABLE INITIALLY DEFERRED,
+        ts timestamp with time zone NOT NULL,
+        fill_level integer NOT NULL,
+        battery_level integer NULL,
+        PRIMARY KEY (id, ts)
+    ) PARTITION BY RANGE (ts)
+    """,
+    "CREATE INDEX binreading_bin_ts_idx ON smartbin_binreading (bin_id, ts)",
+    "CREATE TABLE smartbin_binreading_default PARTITION OF smartbin_binreading DEFAULT",
+]
+
+
+def create_reading_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in POSTGRESQL_READING_TABLE:
+            schema_editor.execute(statement)
+    else:
+        schema_editor.create_model(apps.get_model("smartbin", "BinReading"))
+
+
+def drop_reading_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP TABLE smartbin_binreading CASCADE")
+    else:
+        schema_editor.delete_model(apps.get_model("smartbin", "BinReading"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0002_smartbin_telemetry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Watermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("value", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BinReadingRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.CharField(
+                        choices=[("hour", "Horaire"), ("day", "Journalier")],
+                        max_length=4,
+                    ),
+                ),
+                ("ts", models.DateTimeField(help_text="Début de l'intervalle")),
+                ("count", models.IntegerField()),
+                ("fill_min", models.IntegerField()),
+                ("fill_max", models.IntegerField()),
+                ("fill_avg", models.FloatField()),
+                ("battery_min", models.IntegerField(blank=True, null=True)),
+                (
+                    "bin",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reading_rollups",
+                        to="smartbin.smartbin",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("bin", "bucket", "ts")},
+            },
+        ),
+        # Sous PostgreSQL la table est partitionnée par mois sur ``ts`` : la clé
+        # primaire doit alors inclure la clé de partitionnement. Les partitions
+        # mensuelles sont créées par ``manage.py rollup_readings``, la partition
+        # par défaut recueille les relevés hors des mois déjà créés.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="BinReading",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        ("ts", models.DateTimeField()),
+                        ("fill_level", models.IntegerField()),
+                        ("battery_level", models.IntegerField(blank=True, null=True)),
+                        (
+                            "bin",
+                            models.ForeignKey(
+                                db_index=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="readings",
+                                to="smartbin.smartbin",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "indexes": [
+                            models.Index(
+                                fields=["bin", "ts"], name="binreading_bin_ts_idx"
+                            )
+                        ],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_reading_table, drop_reading_table),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0003_binreading"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                fields=["created_at", "id"], name="alert_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="binreport",
+            index=models.Index(
+                fields=["created_at", "id"], name="binreport_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="centerstatistics",
+            index=models.Index(
+                fields=["period", "id"], name="centerstats_period_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collection",
+            index=models.Index(
+                fields=["created_at", "id"], name="collection_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collectionroute",
+            index=models.Index(
+                fields=["created_at", "id"], name="route_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smartbin",
+            index=models.Index(
+                fields=["created_at", "id"], name="smartbin_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tricenter",
+            index=models.Index(
+                fields=["created_at", "id"], name="tricenter_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["date_joined", "id"], name="user_joined_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="wasteflow",
+            index=models.Index(
+                fields=["processing_date", "id"], name="wasteflow_processing_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="zone",
+            index=models.Index(fields=["created_at", "id"], name="zone_created_id_idx"),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0004_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteStop",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveIntegerField()),
+                (
+                    "trip",
+                    models.PositiveIntegerField(
+                        help_text="Numéro du trajet entre deux déchargements"
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("depot", "Dépôt"),
+                            ("bin", "Poubelle"),
+                            ("tri_center", "Centre de tri"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                (
+                    "load_kg",
+                    models.FloatField(help_text="Charge du camion après l'arrêt"),
+                ),
+                (
+                    "distance_km",
+                    models.FloatField(help_text="Distance depuis l'arrêt précédent"),
+                ),
+                (
+                    "bin",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="smartbin.smartbin",
+                    ),
+                ),
+                (
+                    "route",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stops",
+                        to="smartbin.collectionroute",
+                    ),
+                ),
+                (
+                    "tri_center",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="smartbin.tricenter",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["route", "sequence"],
+                "unique_together": {("route", "sequence")},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+from smartbin.geo import encode
+
+BATCH_SIZE = 2000
+
+
+def backfill_geohash(apps, schema_editor):
+    for model_name, lat_field, lng_field in (
+        ("SmartBin", "latitude", "longitude"),
+        ("TriCenter", "gps_lat", "gps_lng"),
+    ):
+        model = apps.get_model("smartbin", model_name)
+        batch = []
+        for instance in model.objects.only("pk", lat_field, lng_field).iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            instance.geohash = encode(
+                getattr(instance, lat_field), getattr(instance, lng_field)
+            )
+            batch.append(instance)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, ["geohash"])
+                batch = []
+        model.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0005_routestop"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smartbin",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="tricenter",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=12
+            ),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_counter_rows(apps, schema_editor):
+    # Lignes à zéro ; ``manage.py reconcile_statistics`` les remplit
+    DashboardCounter = apps.get_model("smartbin", "DashboardCounter")
+    Zone = apps.get_model("smartbin", "Zone")
+    DashboardCounter.objects.bulk_create(
+        [DashboardCounter(key="global")]
+        + [
+            DashboardCounter(key=f"zone:{zone.pk}", zone=zone)
+            for zone in Zone.objects.all()
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0006_geohash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectorActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("collection_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CollectorBin",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_collected_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DashboardCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=30, unique=True)),
+                ("bin_count", models.IntegerField(default=0)),
+                ("fill_level_sum", models.BigIntegerField(default=0)),
+                ("collection_count", models.BigIntegerField(default=0)),
+                ("alert_count", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="zone",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="users",
+                to="smartbin.zone",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collection",
+            index=models.Index(
+                fields=["collector", "bin", "date"], name="collection_collector_bin_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardcounter",
+            name="zone",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="counters",
+                to="smartbin.zone",
+            ),
+        ),
+        migrations.AddField(
+            model_name="collectorbin",
+            name="bin",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="smartbin.smartbin"
+            ),
+        ),
+        migrations.AddField(
+            model_name="collectorbin",
+            name="collector",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="collected_bins",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="collectoractivity",
+            name="collector",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="collection_days",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collectorbin",
+            index=models.Index(
+                fields=["collector", "last_collected_at"], name="collectorbin_last_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="collectorbin",
+            unique_together={("collector", "bin")},
+        ),
+        migrations.AlterUniqueTogether(
+            name="collectoractivity",
+            unique_together={("collector", "day")},
+        ),
+        migrations.RunPython(create_counter_rows, migrations.RunPython.noop),
+    ]
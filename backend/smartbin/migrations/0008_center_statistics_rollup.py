@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0007_dashboard_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CenterStatisticsDirty",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tri_center_id", models.UUIDField()),
+                ("period", models.DateField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="wasteflow",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name="wasteflow",
+            index=models.Index(
+                fields=["tri_center", "processing_date"],
+                name="wasteflow_center_date_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="centerstatisticsdirty",
+            unique_together={("tri_center_id", "period")},
+        ),
+    ]
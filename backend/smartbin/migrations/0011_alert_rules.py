@@ -0,0 +1,197 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def resolve_duplicate_alerts(apps, schema_editor):
+    # Une seule alerte ouverte par bac et par type : la plus récente est gardée
+    Alert = apps.get_model("smartbin", "Alert")
+    kept = set()
+    duplicates = []
+    for pk, bin_id, alert_type in (
+        Alert.objects.filter(is_resolved=False)
+        .order_by("-created_at", "-pk")
+        .values_list("pk", "bin_id", "type")
+        .iterator()
+    ):
+        if (bin_id, alert_type) in kept:
+            duplicates.append(pk)
+        else:
+            kept.add((bin_id, alert_type))
+    Alert.objects.filter(pk__in=duplicates).update(
+        is_resolved=True, resolved_at=timezone.now()
+    )
+
+
+def create_default_rules(apps, schema_editor):
+    AlertRule = apps.get_model("smartbin", "AlertRule")
+    AlertRule.objects.bulk_create(
+        [
+            AlertRule(
+                name="Bac plein",
+                condition="fill_level",
+                operator="gt",
+                threshold=90,
+                consecutive=2,
+                alert_type="fill_level",
+                severity="high",
+            ),
+            AlertRule(
+                name="Batterie faible",
+                condition="battery_level",
+                operator="lt",
+                threshold=15,
+                alert_type="battery",
+                severity="medium",
+                cooldown_minutes=24 * 60,
+            ),
+            AlertRule(
+                name="Capteur muet",
+                condition="no_reading",
+                threshold=6,
+                alert_type="no_reading",
+                severity="medium",
+                cooldown_minutes=6 * 60,
+            ),
+            AlertRule(
+                name="Vidage sans collecte",
+                condition="level_drop",
+                operator="gte",
+                threshold=40,
+                alert_type="level_drop",
+                severity="high",
+            ),
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0010_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "condition",
+                    models.CharField(
+                        choices=[
+                            ("fill_level", "Niveau de remplissage"),
+                            ("battery_level", "Niveau de batterie"),
+                            ("level_drop", "Baisse de niveau sans collecte"),
+                            ("no_reading", "Absence de relevé"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "operator",
+                    models.CharField(
+                        choices=[("gt", ">"), ("gte", "≥"), ("lt", "<"), ("lte", "≤")],
+                        default="gt",
+                        max_length=3,
+                    ),
+                ),
+                (
+                    "threshold",
+                    models.FloatField(
+                        help_text="Niveau (%), baisse (points) ou durée sans relevé (heures)"
+                    ),
+                ),
+                (
+                    "consecutive",
+                    models.PositiveSmallIntegerField(
+                        default=1,
+                        help_text="Nombre de relevés consécutifs vérifiant la condition",
+                    ),
+                ),
+                ("alert_type", models.CharField(max_length=50)),
+                (
+                    "severity",
+                    models.CharField(
+                        choices=[
+                            ("low", "Faible"),
+                            ("medium", "Moyenne"),
+                            ("high", "Haute"),
+                        ],
+                        default="medium",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "message",
+                    models.CharField(
+                        blank=True,
+                        help_text="Gabarit du message : {bin}, {value}, {threshold}",
+                        max_length=200,
+                    ),
+                ),
+                ("cooldown_minutes", models.PositiveIntegerField(default=60)),
+                ("is_active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="alert",
+            name="last_seen_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="alert",
+            name="occurrences",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                fields=["bin", "created_at"], name="alert_bin_created_idx"
+            ),
+        ),
+        migrations.RunPython(resolve_duplicate_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="alert",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_resolved", False)),
+                fields=("bin", "type"),
+                name="alert_open_bin_type_uniq",
+            ),
+        ),
+        migrations.AddField(
+            model_name="alertrule",
+            name="zone",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Toutes les zones si vide",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="smartbin.zone",
+            ),
+        ),
+        migrations.AddField(
+            model_name="alert",
+            name="rule",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="smartbin.alertrule",
+            ),
+        ),
+        migrations.RunPython(create_default_rules, migrations.RunPython.noop),
+    ]
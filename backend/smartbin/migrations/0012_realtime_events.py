@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:29
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0011_alert_rules"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RealtimeEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("bins", "Bacs"), ("alerts", "Alertes")], max_length=10
+                    ),
+                ),
+                (
+                    "payload",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "zone",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="smartbin.zone",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0012_realtime_events"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BinForecast",
+            fields=[
+                (
+                    "bin",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="forecast",
+                        serialize=False,
+                        to="smartbin.smartbin",
+                    ),
+                ),
+                (
+                    "hours",
+                    models.JSONField(
+                        default=list, help_text="Durée observée par jour (heures)"
+                    ),
+                ),
+                (
+                    "rise",
+                    models.JSONField(
+                        default=list, help_text="Hausse cumulée par jour (points)"
+                    ),
+                ),
+                (
+                    "rise_sq",
+                    models.JSONField(
+                        default=list, help_text="Somme des hausses² / durée, par jour"
+                    ),
+                ),
+                ("samples", models.FloatField(default=0)),
+                ("last_ts", models.DateTimeField(blank=True, null=True)),
+                ("last_level", models.IntegerField(blank=True, null=True)),
+                (
+                    "rate",
+                    models.FloatField(
+                        blank=True, help_text="Points par heure", null=True
+                    ),
+                ),
+                (
+                    "predicted_full_at",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+                ("confidence", models.FloatField(blank=True, null=True)),
+                ("fitted_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def init_fill_level_since(apps, schema_editor):
+    # Le niveau actuel est supposé inchangé depuis le dernier relevé
+    SmartBin = apps.get_model("smartbin", "SmartBin")
+    SmartBin.objects.filter(last_reading_at__isnull=False).update(
+        fill_level_since=F("last_reading_at")
+    )
+
+
+def create_default_rules(apps, schema_editor):
+    AlertRule = apps.get_model("smartbin", "AlertRule")
+    AlertRule.objects.bulk_create(
+        [
+            AlertRule(
+                name="Saut de niveau",
+                condition="level_jump",
+                operator="gte",
+                threshold=60,
+                alert_type="level_jump",
+                severity="medium",
+            ),
+            AlertRule(
+                name="Capteur bloqué",
+                condition="stuck",
+                operator="gte",
+                threshold=48,
+                alert_type="stuck",
+                severity="medium",
+                cooldown_minutes=24 * 60,
+            ),
+            AlertRule(
+                name="Pesée anormale",
+                condition="flow_outlier",
+                operator="gte",
+                threshold=5,
+                alert_type="flow_outlier",
+                severity="medium",
+            ),
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0013_bin_forecasts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smartbin",
+            name="fill_level_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="alertrule",
+            name="condition",
+            field=models.CharField(
+                choices=[
+                    ("fill_level", "Niveau de remplissage"),
+                    ("battery_level", "Niveau de batterie"),
+                    ("level_drop", "Baisse de niveau sans collecte"),
+                    ("level_jump", "Saut de niveau"),
+                    ("stuck", "Capteur bloqué"),
+                    ("no_reading", "Absence de relevé"),
+                    ("flow_outlier", "Pesée anormale"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="alertrule",
+            name="threshold",
+            field=models.FloatField(
+                help_text="Niveau (%), baisse ou hausse (points), durée au même niveau ou sans relevé (heures), écart robuste d'une pesée"
+            ),
+        ),
+        migrations.CreateModel(
+            name="WasteFlowBaseline",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "waste_type",
+                    models.CharField(
+                        choices=[
+                            ("plastic", "Plastique"),
+                            ("glass", "Verre"),
+                            ("paper", "Papier"),
+                            ("metal", "Métal"),
+                            ("organic", "Organique"),
+                            ("other", "Autre"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantities", models.JSONField(default=list)),
+                ("recycling_rates", models.JSONField(default=list)),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Pesées vues depuis la création"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "tri_center",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="flow_baselines",
+                        to="smartbin.tricenter",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="wasteflowbaseline",
+            constraint=models.UniqueConstraint(
+                fields=("tri_center", "waste_type"), name="wasteflow_baseline_uniq"
+            ),
+        ),
+        migrations.RunPython(init_fill_level_since, migrations.RunPython.noop),
+        migrations.RunPython(create_default_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,159 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def clamp_out_of_range(apps, schema_editor):
+    # Valeurs saisies avant la validation des champs, ramenées dans les
+    # bornes des contraintes ajoutées ensuite
+    SmartBin = apps.get_model("smartbin", "SmartBin")
+    WasteFlow = apps.get_model("smartbin", "WasteFlow")
+    for model, field, low, high in (
+        (SmartBin, "fill_level", 0, 100),
+        (SmartBin, "battery_level", 0, 100),
+        (WasteFlow, "quantity_kg", 0, None),
+        (WasteFlow, "recycling_rate", 0, 100),
+    ):
+        model.objects.filter(**{f"{field}__lt": low}).update(**{field: low})
+        if high is not None:
+            model.objects.filter(**{f"{field}__gt": high}).update(**{field: high})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0014_anomaly_detection"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="smartbin",
+            name="battery_level",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="smartbin",
+            name="fill_level",
+            field=models.IntegerField(
+                default=0,
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="wasteflow",
+            name="quantity_kg",
+            field=models.FloatField(
+                validators=[django.core.validators.MinValueValidator(0)]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="wasteflow",
+            name="recycling_rate",
+            field=models.FloatField(
+                help_text="Taux de valorisation en %",
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                condition=models.Q(("is_resolved", False)),
+                fields=["created_at", "id"],
+                name="alert_open_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="binreport",
+            index=models.Index(
+                fields=["status", "created_at", "id"],
+                name="binreport_status_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collection",
+            index=models.Index(fields=["date"], name="collection_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="smartbin",
+            index=models.Index(
+                fields=["zone", "created_at", "id"], name="smartbin_zone_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smartbin",
+            index=models.Index(
+                condition=models.Q(("status", "active")),
+                fields=["fill_level"],
+                name="smartbin_active_fill_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smartbin",
+            index=models.Index(
+                fields=["last_reading_at"], name="smartbin_last_reading_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wasteflow",
+            index=models.Index(
+                fields=["waste_type", "processing_date"], name="wasteflow_type_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wasteflow",
+            index=models.Index(
+                condition=models.Q(("anomaly_detected", True)),
+                fields=["processing_date", "id"],
+                name="wasteflow_anomaly_date_idx",
+            ),
+        ),
+        migrations.RunPython(clamp_out_of_range, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="smartbin",
+            constraint=models.CheckConstraint(
+                check=models.Q(("fill_level__gte", 0), ("fill_level__lte", 100)),
+                name="smartbin_fill_level_range",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="smartbin",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("battery_level__isnull", True),
+                    models.Q(("battery_level__gte", 0), ("battery_level__lte", 100)),
+                    _connector="OR",
+                ),
+                name="smartbin_battery_level_range",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="wasteflow",
+            constraint=models.CheckConstraint(
+                check=models.Q(("quantity_kg__gte", 0)),
+                name="wasteflow_quantity_positive",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="wasteflow",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("recycling_rate__gte", 0), ("recycling_rate__lte", 100)
+                ),
+                name="wasteflow_recycling_rate_range",
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:43
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F
+
+from smartbin.geo import encode
+
+
+def merge_legacy_bins(apps, schema_editor):
+    # L'ancien modèle Bin (smartbin/models/bin.py, masqué par models.py)
+    # n'a jamais eu de migration : seule une table créée hors migrations
+    # est reprise. Sans coordonnées, les bacs repris sont inactifs, à
+    # localiser avant remise en service ; la table est conservée.
+    connection = schema_editor.connection
+    if "smartbin_bin" not in connection.introspection.table_names():
+        return
+    SmartBin = apps.get_model("smartbin", "SmartBin")
+    DashboardCounter = apps.get_model("smartbin", "DashboardCounter")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, name, location, capacity, current_level, last_collection FROM smartbin_bin"
+        )
+        rows = cursor.fetchall()
+    existing = set(
+        SmartBin.objects.filter(id__in=[f"bin-{row[0]}" for row in rows]).values_list("id", flat=True)
+    )
+    bins = []
+    for pk, name, location, capacity, current_level, last_collection in rows:
+        if f"bin-{pk}" in existing:
+            continue
+        fill_level = 0
+        if capacity:
+            fill_level = round(min(max(current_level / capacity * 100, 0), 100))
+        bins.append(SmartBin(
+            id=f"bin-{pk}", location=location or name, latitude=0, longitude=0,
+            geohash=encode(0, 0), fill_level=fill_level, capacity=capacity,
+            status="inactive", last_collection=last_collection,
+        ))
+    SmartBin.objects.bulk_create(bins, batch_size=2000)
+    if not bins:
+        return
+    # bulk_create n'émet pas les signaux du tableau de bord : bacs sans zone,
+    # comptés dans la seule ligne globale
+    fill_level_sum = sum(bin.fill_level for bin in bins)
+    if not DashboardCounter.objects.filter(key="global").update(
+        bin_count=F("bin_count") + len(bins), fill_level_sum=F("fill_level_sum") + fill_level_sum,
+    ):
+        DashboardCounter.objects.create(key="global", bin_count=len(bins), fill_level_sum=fill_level_sum)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0015_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smartbin",
+            name="capacity",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0)],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="smartbin",
+            index=models.Index(
+                fields=["fill_level", "id"], name="smartbin_fill_id_idx"
+            ),
+        ),
+        migrations.RunPython(merge_legacy_bins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0016_smartbin_fill_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="smartbin",
+            name="version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# La suppression des relevés d'un bac supprimé est confiée à la base
+# (ON DELETE CASCADE) : Django ne charge ni ne supprime lui-même les
+# relevés, quel que soit leur nombre. Sous PostgreSQL, la contrainte est
+# posée sur la table partitionnée et propagée à toutes les partitions ; sa
+# création vérifie les relevés existants.
+SQLITE_REFERENCE = 'REFERENCES "smartbin_smartbin" ("id")'
+
+
+def _postgresql_constraint(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint"
+            " WHERE conrelid = 'smartbin_binreading'::regclass AND contype = 'f'"
+        )
+        row = cursor.fetchone()
+    return row[0] if row else "smartbin_binreading_bin_id_fkey"
+
+
+def _set_on_delete(schema_editor, action):
+    if schema_editor.connection.vendor == "postgresql":
+        name = _postgresql_constraint(schema_editor)
+        schema_editor.execute(f"ALTER TABLE smartbin_binreading DROP CONSTRAINT {name}")
+        schema_editor.execute(
+            f"ALTER TABLE smartbin_binreading ADD CONSTRAINT {name}"
+            f" FOREIGN KEY (bin_id) REFERENCES smartbin_smartbin (id){action}"
+            " DEFERRABLE INITIALLY DEFERRED"
+        )
+    elif schema_editor.connection.vendor == "sqlite":
+        # SQLite ne modifie pas une contrainte : la table est recréée, comme
+        # le fait DatabaseSchemaEditor._remake_table()
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT type, sql FROM sqlite_master"
+                " WHERE tbl_name = 'smartbin_binreading' AND sql IS NOT NULL"
+            )
+            statements = cursor.fetchall()
+        table = next(sql for kind, sql in statements if kind == "table")
+        table = table.replace(f"{SQLITE_REFERENCE} ON DELETE CASCADE", SQLITE_REFERENCE)
+        table = table.replace(SQLITE_REFERENCE, f"{SQLITE_REFERENCE}{action}")
+        schema_editor.execute(
+            table.replace('"smartbin_binreading"', '"smartbin_binreading__new"', 1)
+        )
+        schema_editor.execute(
+            'INSERT INTO "smartbin_binreading__new" SELECT * FROM "smartbin_binreading"'
+        )
+        schema_editor.execute('DROP TABLE "smartbin_binreading"')
+        schema_editor.execute(
+            'ALTER TABLE "smartbin_binreading__new" RENAME TO "smartbin_binreading"'
+        )
+        for kind, sql in statements:
+            if kind == "index":
+                schema_editor.execute(sql)
+
+
+def add_cascade(apps, schema_editor):
+    _set_on_delete(schema_editor, " ON DELETE CASCADE")
+
+
+def remove_cascade(apps, schema_editor):
+    _set_on_delete(schema_editor, "")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("smartbin", "0017_smartbin_version"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="binreading",
+                    name="bin",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="readings",
+                        to="smartbin.smartbin",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_cascade, remove_cascade),
+            ],
+        ),
+    ]
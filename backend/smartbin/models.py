@@ -1,8 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import uuid
 
+from . import geo
+
 class ModulePermission(models.Model):
     module = models.CharField(max_length=50)
     permission = models.CharField(max_length=50)
@@ -46,6 +50,8 @@ class User(AbstractUser):
     role = models.CharField(max_length=20, choices=ROLES, default='citizen')
     phone = models.CharField(max_length=20, blank=True, null=True)
     user_role = models.ForeignKey(UserRole, on_delete=models.SET_NULL, null=True)
+    # Zone de résidence (citoyens) ou d'affectation
+    zone = models.ForeignKey('Zone', on_delete=models.SET_NULL, null=True, blank=True, related_name='users')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -64,15 +70,16 @@ class User(AbstractUser):
     def has_module_permission(self, module, permission):
         if self.is_superuser:
             return True
-        if not self.user_role:
+        if not self.user_role_id:
             return False
-        return self.user_role.permissions.filter(
-            module=module,
-            permission=permission
-        ).exists()
+        from .role_permissions import get_role_permissions, permission_key
+        return permission_key(module, permission) in get_role_permissions(self.user_role_id)
     
     class Meta:
         app_label = 'smartbin'
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='user_joined_id_idx'),
+        ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField('User', on_delete=models.CASCADE, related_name='profil')
@@ -91,6 +98,11 @@ class Zone(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='zone_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -106,15 +118,115 @@ class SmartBin(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
     zone = models.ForeignKey(Zone, on_delete=models.SET_NULL, null=True)
-    fill_level = models.IntegerField(default=0)
+    fill_level = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    # Litres ; volume contenu et tranche de remplissage dans fill_state.py
+    capacity = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0)])
+    battery_level = models.IntegerField(
+        null=True, blank=True, validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     last_collection = models.DateTimeField(null=True, blank=True)
+    last_reading_at = models.DateTimeField(null=True, blank=True)
+    # Premier relevé au niveau actuel : capteur bloqué (voir alerts.py)
+    fill_level_since = models.DateTimeField(null=True, blank=True)
+    # Géohash de (latitude, longitude), index des recherches spatiales
+    geohash = models.CharField(max_length=12, db_index=True, editable=False, blank=True)
+    # Incrémentée à chaque changement d'état : UPDATE conditionnels de bin_state.py
+    version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='smartbin_created_id_idx'),
+            models.Index(fields=['zone', 'created_at', 'id'], name='smartbin_zone_created_idx'),
+            # ?status=active&fill_level= et bacs à collecter
+            models.Index(
+                fields=['fill_level'], condition=models.Q(status='active'),
+                name='smartbin_active_fill_idx',
+            ),
+            # Bacs silencieux (alerts.py) et bacs à réajuster (forecast.py)
+            models.Index(fields=['last_reading_at'], name='smartbin_last_reading_idx'),
+            # ?fill_band= et ?ordering=fill_level, tous statuts confondus
+            models.Index(fields=['fill_level', 'id'], name='smartbin_fill_id_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(fill_level__gte=0, fill_level__lte=100),
+                name='smartbin_fill_level_range',
+            ),
+            models.CheckConstraint(
+                check=models.Q(battery_level__isnull=True)
+                | models.Q(battery_level__gte=0, battery_level__lte=100),
+                name='smartbin_battery_level_range',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = geo.set_geohash(self, 'latitude', 'longitude', kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Bac #{self.id} - {self.location}"
 
+class BinReading(models.Model):
+    # Table partitionnée par mois sous PostgreSQL (voir la migration 0003),
+    # table simple sous SQLite. Les relevés d'un bac supprimé le sont par la
+    # base (ON DELETE CASCADE, migration 0018), sans passer par Django.
+    bin = models.ForeignKey(SmartBin, on_delete=models.DO_NOTHING, related_name='readings', db_index=False)
+    ts = models.DateTimeField()
+    fill_level = models.IntegerField()
+    battery_level = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bin', 'ts'], name='binreading_bin_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Relevé {self.ts} - Bac #{self.bin_id}"
+
+class BinReadingRollup(models.Model):
+    BUCKET_CHOICES = (
+        ('hour', 'Horaire'),
+        ('day', 'Journalier'),
+    )
+
+    bin = models.ForeignKey(SmartBin, on_delete=models.CASCADE, related_name='reading_rollups', db_index=False)
+    bucket = models.CharField(max_length=4, choices=BUCKET_CHOICES)
+    ts = models.DateTimeField(help_text="Début de l'intervalle")
+    count = models.IntegerField()
+    fill_min = models.IntegerField()
+    fill_max = models.IntegerField()
+    fill_avg = models.FloatField()
+    battery_min = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('bin', 'bucket', 'ts')
+
+    def __str__(self):
+        return f"Agrégat {self.bucket} {self.ts} - Bac #{self.bin_id}"
+
+class BinForecast(models.Model):
+    # Modèle de remplissage d'un bac, réajusté par forecast.py : vitesse par
+    # jour de la semaine (lundi = 0), statistiques pondérées avec oubli
+    # exponentiel, et date prévue du remplissage.
+    bin = models.OneToOneField(SmartBin, on_delete=models.CASCADE, primary_key=True, related_name='forecast')
+    hours = models.JSONField(default=list, help_text="Durée observée par jour (heures)")
+    rise = models.JSONField(default=list, help_text="Hausse cumulée par jour (points)")
+    rise_sq = models.JSONField(default=list, help_text="Somme des hausses² / durée, par jour")
+    samples = models.FloatField(default=0)
+    # Dernier point intégré : relevé, ou collecte (niveau 0)
+    last_ts = models.DateTimeField(null=True, blank=True)
+    last_level = models.IntegerField(null=True, blank=True)
+    rate = models.FloatField(null=True, blank=True, help_text="Points par heure")
+    predicted_full_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    confidence = models.FloatField(null=True, blank=True)
+    fitted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Prévision - Bac #{self.bin_id}"
+
 class Collection(models.Model):
     bin = models.ForeignKey(SmartBin, on_delete=models.CASCADE)
     collector = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -122,6 +234,13 @@ class Collection(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='collection_created_id_idx'),
+            models.Index(fields=['collector', 'bin', 'date'], name='collection_collector_bin_idx'),
+            models.Index(fields=['date'], name='collection_date_idx'),
+        ]
+
     def __str__(self):
         return f"Collecte du {self.date} - Bac #{self.bin.id}"
 
@@ -137,12 +256,84 @@ class Alert(models.Model):
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES)
     message = models.TextField()
     is_resolved = models.BooleanField(default=False)
+    # Règle à l'origine de l'alerte (voir alerts.py) ; vide si créée à la main
+    rule = models.ForeignKey('AlertRule', on_delete=models.SET_NULL, null=True, blank=True)
+    # Déclenchements de la même alerte tant qu'elle reste ouverte
+    occurrences = models.PositiveIntegerField(default=1)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='alert_created_id_idx'),
+            models.Index(fields=['bin', 'created_at'], name='alert_bin_created_idx'),
+            # Alertes ouvertes (?is_resolved=false), paginées ; celles d'un bac
+            # passent par alert_open_bin_type_uniq
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(is_resolved=False),
+                name='alert_open_created_idx',
+            ),
+        ]
+        constraints = [
+            # Une seule alerte ouverte par bac et par type
+            models.UniqueConstraint(
+                fields=['bin', 'type'], condition=models.Q(is_resolved=False),
+                name='alert_open_bin_type_uniq',
+            ),
+        ]
+
     def __str__(self):
         return f"Alerte {self.type} - Bac #{self.bin.id}"
 
+class AlertRule(models.Model):
+    CONDITION_CHOICES = (
+        ('fill_level', 'Niveau de remplissage'),
+        ('battery_level', 'Niveau de batterie'),
+        ('level_drop', 'Baisse de niveau sans collecte'),
+        ('level_jump', 'Saut de niveau'),
+        ('stuck', 'Capteur bloqué'),
+        ('no_reading', 'Absence de relevé'),
+        ('flow_outlier', 'Pesée anormale'),
+    )
+    OPERATOR_CHOICES = (
+        ('gt', '>'),
+        ('gte', '≥'),
+        ('lt', '<'),
+        ('lte', '≤'),
+    )
+
+    name = models.CharField(max_length=100)
+    condition = models.CharField(max_length=20, choices=CONDITION_CHOICES)
+    operator = models.CharField(max_length=3, choices=OPERATOR_CHOICES, default='gt')
+    threshold = models.FloatField(
+        help_text=(
+            "Niveau (%), baisse ou hausse (points), durée au même niveau ou sans "
+            "relevé (heures), écart robuste d'une pesée"
+        )
+    )
+    consecutive = models.PositiveSmallIntegerField(
+        default=1, help_text="Nombre de relevés consécutifs vérifiant la condition"
+    )
+    zone = models.ForeignKey(
+        Zone, on_delete=models.CASCADE, null=True, blank=True,
+        help_text="Toutes les zones si vide",
+    )
+    alert_type = models.CharField(max_length=50)
+    severity = models.CharField(max_length=20, choices=Alert.SEVERITY_CHOICES, default='medium')
+    message = models.CharField(
+        max_length=200, blank=True,
+        help_text="Gabarit du message : {bin}, {value}, {threshold}",
+    )
+    # Délai minimal entre deux alertes du même type sur un bac
+    cooldown_minutes = models.PositiveIntegerField(default=60)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
 class CollectionRoute(models.Model):
     STATUS_CHOICES = (
         ('pending', 'En attente'),
@@ -158,9 +349,39 @@ class CollectionRoute(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='route_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Tournée {self.name} - {self.scheduled_date}"
 
+class RouteStop(models.Model):
+    KIND_CHOICES = (
+        ('depot', 'Dépôt'),
+        ('bin', 'Poubelle'),
+        ('tri_center', 'Centre de tri'),
+    )
+
+    route = models.ForeignKey(CollectionRoute, on_delete=models.CASCADE, related_name='stops')
+    sequence = models.PositiveIntegerField()
+    trip = models.PositiveIntegerField(help_text="Numéro du trajet entre deux déchargements")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    bin = models.ForeignKey(SmartBin, on_delete=models.SET_NULL, null=True, blank=True)
+    tri_center = models.ForeignKey('TriCenter', on_delete=models.SET_NULL, null=True, blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    load_kg = models.FloatField(help_text="Charge du camion après l'arrêt")
+    distance_km = models.FloatField(help_text="Distance depuis l'arrêt précédent")
+
+    class Meta:
+        ordering = ['route', 'sequence']
+        unique_together = ('route', 'sequence')
+
+    def __str__(self):
+        return f"Arrêt {self.sequence} - Tournée #{self.route_id}"
+
 class BinReport(models.Model):
     ISSUE_TYPES = (
         ('broken', 'Cassé'),
@@ -204,6 +425,10 @@ class BinReport(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Signalement de poubelle'
         verbose_name_plural = 'Signalements de poubelles'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='binreport_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='binreport_status_created_idx'),
+        ]
 
 class TriCenter(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -214,8 +439,18 @@ class TriCenter(models.Model):
     email_contact = models.EmailField()
     phone = models.CharField(max_length=20)
     total_capacity = models.IntegerField(help_text="Capacité en kg")
+    geohash = models.CharField(max_length=12, db_index=True, editable=False, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='tricenter_created_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = geo.set_geohash(self, 'gps_lat', 'gps_lng', kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -234,14 +469,92 @@ class WasteFlow(models.Model):
     smart_bin = models.ForeignKey(SmartBin, on_delete=models.SET_NULL, null=True, blank=True)
     processing_date = models.DateTimeField(default=timezone.now)
     waste_type = models.CharField(max_length=20, choices=WASTE_TYPES)
-    quantity_kg = models.FloatField()
-    recycling_rate = models.FloatField(help_text="Taux de valorisation en %")
+    quantity_kg = models.FloatField(validators=[MinValueValidator(0)])
+    recycling_rate = models.FloatField(
+        help_text="Taux de valorisation en %", validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
     anomaly_detected = models.BooleanField(default=False)
     comment = models.TextField(blank=True)
+    # Repère des agrégats CenterStatistics (voir center_statistics.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Clé naturelle des flux importés (voir imports.py) : réimporter le même
+    # fichier ne crée pas de doublons
+    import_key = models.CharField(max_length=40, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processing_date', 'id'], name='wasteflow_processing_id_idx'),
+            models.Index(fields=['tri_center', 'processing_date'], name='wasteflow_center_date_idx'),
+            models.Index(fields=['waste_type', 'processing_date'], name='wasteflow_type_date_idx'),
+            models.Index(
+                fields=['processing_date', 'id'], condition=models.Q(anomaly_detected=True),
+                name='wasteflow_anomaly_date_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(quantity_kg__gte=0), name='wasteflow_quantity_positive'),
+            models.CheckConstraint(
+                check=models.Q(recycling_rate__gte=0, recycling_rate__lte=100),
+                name='wasteflow_recycling_rate_range',
+            ),
+        ]
 
     def __str__(self):
         return f"Flux {self.waste_type} - {self.processing_date}"
 
+class WasteFlowBaseline(models.Model):
+    # Dernières pesées d'une série (centre, type de déchet), référence de la
+    # détection des pesées anormales (voir anomalies.py)
+    tri_center = models.ForeignKey(TriCenter, on_delete=models.CASCADE, related_name='flow_baselines')
+    waste_type = models.CharField(max_length=20, choices=WasteFlow.WASTE_TYPES)
+    quantities = models.JSONField(default=list)
+    recycling_rates = models.JSONField(default=list)
+    count = models.PositiveIntegerField(default=0, help_text="Pesées vues depuis la création")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tri_center', 'waste_type'], name='wasteflow_baseline_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Référence {self.waste_type} - Centre #{self.tri_center_id}"
+
+class WasteFlowImport(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to='imports/')
+    file_name = models.CharField(max_length=255)
+    # Centre des lignes sans colonne tri_center
+    tri_center = models.ForeignKey(TriCenter, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.IntegerField(null=True, blank=True, help_text="Estimation avant la fin de l'import")
+    processed_rows = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    duplicate_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    # Premières erreurs ligne par ligne : [{"row": 12, "errors": {...}}]
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='wasteflowimport_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.file_name} - {self.status}"
+
 class CenterStatistics(models.Model):
     PERIOD_CHOICES = (
         ('monthly', 'Mensuel'),
@@ -257,10 +570,26 @@ class CenterStatistics(models.Model):
 
     class Meta:
         unique_together = ('tri_center', 'period', 'period_type')
+        indexes = [
+            models.Index(fields=['period', 'id'], name='centerstats_period_id_idx'),
+        ]
 
     def __str__(self):
         return f"Stats {self.tri_center} - {self.period}"
 
+class CenterStatisticsDirty(models.Model):
+    # Mois dont un flux a été déplacé ou supprimé, à recalculer. Pas de clé
+    # étrangère : la suppression d'un centre supprime ses flux en cascade,
+    # qui signalent alors un centre en cours de suppression.
+    tri_center_id = models.UUIDField()
+    period = models.DateField()
+
+    class Meta:
+        unique_together = ('tri_center_id', 'period')
+
+    def __str__(self):
+        return f"{self.tri_center_id} - {self.period}"
+
 class Valorization(models.Model):
     STATUS_CHOICES = (
         ('pending', 'En attente'),
@@ -402,4 +731,119 @@ class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Facture #{self.invoice_number}" 
\ No newline at end of file
+        return f"Facture #{self.invoice_number}" 
+
+class Watermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.value}"
+
+
+class Job(models.Model):
+    # File de tâches en arrière-plan, traitée par ``runworkers`` (voir jobs.py)
+    STATUS_CHOICES = (
+        ('queued', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+        ('cancelled', 'Annulé'),
+    )
+
+    name = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    priority = models.SmallIntegerField(default=0, help_text="Les priorités les plus élevées passent en premier")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Pas d'exécution avant cette date (nouvel essai après un échec)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Prochain job à exécuter, sur les seuls jobs en attente
+            models.Index(
+                fields=['-priority', 'run_at', 'id'], name='job_queue_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(fields=['created_at', 'id'], name='job_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} - {self.status}"
+
+class RealtimeEvent(models.Model):
+    # Journal des changements poussés aux clients (voir realtime.py). L'id
+    # sert de jeton de reprise : un client reconnecté reçoit les événements
+    # suivants.
+    KIND_CHOICES = (
+        ('bins', 'Bacs'),
+        ('alerts', 'Alertes'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, null=True, blank=True)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Événement {self.kind} #{self.pk}"
+
+# Compteurs du tableau de bord, tenus à jour par dashboard.py (signaux et
+# ingestion des relevés) et recalculés par ``reconcile_statistics``.
+
+class DashboardCounter(models.Model):
+    # 'global' ou 'zone:<id>'
+    key = models.CharField(max_length=30, unique=True)
+    zone = models.OneToOneField(Zone, on_delete=models.CASCADE, null=True, blank=True, related_name='counters')
+    bin_count = models.IntegerField(default=0)
+    fill_level_sum = models.BigIntegerField(default=0)
+    collection_count = models.BigIntegerField(default=0)
+    alert_count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def avg_fill_level(self):
+        if not self.bin_count:
+            return None
+        return self.fill_level_sum / self.bin_count
+
+    def __str__(self):
+        return self.key
+
+class CollectorActivity(models.Model):
+    collector = models.ForeignKey(User, on_delete=models.CASCADE, related_name='collection_days')
+    day = models.DateField()
+    collection_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('collector', 'day')
+
+    def __str__(self):
+        return f"{self.collector_id} - {self.day} : {self.collection_count}"
+
+class CollectorBin(models.Model):
+    # Dernière collecte de chaque bac par chaque collecteur
+    collector = models.ForeignKey(User, on_delete=models.CASCADE, related_name='collected_bins')
+    bin = models.ForeignKey(SmartBin, on_delete=models.CASCADE)
+    last_collected_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('collector', 'bin')
+        indexes = [
+            models.Index(fields=['collector', 'last_collected_at'], name='collectorbin_last_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.collector_id} - Bac #{self.bin_id}"
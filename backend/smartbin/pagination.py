@@ -0,0 +1,170 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur sur le couple (``cursor_field``, pk), du plus
+    récent au plus ancien. Chaque page est lue par une requête indexée
+    ``WHERE (champ, pk) < (dernier champ, dernier pk)``, sans OFFSET ni
+    COUNT : le coût d'une page ne dépend pas de la taille de la table.
+
+    Le champ vaut ``created_at`` par défaut ; les vues dont le modèle n'en a
+    pas déclarent ``cursor_field``. Une vue peut aussi définir
+    ``get_cursor_ordering()`` -> (champ, décroissant), le champ pouvant être
+    une annotation (``distance_m`` des recherches géographiques).
+    """
+
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Curseur invalide'
+    default_cursor_field = 'created_at'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Variante de ``paginate_queryset`` pour les vues asynchrones."""
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page([instance async for instance in queryset[:self.page_size + 1]])
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor_field, self.descending = self.get_ordering(view)
+        annotation = queryset.query.annotations.get(self.cursor_field)
+        if annotation is not None:
+            self.model_field = None
+            self.value_field = annotation.output_field
+        else:
+            self.model_field = queryset.model._meta.get_field(self.cursor_field)
+            self.value_field = self.model_field
+        self.pk_field = queryset.model._meta.pk
+
+        cursor = self.decode_cursor(request)
+        queryset = self._with_cursor_field(queryset)
+        if cursor is None:
+            value, pk, self.backwards = None, None, False
+        else:
+            value, pk, self.backwards = cursor
+        self.has_cursor = cursor is not None
+
+        field = self.cursor_field
+        # Sens de lecture effectif : inversé pour remonter vers la page précédente
+        descending = self.descending != self.backwards
+        if descending:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+            after = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+        else:
+            queryset = queryset.order_by(field, 'pk')
+            after = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+        if cursor is not None:
+            queryset = queryset.filter(after)
+        return queryset
+
+    def _set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.backwards:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.has_cursor
+
+        self.page = results
+        return results
+
+    def get_ordering(self, view):
+        get_cursor_ordering = getattr(view, 'get_cursor_ordering', None)
+        if get_cursor_ordering is not None:
+            return get_cursor_ordering()
+        return getattr(view, 'cursor_field', self.default_cursor_field), True
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def _with_cursor_field(self, queryset):
+        # Avec .only() (champs demandés via ?fields=), le champ du curseur
+        # doit rester chargé pour construire les liens.
+        loaded, deferred = queryset.query.deferred_loading
+        if self.model_field is None:
+            return queryset
+        if not deferred and loaded and self.cursor_field not in loaded:
+            queryset = queryset.only(*loaded, self.cursor_field)
+        return queryset
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, backwards = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return (
+                self.value_field.to_python(value),
+                self.pk_field.to_python(pk),
+                bool(backwards),
+            )
+        except (TypeError, ValueError, UnicodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, backwards):
+        if self.model_field is None:
+            value = getattr(instance, self.cursor_field)
+        else:
+            value = self.model_field.value_to_string(instance)
+        payload = json.dumps([
+            value,
+            self.pk_field.value_to_string(instance),
+            int(backwards),
+        ])
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Page vide atteinte en remontant : repartir du début
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], backwards=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
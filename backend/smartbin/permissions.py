@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from .models import User
+from .role_permissions import request_has_module_permission
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -44,45 +45,58 @@ class IsPartner(permissions.BasePermission):
         return request.user and request.user.role == 'partner'
 
 class HasModulePermission(permissions.BasePermission):
-    def __init__(self, module, permission):
-        self.module = module
-        self.permission = permission
+    """
+    La permission requise est lue dans l'attribut
+    ``module_permission = (module, permission)`` de la vue, ou fixée par
+    requires_module_permission().
+    """
+    module_permission = None
 
     def has_permission(self, request, view):
-        return request.user and request.user.has_module_permission(self.module, self.permission)
+        module, permission = self.module_permission or getattr(view, 'module_permission', (None, None))
+        if module is None:
+            return False
+        return request_has_module_permission(request, module, permission)
+
+def requires_module_permission(module, permission):
+    """Classe de permission (pour permission_classes) exigeant ``module:permission``."""
+    return type(
+        f'HasModulePermission[{module}:{permission}]', (HasModulePermission,),
+        {'module_permission': (module, permission)},
+    )
 
 # Permissions spécifiques aux modules
 class SmartBinPermissions:
-    view = HasModulePermission('smart_bins', 'view_smartbin')
-    manage = HasModulePermission('smart_bins', 'manage_smartbin')
+    view = requires_module_permission('smart_bins', 'view_smartbin')
+    manage = requires_module_permission('smart_bins', 'manage_smartbin')
 
 class CollectionPermissions:
-    view = HasModulePermission('collection', 'view_collection')
-    manage = HasModulePermission('collection', 'manage_collection')
+    view = requires_module_permission('collection', 'view_collection')
+    manage = requires_module_permission('collection', 'manage_collection')
 
 class TriCenterPermissions:
-    view = HasModulePermission('tri_center', 'view_tricenter')
-    manage = HasModulePermission('tri_center', 'manage_tricenter')
+    view = requires_module_permission('tri_center', 'view_tricenter')
+    manage = requires_module_permission('tri_center', 'manage_tricenter')
 
 class ValorizationPermissions:
-    view = HasModulePermission('valorization', 'view_valorization')
-    manage = HasModulePermission('valorization', 'manage_valorization')
+    view = requires_module_permission('valorization', 'view_valorization')
+    manage = requires_module_permission('valorization', 'manage_valorization')
 
 class UserPermissions:
-    view = HasModulePermission('users', 'view_users')
-    manage = HasModulePermission('users', 'manage_users')
+    view = requires_module_permission('users', 'view_users')
+    manage = requires_module_permission('users', 'manage_users')
 
 class ReportingPermissions:
-    view = HasModulePermission('reporting', 'view_reports')
-    manage = HasModulePermission('reporting', 'manage_reports')
+    view = requires_module_permission('reporting', 'view_reports')
+    manage = requires_module_permission('reporting', 'manage_reports')
 
 class SettingsPermissions:
-    view = HasModulePermission('settings', 'view_settings')
-    manage = HasModulePermission('settings', 'manage_settings')
+    view = requires_module_permission('settings', 'view_settings')
+    manage = requires_module_permission('settings', 'manage_settings')
 
 class PaymentPermissions:
-    view = HasModulePermission('payment', 'view_payment')
-    manage = HasModulePermission('payment', 'manage_payment')
+    view = requires_module_permission('payment', 'view_payment')
+    manage = requires_module_permission('payment', 'manage_payment')
 
 class IsPaymentOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -94,5 +108,5 @@ class CanManagePayment(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and (
             request.user.is_staff or 
-            request.user.has_module_permission('payment', 'manage_payment')
+            request_has_module_permission(request, 'payment', 'manage_payment')
         ) 
\ No newline at end of file
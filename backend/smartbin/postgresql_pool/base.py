@@ -0,0 +1,63 @@
+"""
+Backend PostgreSQL à pool de connexions propre au processus
+(ENGINE ``smartbin.postgresql_pool``). Une connexion est empruntée au pool
+à l'ouverture et lui est rendue à la fermeture : avec CONN_MAX_AGE = 0,
+chaque requête HTTP emprunte une connexion déjà ouverte au lieu d'en
+établir une. Réglages dans OPTIONS['pool'] (voir pool.DEFAULTS).
+"""
+
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pools():
+    """Pools du processus courant, par alias."""
+    return {alias: pool for (pid, alias, _), pool in _pools.items() if pid == os.getpid()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        self.connection_pool = self._pool(conn_params)
+        connection = self.connection_pool.getconn()
+        # Fixé par la classe parente à l'ouverture d'une connexion neuve
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.connection_pool.putconn(self.connection)
+
+    def _pool(self, conn_params):
+        # Un pool par processus (après un fork, les connexions du parent ne
+        # sont pas réutilisables) et par paramètres de connexion
+        key = (os.getpid(), self.alias, repr(sorted(conn_params.items(), key=lambda item: item[0])))
+        pool = _pools.get(key)
+        if pool is not None:
+            return pool
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = self.settings_dict['OPTIONS'].get('pool', {})
+                parent = super().get_new_connection
+                pool = ConnectionPool(
+                    lambda: parent(conn_params), **(options if isinstance(options, dict) else {})
+                )
+                _pools[key] = pool
+                threading.Thread(target=pool.fill, daemon=True).start()
+        return pool
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+DEFAULTS = {
+    # Connexions maintenues ouvertes, même inactives
+    'min_size': 2,
+    # Connexions ouvertes au plus par processus
+    'max_size': 10,
+    # Attente (s) d'une connexion libre quand le pool est plein
+    'timeout': 10.0,
+    # Fermeture (s) des connexions inactives au-delà de min_size
+    'max_idle': 600.0,
+    # Renouvellement (s) des connexions, après un basculement par exemple
+    'max_lifetime': 3600.0,
+    # Vérification (SELECT 1) des connexions restées inactives plus longtemps (s)
+    'check_after': 30.0,
+}
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'created_at', 'released_at')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.released_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Connexions psycopg2 partagées par les threads d'un processus. ``connect``
+    ouvre une connexion neuve. Les connexions libres sont réutilisées de la
+    plus récente à la plus ancienne : les plus anciennes restent inactives
+    et sont fermées au-delà de ``min_size``.
+    """
+
+    def __init__(self, connect, **options):
+        self.connect = connect
+        self.options = {**DEFAULTS, **options}
+        if self.options['min_size'] > self.options['max_size']:
+            raise ValueError('min_size doit être inférieur ou égal à max_size')
+        self.idle = deque()
+        self.in_use = {}
+        self.size = 0
+        # Connexions libérées avant cet instant vérifiées avant réutilisation
+        self.check_before = 0.0
+        self.condition = threading.Condition()
+        # Compteurs exposés par stats()
+        self.opened = 0
+        self.waits = 0
+        self.discarded = 0
+
+    def getconn(self):
+        deadline = time.monotonic() + self.options['timeout']
+        while True:
+            entry, create = self._reserve(deadline)
+            if create:
+                entry = self._open()
+            elif not self._healthy(entry):
+                self._discard(entry)
+                continue
+            with self.condition:
+                self.in_use[id(entry.connection)] = entry
+            return entry.connection
+
+    def putconn(self, connection):
+        with self.condition:
+            entry = self.in_use.pop(id(connection), None)
+        if entry is None:
+            connection.close()
+            return
+        if not self._reset(entry):
+            # Connexion perdue (redémarrage du serveur, coupure réseau) : les
+            # autres connexions libres l'ont probablement été aussi
+            self.check_before = time.monotonic()
+            self._discard(entry)
+            return
+        entry.released_at = time.monotonic()
+        with self.condition:
+            self.idle.append(entry)
+            expired = self._expired_idle(entry.released_at)
+            self.condition.notify()
+        for old in expired:
+            self._discard(old)
+
+    def fill(self):
+        """Ouvre les connexions manquantes jusqu'à min_size."""
+        while True:
+            with self.condition:
+                if self.size >= self.options['min_size']:
+                    return
+                self.size += 1
+            try:
+                entry = self._open()
+            except psycopg2.Error:
+                return
+            entry.released_at = time.monotonic()
+            with self.condition:
+                self.idle.appendleft(entry)
+                self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = list(self.idle), deque()
+            self.size -= len(idle)
+        for entry in idle:
+            entry.connection.close()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size, 'idle': len(self.idle), 'in_use': len(self.in_use),
+                'opened': self.opened, 'waits': self.waits, 'discarded': self.discarded,
+            }
+
+    def _reserve(self, deadline):
+        """(connexion libre, False), ou (None, True) : place réservée pour en ouvrir une."""
+        with self.condition:
+            waited = False
+            while True:
+                if self.idle:
+                    return self.idle.pop(), False
+                if self.size < self.options['max_size']:
+                    self.size += 1
+                    return None, True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise psycopg2.OperationalError(
+                        f"Pool de connexions saturé ({self.options['max_size']} connexions) "
+                        f"depuis {self.options['timeout']} s"
+                    )
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self.condition.wait(remaining)
+
+    def _open(self):
+        try:
+            entry = PooledConnection(self.connect())
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened += 1
+        return entry
+
+    def _healthy(self, entry):
+        connection = entry.connection
+        now = time.monotonic()
+        if connection.closed or now - entry.created_at > self.options['max_lifetime']:
+            return False
+        if now - entry.released_at < self.options['check_after'] and entry.released_at > self.check_before:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _reset(self, entry):
+        # Connexion rendue hors transaction et sans état de session (SET,
+        # tables temporaires, curseurs WITH HOLD, LISTEN, verrous
+        # consultatifs, requêtes préparées), sans quoi elle n'est pas
+        # réutilisable telle quelle par une autre requête
+        connection = entry.connection
+        if connection.closed or time.monotonic() - entry.created_at > self.options['max_lifetime']:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            # DISCARD ALL est refusé dans un bloc de transaction ; l'autocommit
+            # est fixé de nouveau par Django à l'emprunt
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute('DISCARD ALL')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _expired_idle(self, now):
+        # Sous le verrou : les plus anciennes sont en tête
+        expired = []
+        while (
+            self.idle and self.size - len(expired) > self.options['min_size']
+            and now - self.idle[0].released_at > self.options['max_idle']
+        ):
+            expired.append(self.idle.popleft())
+        return expired
+
+    def _discard(self, entry):
+        try:
+            entry.connection.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.discarded += 1
+            self.condition.notify()
@@ -0,0 +1,172 @@
+import re
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+DISPLAY_METHOD = re.compile(r'^get_(\w+)_display$')
+
+
+class QueryPlan:
+    """
+    Jointures et agrégats nécessaires pour sérialiser un queryset sans
+    requête par ligne, déduits des ``source`` des champs du sérialiseur.
+    ``only`` liste les colonnes lues, ou vaut None si un champ dépend d'une
+    méthode ou propriété du modèle (toutes les colonnes sont alors chargées).
+    """
+
+    def __init__(self):
+        self.select_related = set()
+        self.prefetch_related = set()
+        self.annotations = {}
+        self.only = set()
+
+    def apply(self, queryset, restrict_columns=False):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch_related))
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        if restrict_columns and self.only is not None:
+            queryset = queryset.only(*sorted(self.only) or ['pk'])
+        return queryset
+
+
+def sparse_fieldset(request, field_names):
+    """
+    Noms de champs retenus par ``?fields=`` et ``?omit=`` (lectures
+    uniquement), dans l'ordre du sérialiseur ; None si tous sont demandés.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    fields = params.get('fields')
+    omit = params.get('omit')
+    if not fields and not omit:
+        return None
+    selected = list(field_names)
+    if fields:
+        wanted = {name.strip() for name in fields.split(',')}
+        selected = [name for name in selected if name in wanted]
+    if omit:
+        omitted = {name.strip() for name in omit.split(',')}
+        selected = [name for name in selected if name not in omitted]
+    return tuple(selected)
+
+
+def _child_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def _walk(plan, model, serializer, prefix, prefetched, field_names=None):
+    annotations = getattr(getattr(serializer, 'Meta', None), 'annotations', {})
+    for name, field in serializer.fields.items():
+        if field.write_only or (field_names is not None and name not in field_names):
+            continue
+        if field.source == '*':
+            if name not in annotations and not prefetched:
+                plan.only = None
+            continue
+        nested = _child_serializer(field)
+        attrs = field.source.split('.')
+        current_model = model
+        path = prefix
+        in_prefetch = prefetched
+        for position, attr in enumerate(attrs):
+            # Les colonnes ne sont restreintes que sur le queryset principal
+            track = not in_prefetch and plan.only is not None
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Méthode ou propriété (get_status_display, get_full_name…)
+                display = DISPLAY_METHOD.match(attr)
+                if display and track and _has_field(current_model, display.group(1)):
+                    plan.only.add(f'{path}{display.group(1)}')
+                elif track:
+                    plan.only = None
+                break
+            if not model_field.is_relation:
+                if track:
+                    plan.only.add(f'{path}{attr}')
+                break
+            lookup = f'{path}{attr}'
+            is_last = position == len(attrs) - 1
+            if model_field.many_to_many or model_field.one_to_many:
+                plan.prefetch_related.add(lookup)
+                in_prefetch = True
+            elif is_last and nested is None:
+                # PrimaryKeyRelatedField : la colonne <champ>_id suffit
+                if track:
+                    plan.only.add(lookup)
+                break
+            elif in_prefetch:
+                plan.prefetch_related.add(lookup)
+            else:
+                plan.select_related.add(lookup)
+                if track:
+                    plan.only.add(lookup)
+            current_model = model_field.related_model
+            path = f'{lookup}__'
+            if is_last and nested is not None:
+                _walk(plan, current_model, nested, path, in_prefetch)
+
+
+def _has_field(model, name):
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def _field_names(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+@lru_cache(maxsize=512)
+def build_query_plan(serializer_class, model, field_names=None):
+    plan = QueryPlan()
+    _walk(plan, model, serializer_class(), '', False, field_names)
+    annotations = getattr(serializer_class.Meta, 'annotations', {})
+    plan.annotations.update(
+        (name, expression) for name, expression in annotations.items()
+        if field_names is None or name in field_names
+    )
+    return plan
+
+
+def apply_query_plan(queryset, serializer_class, request=None):
+    field_names = sparse_fieldset(request, _field_names(serializer_class))
+    plan = build_query_plan(serializer_class, queryset.model, field_names)
+    return plan.apply(queryset, restrict_columns=field_names is not None)
+
+
+class QueryPlanMixin:
+    """
+    À placer avant la classe de base DRF : ``get_queryset`` précharge les
+    relations suivies par le sérialiseur de l'action courante, et ne lit que
+    les colonnes des champs demandés par ``?fields=`` / ``?omit=``.
+    """
+
+    def get_queryset(self):
+        return apply_query_plan(
+            super().get_queryset(), self.get_serializer_class(), self.request
+        )
+
+
+class SparseFieldsMixin:
+    """Sérialiseur limité aux champs demandés par ``?fields=`` / ``?omit=``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = sparse_fieldset(self.context.get('request'), self.fields)
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
@@ -0,0 +1,404 @@
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import RealtimeEvent, SmartBin
+
+logger = logging.getLogger(__name__)
+
+# Les changements de bacs et d'alertes sont écrits dans RealtimeEvent, dans
+# la transaction qui les produit. Dans chaque processus ASGI, un hub lit le
+# journal une fois par réveil et répartit les événements entre les flux SSE
+# ouverts. Sous PostgreSQL, NOTIFY (émis au commit) réveille les hubs de tous
+# les processus ; sinon, le journal est relu toutes les POLL_INTERVAL secondes.
+CHANNEL = 'smartbin_realtime'
+RETENTION = timedelta(hours=getattr(settings, 'SMARTBIN_REALTIME_RETENTION_HOURS', 24))
+POLL_INTERVAL = getattr(settings, 'SMARTBIN_REALTIME_POLL_SECONDS', 1.0)
+# Relecture de sécurité quand LISTEN est actif
+LISTEN_POLL_INTERVAL = 15.0
+HEARTBEAT = 15.0
+# Durée maximale d'un flux ; le navigateur se reconnecte avec Last-Event-ID
+MAX_STREAM_SECONDS = getattr(settings, 'SMARTBIN_REALTIME_STREAM_SECONDS', 300)
+RETRY_MS = 3000
+# Au-delà, le client doit recharger ses listes (événement « reset »)
+MAX_REPLAY = 5000
+QUEUE_SIZE = 1000
+FETCH_LIMIT = 1000
+# Un identifiant sauté appartient à une transaction pas encore validée :
+# il est recherché pendant GAP_TIMEOUT secondes
+GAP_TIMEOUT = 10.0
+MAX_GAPS = 1000
+KINDS = ('bins', 'alerts')
+
+
+def _bin_item(bin):
+    return {
+        'id': bin.pk,
+        'fill_level': bin.fill_level,
+        'battery_level': bin.battery_level,
+        'status': bin.status,
+        'last_reading_at': bin.last_reading_at,
+    }
+
+
+def _alert_item(alert):
+    return {
+        'id': alert.pk,
+        'bin': alert.bin_id,
+        'type': alert.type,
+        'severity': alert.severity,
+        'message': alert.message,
+        'is_resolved': alert.is_resolved,
+        'created_at': alert.created_at,
+        'resolved_at': alert.resolved_at,
+    }
+
+
+def _publish(kind, items_by_zone):
+    events = [
+        RealtimeEvent(kind=kind, zone_id=zone_id, payload={kind: items})
+        for zone_id, items in items_by_zone.items() if items
+    ]
+    if not events:
+        return
+    RealtimeEvent.objects.bulk_create(events)
+    if connection.vendor == 'postgresql':
+        # Notification transactionnelle : envoyée au commit, une seule fois
+        # par transaction (même canal, même contenu)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, ''])
+    transaction.on_commit(hub.wake_threadsafe)
+
+
+def bins_changed(bins):
+    """Publie l'état courant des bacs, un événement par zone."""
+    items = defaultdict(list)
+    for bin in bins:
+        items[bin.zone_id].append(_bin_item(bin))
+    _publish('bins', items)
+
+
+def alerts_changed(alerts, zones=None):
+    """
+    Publie des alertes créées ou résolues. ``zones`` associe les bacs à
+    leur zone ; à défaut, elles sont lues en base.
+    """
+    if zones is None:
+        zones = dict(SmartBin.objects.filter(
+            pk__in={alert.bin_id for alert in alerts}
+        ).values_list('pk', 'zone_id'))
+    items = defaultdict(list)
+    for alert in alerts:
+        items[zones.get(alert.bin_id)].append(_alert_item(alert))
+    _publish('alerts', items)
+
+
+def purge_events(now=None):
+    now = now or timezone.now()
+    deleted, _ = RealtimeEvent.objects.filter(created_at__lt=now - RETENTION).delete()
+    return deleted
+
+
+class Subscription:
+    """Flux d'un client : zones visibles (``None`` : toutes) et types d'événements."""
+
+    def __init__(self, zones, kinds=KINDS):
+        self.zones = zones
+        self.kinds = set(kinds)
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.closed = False
+
+    @classmethod
+    def for_user(cls, user, zone=None, kinds=KINDS):
+        if user.is_staff or user.is_superuser or user.role in ('admin', 'supervisor'):
+            zones = None
+        else:
+            zones = {user.zone_id} if user.zone_id else set()
+        if zone is not None:
+            zones = {zone} if zones is None or zone in zones else set()
+        return cls(zones, kinds)
+
+    def accepts(self, event):
+        return event.kind in self.kinds and (self.zones is None or event.zone_id in self.zones)
+
+    def filter(self, queryset):
+        queryset = queryset.filter(kind__in=self.kinds)
+        if self.zones is not None:
+            queryset = queryset.filter(zone_id__in=self.zones)
+        return queryset
+
+    def push(self, event):
+        if self.accepts(event):
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Client trop lent : le flux est fermé, il reprendra au
+                # dernier jeton reçu
+                self.close()
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class Hub:
+    """Diffusion dans le processus : une lecture du journal par réveil, pour tous les flux."""
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.last_id = 0
+        self.gaps = {}
+        self._loop = None
+        self._wake = None
+        self._ready = None
+        self._task = None
+        self._listener = None
+
+    async def subscribe(self, subscription):
+        """Inscrit un flux ; retourne le dernier événement lu, à partir duquel il reçoit la suite."""
+        self.subscriptions.add(subscription)
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._ready = self._loop.create_future()
+            # Contexte vierge : la tâche survit à la requête qui l'a lancée
+            self._task = self._loop.create_task(self._run(), context=contextvars.Context())
+        try:
+            await asyncio.shield(self._ready)
+        except Exception:
+            self.subscriptions.discard(subscription)
+            raise
+        return self.last_id
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    def wake_threadsafe(self):
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self):
+        ready = self._ready
+        try:
+            self.last_id = await sync_to_async(_last_event_id, thread_sensitive=False)()
+            self.gaps = {}
+            ready.set_result(None)
+            await self._listen()
+            while self.subscriptions:
+                interval = POLL_INTERVAL if self._listener is None else LISTEN_POLL_INTERVAL
+                try:
+                    await asyncio.wait_for(self._wake.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    events = await sync_to_async(self._fetch, thread_sensitive=False)()
+                except Exception:
+                    logger.exception('Lecture du journal temps réel impossible')
+                    await sync_to_async(connection.close, thread_sensitive=False)()
+                    continue
+                for event in events:
+                    for subscription in list(self.subscriptions):
+                        subscription.push(event)
+        except Exception as exc:
+            logger.exception('Arrêt du hub temps réel')
+            if not ready.done():
+                ready.set_exception(exc)
+            for subscription in list(self.subscriptions):
+                subscription.close()
+        finally:
+            self._stop_listening()
+            self._task = None
+
+    def _fetch(self):
+        now = time.monotonic()
+        condition = Q(pk__gt=self.last_id)
+        if self.gaps:
+            condition |= Q(pk__in=list(self.gaps))
+        events = list(RealtimeEvent.objects.filter(condition).order_by('pk')[:FETCH_LIMIT])
+        for event in events:
+            self.gaps.pop(event.pk, None)
+            if event.pk > self.last_id:
+                if event.pk - self.last_id - 1 <= MAX_GAPS:
+                    for missing in range(self.last_id + 1, event.pk):
+                        self.gaps[missing] = now + GAP_TIMEOUT
+                self.last_id = event.pk
+        self.gaps = {pk: deadline for pk, deadline in self.gaps.items() if deadline > now}
+        return events
+
+    async def _listen(self):
+        database = connections['default']
+        if database.vendor != 'postgresql':
+            return
+        try:
+            listener = await sync_to_async(_listen_connection, thread_sensitive=False)(database)
+        except Exception:
+            logger.warning('LISTEN indisponible, relecture périodique du journal', exc_info=True)
+            return
+        self._listener = listener
+        self._loop.add_reader(listener.fileno(), self._on_notify)
+
+    def _on_notify(self):
+        try:
+            self._listener.poll()
+        except Exception:
+            logger.warning('Connexion LISTEN perdue, relecture périodique du journal', exc_info=True)
+            self._stop_listening()
+            return
+        if self._listener.notifies:
+            self._listener.notifies.clear()
+            self._wake.set()
+
+    def _stop_listening(self):
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        try:
+            self._loop.remove_reader(listener.fileno())
+        except Exception:
+            pass
+        listener.close()
+
+
+def _listen_connection(database):
+    # Connexion hors pool, directe vers PostgreSQL si PgBouncer est configuré
+    params = database.get_connection_params()
+    for key, name in (('host', 'SMARTBIN_LISTEN_HOST'), ('port', 'SMARTBIN_LISTEN_PORT')):
+        if getattr(settings, name, ''):
+            params[key] = getattr(settings, name)
+    listener = database.Database.connect(**params)
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f'LISTEN {CHANNEL}')
+    return listener
+
+
+def _last_event_id():
+    return RealtimeEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+hub = Hub()
+
+
+def authenticate(request):
+    """
+    Utilisateur du jeton JWT (en-tête Authorization, ou paramètre ``token`` :
+    EventSource n'envoie pas d'en-tête) ou de la session.
+    """
+    header = request.headers.get('Authorization', '')
+    raw = header[len('Bearer '):] if header.startswith('Bearer ') else request.GET.get('token')
+    if raw:
+        authentication = JWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(raw))
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+    # Absent avant AuthenticationMiddleware : requête anonyme
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def format_event(event_id, kind, data):
+    return f'id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+
+
+def _format(event):
+    return format_event(event.pk, event.kind, {'zone': event.zone_id, **event.payload})
+
+
+def replay(subscription, token, upto):
+    """
+    Événements manqués depuis ``token`` jusqu'à ``upto`` ; ``None`` s'ils ne
+    sont plus tous disponibles (rétention dépassée ou trop nombreux).
+    """
+    if token >= upto:
+        return []
+    oldest = RealtimeEvent.objects.order_by('pk').values_list('pk', flat=True).first()
+    if oldest is None or oldest > token + 1:
+        return None
+    events = list(subscription.filter(
+        RealtimeEvent.objects.filter(pk__gt=token, pk__lte=upto)
+    ).order_by('pk')[:MAX_REPLAY + 1])
+    if len(events) > MAX_REPLAY:
+        return None
+    return events
+
+
+def _opening(events, upto):
+    yield f'retry: {RETRY_MS}\n\n'
+    if events is None:
+        # Jeton absent ou trop ancien : le client recharge ses listes puis
+        # reprend à partir de ce jeton
+        yield format_event(upto, 'reset', {})
+    else:
+        for event in events:
+            yield _format(event)
+
+
+async def stream(subscription, token):
+    """Flux SSE servi en ASGI par le hub du processus."""
+    upto = await hub.subscribe(subscription)
+    try:
+        events = None
+        if token is not None:
+            events = await sync_to_async(replay)(subscription, token, upto)
+        for message in _opening(events, upto):
+            yield message
+        replayed = {event.pk for event in events or ()}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + MAX_STREAM_SECONDS
+        while not subscription.closed and loop.time() < deadline:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if event is None:
+                break
+            if event.pk not in replayed:
+                yield _format(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def polling_stream(subscription, token):
+    """
+    Flux SSE servi en WSGI (``runserver``) : sans hub, le journal est relu
+    toutes les POLL_INTERVAL secondes par chaque client.
+    """
+    upto = _last_event_id()
+    events = replay(subscription, token, upto) if token is not None else None
+    yield from _opening(events, upto)
+    last_id = max(upto, token or 0)
+    deadline = time.monotonic() + MAX_STREAM_SECONDS
+    last_message = time.monotonic()
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        events = list(subscription.filter(
+            RealtimeEvent.objects.filter(pk__gt=last_id)
+        ).order_by('pk')[:FETCH_LIMIT])
+        for event in events:
+            last_id = event.pk
+            yield _format(event)
+        if events:
+            last_message = time.monotonic()
+        elif time.monotonic() - last_message >= HEARTBEAT:
+            last_message = time.monotonic()
+            yield ': ping\n\n'
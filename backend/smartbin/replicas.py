@@ -0,0 +1,172 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+# Réplicas en lecture : {alias de DATABASES: poids}. Les lectures des
+# actions désignées par ReplicaReadMixin y sont envoyées, au hasard selon
+# les poids, parmi les réplicas dont le retard est connu et inférieur à
+# MAX_LAG (vérifié au plus toutes les LAG_CHECK_INTERVAL secondes par
+# processus). Sinon, et pendant STICKY_SECONDS après une écriture de
+# l'utilisateur, les lectures restent sur la base principale.
+REPLICAS = getattr(settings, 'SMARTBIN_READ_REPLICAS', {})
+MAX_LAG = getattr(settings, 'SMARTBIN_REPLICA_MAX_LAG', 10)
+LAG_CHECK_INTERVAL = getattr(settings, 'SMARTBIN_REPLICA_LAG_CHECK_INTERVAL', 5)
+STICKY_SECONDS = getattr(settings, 'SMARTBIN_REPLICA_STICKY_SECONDS', 15)
+CACHE_ALIAS = getattr(settings, 'SMARTBIN_REPLICA_CACHE_ALIAS', 'default')
+
+# Retard nul si le réplica a rejoué tout ce qu'il a reçu (base principale
+# sans écriture récente), ou si ce n'est pas un réplica en streaming
+PG_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_read_database = ContextVar('smartbin_read_database', default=None)
+# alias -> (instant de la vérification, retard en secondes ou None si injoignable)
+_lags = {}
+
+
+def _sticky_key(user_id):
+    return f'smartbin:replica:sticky:{user_id}'
+
+
+def replica_lag(alias):
+    """Retard du réplica en secondes (0 hors PostgreSQL), None s'il est injoignable."""
+    checked_at, lag = _lags.get(alias, (None, None))
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < LAG_CHECK_INTERVAL:
+        return lag
+    database = connections[alias]
+    try:
+        if database.vendor == 'postgresql':
+            with database.cursor() as cursor:
+                cursor.execute(PG_LAG_SQL)
+                lag = float(cursor.fetchone()[0] or 0)
+        else:
+            database.ensure_connection()
+            lag = 0.0
+    except DatabaseError as exc:
+        logger.warning('Réplica %s injoignable, lectures sur la base principale : %s', alias, exc)
+        lag = None
+        database.close_if_unusable_or_obsolete()
+    _lags[alias] = (now, lag)
+    return lag
+
+
+def read_database(user):
+    """Réplica où lire pour ``user``, ou None pour la base principale."""
+    if not REPLICAS:
+        return None
+    if user.is_authenticated and caches[CACHE_ALIAS].get(_sticky_key(user.pk)):
+        return None
+    available = []
+    for alias, weight in REPLICAS.items():
+        lag = replica_lag(alias)
+        if lag is not None and lag <= MAX_LAG:
+            available.append((alias, weight))
+    if not available:
+        return None
+    aliases, weights = zip(*available)
+    return random.choices(aliases, weights)[0]
+
+
+class ReplicaRouter:
+    """
+    Lectures de la requête en cours sur le réplica choisi par
+    ReplicaReadMixin ; tout le reste (écritures, migrations) sur la base
+    principale.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas et base principale contiennent les mêmes lignes
+        databases = {'default', *REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None if db not in REPLICAS else False
+
+
+class ReplicaReadMixin:
+    """
+    Lectures (méthodes sûres) des actions ``replica_actions`` servies par un
+    réplica : requêtes de la vue et queryset de get_queryset, fixé au
+    réplica pour les réponses lues en flux (exports).
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.read_database = None
+        if request.method in SAFE_METHODS and self.action in self.replica_actions:
+            self.read_database = read_database(request.user)
+            _read_database.set(self.read_database)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        alias = getattr(self, 'read_database', None)
+        return queryset if alias is None else queryset.using(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Le thread peut servir d'autres requêtes (WSGI)
+        _read_database.set(None)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Après une requête d'écriture réussie d'un utilisateur authentifié, ses
+    lectures restent sur la base principale pendant STICKY_SECONDS : il
+    relit ce qu'il vient d'écrire, même sur un réplica en retard.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user_id = self._writer(request, response)
+        if user_id is not None:
+            caches[CACHE_ALIAS].set(_sticky_key(user_id), True, STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user_id = self._writer(request, response)
+        if user_id is not None:
+            await caches[CACHE_ALIAS].aset(_sticky_key(user_id), True, STICKY_SECONDS)
+        return response
+
+    def _writer(self, request, response):
+        if not REPLICAS or request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        user = getattr(request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
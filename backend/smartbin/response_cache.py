@@ -0,0 +1,147 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+# Cache des réponses de lecture des données de référence (zones, centres de
+# tri, formules d'abonnement, catalogue des modules). Chaque modèle a une
+# version, et chaque objet la sienne : l'horodatage (ns) de sa dernière
+# modification, stocké dans le cache et remplacé par les signaux post_save
+# et post_delete (voir signals.py). La clé d'une réponse contient les
+# versions dont elle dépend : une modification rend les anciennes entrées
+# inaccessibles, qui expirent ensuite. Avec le cache local par défaut
+# (LocMemCache), l'invalidation ne traverse pas les processus : les autres
+# workers serviraient l'ancienne réponse jusqu'à son expiration. Sans cache
+# partagé (Redis ou fichier, SMARTBIN_CACHE_URL), les réponses ne sont donc
+# gardées que LOCAL_CACHE_TIMEOUT secondes, quel que soit cache_timeout.
+CACHE_ALIAS = getattr(settings, 'SMARTBIN_RESPONSE_CACHE_ALIAS', 'default')
+DEFAULT_TIMEOUT = getattr(settings, 'SMARTBIN_RESPONSE_CACHE_TIMEOUT', 300)
+SHARED_CACHE = not isinstance(caches[CACHE_ALIAS], LocMemCache)
+LOCAL_CACHE_TIMEOUT = 5
+
+PREFIX = 'smartbin:resp'
+
+
+def _version_key(model, pk=None):
+    key = f'{PREFIX}:v:{model._meta.label_lower}'
+    return key if pk is None else f'{key}:{pk}'
+
+
+def current_versions(keys):
+    cache = caches[CACHE_ALIAS]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Version initiale horodatée, comme pour les permissions des rôles
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def _bump(keys):
+    caches[CACHE_ALIAS].set_many(dict.fromkeys(keys, time.time_ns()), None)
+
+
+def invalidate(instance):
+    """
+    Invalide les réponses qui dépendent de ``instance`` : tout de suite, pour
+    la suite de la transaction, puis après le commit, une réponse mise en
+    cache entre-temps par une autre transaction ayant pu lire l'état
+    précédent.
+    """
+    keys = [_version_key(type(instance)), _version_key(type(instance), instance.pk)]
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+class CachedResponseMixin:
+    """
+    Met en cache les réponses JSON 200 des actions ``cache_actions``, par
+    URL et par rôle, zone et statut staff de l'utilisateur, avec ETag et
+    Last-Modified : une requête conditionnelle à jour reçoit 304.
+    Authentification et has_permission sont vérifiés avant le cache ; les
+    permissions par objet ne doivent dépendre que du rôle et de la zone.
+    ``cache_models`` liste les modèles dont dépendent les réponses, celui de
+    la vue en premier : leurs signaux doivent appeler invalidate().
+    """
+
+    cache_models = ()
+    cache_actions = ('list', 'retrieve')
+    cache_timeout = DEFAULT_TIMEOUT
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.cache_entry_key = None
+        if (
+            request.method != 'GET'
+            or self.action not in self.cache_actions
+            or request.accepted_renderer.format != 'json'
+        ):
+            return
+        version_keys = self._cache_version_keys()
+        if version_keys is None:
+            return
+        versions = current_versions(version_keys)
+        user = request.user
+        variant = (
+            f'{user.role}:{user.zone_id}:{user.is_staff:d}'
+            if user.is_authenticated else 'anonymous'
+        )
+        path = request.get_full_path()
+        digest = hashlib.md5(f'{variant}|{versions}|{path}'.encode()).hexdigest()
+        self.cache_entry_key = f'{PREFIX}:{self.basename}:{self.action}:{digest}'
+        self.cache_last_modified = max(versions) // 10 ** 9
+        entry = caches[CACHE_ALIAS].get(self.cache_entry_key)
+        if entry is not None:
+            # Réponse servie à la place de l'action, comme ViewSetMixin.as_view
+            # associe les méthodes HTTP aux actions
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['ETag'] = entry['etag']
+            setattr(self, request.method.lower(), lambda *args, **kwargs: response)
+
+    def _cache_version_keys(self):
+        model, *dependencies = self.cache_models
+        keys = [_version_key(dependency) for dependency in dependencies]
+        if self.action != 'retrieve':
+            return [_version_key(model), *keys]
+        # Détail : version de l'objet seul, si l'URL le désigne sous sa forme
+        # canonique (celle de l'invalidation)
+        value = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if self.lookup_field not in ('pk', model._meta.pk.name):
+            return [_version_key(model), *keys]
+        try:
+            canonical = str(model._meta.pk.to_python(value)) == value
+        except ValidationError:
+            canonical = False
+        return [_version_key(model, value), *keys] if canonical else None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'cache_entry_key', None) is None or response.status_code != 200:
+            return response
+        if isinstance(response, Response):
+            response.render()
+            response['ETag'] = f'"{hashlib.md5(response.content).hexdigest()}"'
+            caches[CACHE_ALIAS].set(self.cache_entry_key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': response['ETag'],
+            }, self.cache_timeout if SHARED_CACHE else min(self.cache_timeout, LOCAL_CACHE_TIMEOUT))
+        response['Last-Modified'] = http_date(self.cache_last_modified)
+        # Contenu propre au rôle de l'utilisateur : à revalider à chaque usage
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization',))
+        return get_conditional_response(
+            request._request, etag=response['ETag'],
+            last_modified=self.cache_last_modified, response=response,
+        )
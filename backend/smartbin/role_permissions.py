@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import ModulePermission
+
+# Les permissions d'un rôle sont mises en cache dans le processus et dans le
+# cache partagé de Django. Une « génération » stockée dans le cache partagé
+# est incrémentée à chaque modification (voir signals.py) : les entrées des
+# générations précédentes ne sont plus jamais lues. Avec le cache local par
+# défaut (LocMemCache), l'invalidation ne traverse pas les processus : une
+# permission retirée resterait accordée par les autres workers. Sans cache
+# partagé, les entrées expirent donc au bout de LOCAL_CACHE_TIMEOUT et les
+# permissions embarquées dans le JWT sont ignorées.
+SHARED_CACHE = not isinstance(caches['default'], LocMemCache)
+LOCAL_CACHE_TIMEOUT = 5
+CACHE_TIMEOUT = getattr(settings, 'SMARTBIN_ROLE_PERMISSIONS_TIMEOUT', 3600)
+if not SHARED_CACHE:
+    CACHE_TIMEOUT = min(CACHE_TIMEOUT, LOCAL_CACHE_TIMEOUT)
+# Durée pendant laquelle un processus réutilise la génération lue, sans
+# interroger le cache partagé.
+GENERATION_TTL = getattr(settings, 'SMARTBIN_ROLE_PERMISSIONS_GENERATION_TTL', 5)
+
+GENERATION_KEY = 'smartbin:role_perms:generation'
+ALL_PERMISSIONS = '*'
+
+_local_permissions = {}
+_local_generation = {'value': None, 'expires': 0.0}
+
+
+def permission_key(module, permission):
+    return f'{module}:{permission}'
+
+
+def get_generation():
+    now = time.monotonic()
+    if _local_generation['value'] is not None and now < _local_generation['expires']:
+        return _local_generation['value']
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Valeur initiale horodatée : si la clé a été évincée, on ne retombe
+        # pas sur une génération déjà utilisée.
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    _local_generation['value'] = generation
+    _local_generation['expires'] = now + GENERATION_TTL
+    return generation
+
+
+def get_role_permissions(role_id):
+    """Ensemble des ``module:permission`` accordés au rôle ``role_id``."""
+    if role_id is None:
+        return frozenset()
+    generation = get_generation()
+    cached = _local_permissions.get(role_id)
+    if cached is not None and cached[0] == generation and time.monotonic() < cached[2]:
+        return cached[1]
+
+    key = f'smartbin:role_perms:{generation}:{role_id}'
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = frozenset(
+            permission_key(module, permission)
+            for module, permission in ModulePermission.objects.filter(
+                userrole__id=role_id
+            ).values_list('module', 'permission')
+        )
+        cache.set(key, permissions, CACHE_TIMEOUT)
+    _local_permissions[role_id] = (generation, permissions, time.monotonic() + CACHE_TIMEOUT)
+    return permissions
+
+
+def user_module_permissions(user):
+    if user.is_superuser:
+        return frozenset([ALL_PERMISSIONS])
+    return get_role_permissions(getattr(user, 'user_role_id', None))
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+    _local_permissions.clear()
+    _local_generation['value'] = None
+
+
+def invalidate_role_permissions():
+    """Invalide les permissions en cache de tous les rôles, après le commit."""
+    transaction.on_commit(_bump_generation)
+
+
+def request_has_module_permission(request, module, permission):
+    """
+    Vérifie une permission de module sans requête SQL : à partir des claims du
+    JWT quand ils sont à jour (cache partagé uniquement), sinon à partir des
+    permissions en cache.
+    """
+    user = request.user
+    if not user or not user.is_authenticated:
+        return False
+    token = request.auth
+    if SHARED_CACHE and token is not None and hasattr(token, 'get'):
+        permissions = token.get('perms')
+        if (
+            permissions is not None
+            and token.get('perms_gen') == get_generation()
+            and token.get('user_role') == getattr(user, 'user_role_id', None)
+            and token.get('is_superuser') == user.is_superuser
+        ):
+            return (
+                ALL_PERMISSIONS in permissions
+                or permission_key(module, permission) in permissions
+            )
+    has_module_permission = getattr(user, 'has_module_permission', None)
+    if has_module_permission is None:
+        return user.is_superuser
+    return has_module_permission(module, permission)
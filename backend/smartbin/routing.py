@@ -0,0 +1,281 @@
+import heapq
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import CollectionRoute, RouteStop, SmartBin, TriCenter
+
+EARTH_RADIUS_KM = 6371.0088
+# Masse d'un bac plein, pour convertir le taux de remplissage en charge
+BIN_CAPACITY_KG = getattr(settings, 'SMARTBIN_BIN_CAPACITY_KG', 60)
+DEFAULT_FILL_THRESHOLD = 70
+DEFAULT_TIME_BUDGET = getattr(settings, 'SMARTBIN_ROUTING_TIME_BUDGET', 5.0)
+# Gain minimal (km) pour accepter un mouvement de recherche locale
+EPSILON = 1e-9
+OR_OPT_SEGMENTS = (1, 2, 3)
+
+# Indices des points : 0 = dépôt, 1..m = centres de tri, m+1..m+n = bacs.
+# Une tournée (trip) est la liste des points visités, du point de départ
+# (dépôt ou centre de la tournée précédente) au centre de déchargement.
+Trip = namedtuple('Trip', ['points', 'load', 'distance_km'])
+RoutePlan = namedtuple('RoutePlan', ['trucks', 'unserved', 'distance_km'])
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Distance orthodromique en km ; les arguments sont diffusés par numpy."""
+    lat1, lng1, lat2, lng2 = (np.radians(value) for value in (lat1, lng1, lat2, lng2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distance_matrix(coords):
+    """Matrice des distances (km) entre les points ``coords`` (n, 2)."""
+    coords = np.asarray(coords, dtype=float)
+    lat, lng = coords[:, 0], coords[:, 1]
+    return haversine(lat[:, None], lng[:, None], lat[None, :], lng[None, :])
+
+
+class _Points:
+    """Coordonnées pré-converties pour calculer une ligne de distances."""
+
+    def __init__(self, coords):
+        radians = np.radians(np.asarray(coords, dtype=float))
+        self.lat = radians[:, 0]
+        self.lng = radians[:, 1]
+        self.cos_lat = np.cos(self.lat)
+
+    def distances_from(self, lat, lng):
+        lat, lng = np.radians(lat), np.radians(lng)
+        a = (
+            np.sin((self.lat - lat) / 2) ** 2
+            + np.cos(lat) * self.cos_lat * np.sin((self.lng - lng) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _construct(coords, n_centers, demands, trucks, capacity):
+    """
+    Plus proche voisin : le camion ayant parcouru le moins de distance part
+    de sa position et ramasse le bac le plus proche qui tient encore dans sa
+    benne, jusqu'à saturation ; il décharge alors au centre le plus proche.
+    """
+    first_bin = 1 + n_centers
+    bins = _Points(coords[first_bin:])
+    centers = _Points(coords[1:first_bin])
+    remaining = demands <= capacity
+    unserved = np.flatnonzero(~remaining)
+    left = int(remaining.sum())
+
+    heap = [(0.0, truck, 0) for truck in range(trucks)]
+    routes = [[] for _ in range(trucks)]
+    while left:
+        distance, truck, start = heapq.heappop(heap)
+        points, load, travelled = [start], 0.0, 0.0
+        current = start
+        while left:
+            candidates = remaining & (demands <= capacity - load)
+            if not candidates.any():
+                break
+            row = bins.distances_from(*coords[current])
+            row[~candidates] = np.inf
+            nearest = int(np.argmin(row))
+            travelled += row[nearest]
+            load += demands[nearest]
+            remaining[nearest] = False
+            left -= 1
+            current = first_bin + nearest
+            points.append(current)
+        to_center = centers.distances_from(*coords[current])
+        center = int(np.argmin(to_center))
+        travelled += to_center[center]
+        points.append(1 + center)
+        routes[truck].append(Trip(points, load, travelled))
+        heapq.heappush(heap, (distance + travelled, truck, 1 + center))
+    return routes, unserved
+
+
+def _two_opt(tour, matrix):
+    """Meilleure inversion de segment ; extrémités fixes. True si améliorée."""
+    if len(tour) < 4:
+        return False
+    a, b = tour[:-1], tour[1:]
+    edges = matrix[a, b]
+    delta = (
+        matrix[a[:, None], a[None, :]] + matrix[b[:, None], b[None, :]]
+        - edges[:, None] - edges[None, :]
+    )
+    # Seules les paires d'arêtes non adjacentes i < j - 1 sont valides
+    delta[np.tril_indices(len(a), 1)] = 0
+    i, j = np.unravel_index(np.argmin(delta), delta.shape)
+    if delta[i, j] >= -EPSILON:
+        return False
+    tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+    return True
+
+
+def _or_opt(tour, matrix):
+    """Déplace des segments de 1 à 3 points vers leur meilleure position."""
+    improved = False
+    for length in OR_OPT_SEGMENTS:
+        start = 1
+        while start + length < len(tour):
+            segment = tour[start:start + length]
+            before, after = tour[start - 1], tour[start + length]
+            first, last = segment[0], segment[-1]
+            gain = matrix[before, first] + matrix[last, after] - matrix[before, after]
+            rest = np.concatenate([tour[:start], tour[start + length:]])
+            a, b = rest[:-1], rest[1:]
+            forward = matrix[a, first] + matrix[last, b] - matrix[a, b]
+            backward = matrix[a, last] + matrix[first, b] - matrix[a, b]
+            cost = np.minimum(forward, backward)
+            position = int(np.argmin(cost))
+            if cost[position] - gain < -EPSILON:
+                if backward[position] < forward[position]:
+                    segment = segment[::-1]
+                tour[:] = np.concatenate([rest[:position + 1], segment, rest[position + 1:]])
+                improved = True
+            start += 1
+    return improved
+
+
+def improve_trip(points, coords, deadline):
+    """2-opt puis Or-opt jusqu'à l'optimum local ou l'échéance ``deadline``."""
+    if len(points) < 4:
+        return points
+    matrix = distance_matrix(coords[points])
+    tour = np.arange(len(points))
+    while time.perf_counter() < deadline:
+        improved = False
+        while time.perf_counter() < deadline and _two_opt(tour, matrix):
+            improved = True
+        if time.perf_counter() < deadline and _or_opt(tour, matrix):
+            improved = True
+        if not improved:
+            break
+    return [points[index] for index in tour]
+
+
+def trip_distance(points, coords):
+    path = coords[points]
+    return float(haversine(path[:-1, 0], path[:-1, 1], path[1:, 0], path[1:, 1]).sum())
+
+
+def solve(depot, bins, demands, centers, trucks, capacity, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Tournées capacitaires avec déchargements intermédiaires aux centres de
+    tri. ``bins`` et ``centers`` sont des tableaux (n, 2) de (lat, lng),
+    ``demands`` la charge de chaque bac dans l'unité de ``capacity``.
+    Les tournées construites sont ensuite améliorées (2-opt, Or-opt) dans la
+    limite de ``time_budget`` secondes, réparties entre les tournées.
+    """
+    coords = np.vstack([
+        np.asarray(depot, dtype=float).reshape(1, 2),
+        np.asarray(centers, dtype=float).reshape(-1, 2),
+        np.asarray(bins, dtype=float).reshape(-1, 2),
+    ])
+    demands = np.asarray(demands, dtype=float)
+    routes, unserved = _construct(coords, len(centers), demands, trucks, capacity)
+
+    end = time.perf_counter() + time_budget
+    trips_left = sum(len(trips) for trips in routes)
+    for trips in routes:
+        for position, trip in enumerate(trips):
+            now = time.perf_counter()
+            deadline = now + max(end - now, 0) / trips_left
+            points = improve_trip(trip.points, coords, deadline)
+            trips[position] = Trip(points, trip.load, trip_distance(points, coords))
+            trips_left -= 1
+
+    total = 0.0
+    for trips in routes:
+        if trips:
+            total += sum(trip.distance_km for trip in trips)
+            total += trip_distance([trips[-1].points[-1], 0], coords)
+    return RoutePlan(routes, unserved.tolist(), total), coords
+
+
+def plan_routes(zone, scheduled_date, depot, trucks, capacity_kg,
+                fill_threshold=DEFAULT_FILL_THRESHOLD, tri_centers=None,
+                time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Planifie la collecte des bacs de ``zone`` remplis à ``fill_threshold`` %
+    ou plus et enregistre une CollectionRoute par camion utilisé, avec ses
+    arrêts ordonnés (RouteStop). Retourne (routes, identifiants des bacs non
+    servis, distance totale en km).
+    """
+    bins = list(
+        SmartBin.objects.filter(zone=zone, fill_level__gte=fill_threshold)
+        .exclude(status='inactive')
+        .order_by('pk')
+        .values_list('id', 'latitude', 'longitude', 'fill_level')
+    )
+    if tri_centers is None:
+        tri_centers = TriCenter.objects.all()
+    centers = [(center.pk, center.gps_lat, center.gps_lng) for center in tri_centers]
+    if not bins:
+        return [], [], 0.0
+
+    demands = np.array([fill_level for *_, fill_level in bins], dtype=float) / 100 * BIN_CAPACITY_KG
+    plan, coords = solve(
+        depot,
+        [(lat, lng) for _, lat, lng, _ in bins],
+        demands,
+        [(lat, lng) for _, lat, lng in centers],
+        trucks,
+        capacity_kg,
+        time_budget,
+    )
+
+    first_bin = 1 + len(centers)
+    routes = []
+    with transaction.atomic():
+        for number, trips in enumerate(plan.trucks, start=1):
+            if not trips:
+                continue
+            route = CollectionRoute.objects.create(
+                name=f'{zone.name} - camion {number}',
+                scheduled_date=scheduled_date,
+            )
+            stops = [RouteStop(
+                route=route, sequence=0, trip=0, kind='depot',
+                latitude=depot[0], longitude=depot[1], load_kg=0, distance_km=0,
+            )]
+            bin_ids = []
+            previous = 0
+            for trip_number, trip in enumerate(trips, start=1):
+                load = 0.0
+                for point in trip.points[1:]:
+                    stop = RouteStop(
+                        route=route, sequence=len(stops), trip=trip_number,
+                        latitude=coords[point][0], longitude=coords[point][1],
+                        distance_km=round(trip_distance([previous, point], coords), 3),
+                    )
+                    if point >= first_bin:
+                        index = point - first_bin
+                        load += demands[index]
+                        stop.kind = 'bin'
+                        stop.bin_id = bins[index][0]
+                        bin_ids.append(stop.bin_id)
+                    else:
+                        # Déchargement : la benne repart vide
+                        load = 0.0
+                        stop.kind = 'tri_center'
+                        stop.tri_center_id = centers[point - 1][0]
+                    stop.load_kg = round(load, 2)
+                    stops.append(stop)
+                    previous = point
+            stops.append(RouteStop(
+                route=route, sequence=len(stops), trip=len(trips), kind='depot',
+                latitude=depot[0], longitude=depot[1], load_kg=0,
+                distance_km=round(trip_distance([previous, 0], coords), 3),
+            ))
+            RouteStop.objects.bulk_create(stops)
+            route.bins.set(bin_ids)
+            routes.append(route)
+    return routes, [bins[index][0] for index in plan.unserved], plan.distance_km
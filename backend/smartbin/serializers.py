@@ -1,71 +1,158 @@
 from rest_framework import serializers
-from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.contrib.auth import get_user_model
+from django.db.models import Count
 from .models import (
-    Zone, SmartBin, Collection, Alert,
-    CollectionRoute, BinReport, UserProfile,
-    TriCenter, WasteFlow, CenterStatistics
+    Zone, SmartBin, Collection, Alert, AlertRule,
+    CollectionRoute, RouteStop, BinReport, UserProfile,
+    TriCenter, WasteFlow, WasteFlowImport, CenterStatistics, Job, PaymentPlan
 )
+from . import fill_state
+from .alerts import alert_message
+from .imports import file_format, openpyxl
+from .instrumentation import TimedSerializerMixin
+from .query_plan import SparseFieldsMixin
+from .role_permissions import SHARED_CACHE, get_generation, user_module_permissions
 
-class UserSerializer(serializers.ModelSerializer):
+User = get_user_model()
+
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Les permissions de module sont embarquées dans le JWT pour que
+        # HasModulePermission n'ait aucune requête à faire. Sans cache partagé,
+        # leur invalidation ne serait pas vue des autres workers : omises.
+        token = super().get_token(user)
+        token['role'] = getattr(user, 'role', None)
+        token['user_role'] = getattr(user, 'user_role_id', None)
+        token['is_superuser'] = user.is_superuser
+        if SHARED_CACHE:
+            token['perms'] = sorted(user_module_permissions(user))
+            token['perms_gen'] = get_generation()
+        return token
+
+class UserSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'zone']
         read_only_fields = ['id']
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = UserProfile
-        fields = ['id', 'user', 'role', 'phone_number', 'zone']
+        fields = ['id', 'user', 'avatar', 'adresse', 'bio', 'date_naissance']
         read_only_fields = ['id']
 
-class ZoneSerializer(serializers.ModelSerializer):
+class ZoneSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Zone
-        fields = ['id', 'name', 'description', 'location', 'manager']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'description', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
 
-class SmartBinSerializer(serializers.ModelSerializer):
+class SmartBinSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     zone_name = serializers.CharField(source='zone.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    # Présent uniquement avec ?near=
+    distance_m = serializers.FloatField(read_only=True)
+    # Prévision de remplissage (voir forecast.py), nulle sans historique
+    predicted_full_at = serializers.DateTimeField(source='forecast.predicted_full_at', read_only=True)
+    forecast_confidence = serializers.FloatField(source='forecast.confidence', read_only=True)
+    # Calculés par la base (Meta.annotations, voir fill_state.py)
+    fill_band = serializers.ChoiceField(choices=fill_state.BAND_CHOICES, read_only=True)
+    fill_volume = serializers.FloatField(read_only=True)
 
     class Meta:
         model = SmartBin
         fields = [
-            'id', 'identifier', 'zone', 'zone_name', 'location',
-            'status', 'status_display', 'fill_level', 'last_collection',
-            'last_maintenance', 'battery_level'
+            'id', 'zone', 'zone_name', 'location', 'latitude', 'longitude',
+            'status', 'status_display', 'fill_level', 'fill_band', 'capacity',
+            'fill_volume', 'last_collection', 'battery_level', 'last_reading_at',
+            'distance_m', 'predicted_full_at', 'forecast_confidence', 'version'
         ]
-        read_only_fields = ['id', 'last_collection', 'last_maintenance']
+        # État du bac : modifié uniquement par bin_state.py et l'ingestion
+        read_only_fields = ['fill_level', 'battery_level', 'last_collection', 'last_reading_at', 'version']
+        annotations = {
+            'fill_band': fill_state.band_expression(),
+            'fill_volume': fill_state.volume_expression(),
+        }
 
-class CollectionSerializer(serializers.ModelSerializer):
-    bin_identifier = serializers.CharField(source='bin.identifier', read_only=True)
+class CollectionSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    bin_location = serializers.CharField(source='bin.location', read_only=True)
     collector_name = serializers.CharField(source='collector.get_full_name', read_only=True)
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
 
     class Meta:
         model = Collection
         fields = [
-            'id', 'bin', 'bin_identifier', 'collector', 'collector_name',
-            'status', 'status_display', 'date', 'weight', 'notes'
+            'id', 'bin', 'bin_location', 'collector', 'collector_name',
+            'date', 'notes', 'created_at'
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'created_at']
 
-class AlertSerializer(serializers.ModelSerializer):
-    bin_identifier = serializers.CharField(source='bin.identifier', read_only=True)
-    type_display = serializers.CharField(source='get_type_display', read_only=True)
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
+class AlertSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    bin_location = serializers.CharField(source='bin.location', read_only=True)
+    severity_display = serializers.CharField(source='get_severity_display', read_only=True)
 
     class Meta:
         model = Alert
         fields = [
-            'id', 'bin', 'bin_identifier', 'type', 'type_display',
-            'status', 'status_display', 'message', 'date', 'resolved_date'
+            'id', 'bin', 'bin_location', 'type', 'severity', 'severity_display',
+            'message', 'is_resolved', 'rule', 'occurrences', 'last_seen_at',
+            'created_at', 'resolved_at'
         ]
-        read_only_fields = ['id', 'date', 'resolved_date']
+        read_only_fields = ['id', 'rule', 'occurrences', 'last_seen_at', 'created_at', 'resolved_at']
+
+    def validate(self, data):
+        bin = data.get('bin', getattr(self.instance, 'bin', None))
+        alert_type = data.get('type', getattr(self.instance, 'type', None))
+        is_resolved = data.get('is_resolved', getattr(self.instance, 'is_resolved', False))
+        if not is_resolved:
+            duplicates = Alert.objects.filter(bin=bin, type=alert_type, is_resolved=False)
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError("Une alerte de ce type est déjà ouverte pour ce bac.")
+        return data
 
-class CollectionRouteSerializer(serializers.ModelSerializer):
+class AlertRuleSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    condition_display = serializers.CharField(source='get_condition_display', read_only=True)
+
+    class Meta:
+        model = AlertRule
+        fields = [
+            'id', 'name', 'condition', 'condition_display', 'operator', 'threshold',
+            'consecutive', 'zone', 'alert_type', 'severity', 'message',
+            'cooldown_minutes', 'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        rule = AlertRule(**{**self._current(), **data})
+        if rule.condition in ('no_reading', 'stuck') and rule.threshold <= 0:
+            raise serializers.ValidationError({'threshold': "La durée doit être positive."})
+        if rule.condition == 'flow_outlier' and rule.threshold <= 0:
+            raise serializers.ValidationError({'threshold': "L'écart robuste doit être positif."})
+        if rule.consecutive < 1:
+            raise serializers.ValidationError({'consecutive': "Au moins un relevé est requis."})
+        try:
+            alert_message(rule, 'BIN-001', 0.0)
+        except (KeyError, IndexError, ValueError):
+            raise serializers.ValidationError(
+                {'message': "Gabarit invalide : seuls {bin}, {value} et {threshold} sont disponibles."}
+            )
+        return data
+
+    def _current(self):
+        if self.instance is None:
+            return {}
+        return {
+            field: getattr(self.instance, field)
+            for field in ('condition', 'operator', 'threshold', 'consecutive', 'message')
+        }
+
+class CollectionRouteSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     collector_name = serializers.CharField(source='collector.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     bins_count = serializers.SerializerMethodField()
@@ -73,16 +160,55 @@ class CollectionRouteSerializer(serializers.ModelSerializer):
     class Meta:
         model = CollectionRoute
         fields = [
-            'id', 'collector', 'collector_name', 'status', 'status_display',
-            'date', 'bins', 'bins_count', 'notes'
+            'id', 'name', 'collector', 'collector_name', 'status', 'status_display',
+            'scheduled_date', 'bins', 'bins_count'
         ]
         read_only_fields = ['id']
+        annotations = {'bins_count': Count('bins', distinct=True)}
 
     def get_bins_count(self, obj):
+        # Annoté par QueryPlanMixin pour les listes ; compté à la demande sinon
+        count = getattr(obj, 'bins_count', None)
+        if count is not None:
+            return count
         return obj.bins.count()
 
-class BinReportSerializer(serializers.ModelSerializer):
-    bin_identifier = serializers.CharField(source='bin.identifier', read_only=True)
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # Le décompte annoté au chargement ne reflète plus les bacs modifiés
+        instance.__dict__.pop('bins_count', None)
+        return instance
+
+class RouteStopSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = RouteStop
+        fields = [
+            'id', 'sequence', 'trip', 'kind', 'bin', 'tri_center',
+            'latitude', 'longitude', 'load_kg', 'distance_km'
+        ]
+        read_only_fields = fields
+
+class PlannedRouteSerializer(CollectionRouteSerializer):
+    stops = RouteStopSerializer(many=True, read_only=True)
+
+    class Meta(CollectionRouteSerializer.Meta):
+        fields = CollectionRouteSerializer.Meta.fields + ['stops']
+
+class RoutePlanRequestSerializer(serializers.Serializer):
+    zone = serializers.PrimaryKeyRelatedField(queryset=Zone.objects.all())
+    scheduled_date = serializers.DateField()
+    depot_lat = serializers.FloatField(min_value=-90, max_value=90)
+    depot_lng = serializers.FloatField(min_value=-180, max_value=180)
+    trucks = serializers.IntegerField(min_value=1, max_value=500)
+    truck_capacity_kg = serializers.FloatField(min_value=1)
+    fill_threshold = serializers.IntegerField(min_value=0, max_value=100, default=70)
+    tri_centers = serializers.PrimaryKeyRelatedField(
+        queryset=TriCenter.objects.all(), many=True, required=False
+    )
+    time_budget = serializers.FloatField(min_value=0, max_value=30, default=5)
+
+class BinReportSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    bin_location = serializers.CharField(source='bin.location', read_only=True)
     reporter_name = serializers.CharField(source='reporter.get_full_name', read_only=True)
     issue_type_display = serializers.CharField(source='get_issue_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -90,36 +216,83 @@ class BinReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = BinReport
         fields = [
-            'id', 'bin', 'bin_identifier', 'reporter', 'reporter_name',
+            'id', 'bin', 'bin_location', 'reporter', 'reporter_name',
             'issue_type', 'issue_type_display', 'status', 'status_display',
-            'description', 'date', 'resolved_date'
+            'message', 'is_resolved', 'date', 'resolved_at'
         ]
-        read_only_fields = ['id', 'date', 'resolved_date']
+        read_only_fields = ['id', 'date', 'resolved_at']
+
+class TriCenterSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    # Présent uniquement avec ?near= et sur /tri-centers/nearest/
+    distance_m = serializers.FloatField(read_only=True)
 
-class TriCenterSerializer(serializers.ModelSerializer):
     class Meta:
         model = TriCenter
         fields = [
             'id', 'name', 'address', 'gps_lat', 'gps_lng',
-            'email_contact', 'phone', 'total_capacity', 'created_at'
+            'email_contact', 'phone', 'total_capacity', 'created_at', 'distance_m'
         ]
         read_only_fields = ['id', 'created_at']
 
-class WasteFlowSerializer(serializers.ModelSerializer):
+class WasteFlowSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     tri_center_name = serializers.CharField(source='tri_center.name', read_only=True)
-    bin_identifier = serializers.CharField(source='smart_bin.identifier', read_only=True)
+    bin_location = serializers.CharField(source='smart_bin.location', read_only=True)
     waste_type_display = serializers.CharField(source='get_waste_type_display', read_only=True)
 
     class Meta:
         model = WasteFlow
         fields = [
-            'id', 'tri_center', 'tri_center_name', 'smart_bin', 'bin_identifier',
+            'id', 'tri_center', 'tri_center_name', 'smart_bin', 'bin_location',
             'processing_date', 'waste_type', 'waste_type_display', 'quantity_kg',
             'recycling_rate', 'anomaly_detected', 'comment'
         ]
         read_only_fields = ['id']
 
-class CenterStatisticsSerializer(serializers.ModelSerializer):
+class WasteFlowImportSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    file = serializers.FileField(write_only=True)
+
+    class Meta:
+        model = WasteFlowImport
+        fields = [
+            'id', 'file', 'file_name', 'tri_center', 'status', 'total_rows',
+            'processed_rows', 'created_count', 'duplicate_count', 'error_count',
+            'errors', 'message', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'file_name', 'status', 'total_rows', 'processed_rows', 'created_count',
+            'duplicate_count', 'error_count', 'errors', 'message', 'created_at',
+            'started_at', 'finished_at'
+        ]
+
+    def validate_file(self, value):
+        kind = file_format(value.name)
+        if kind is None:
+            raise serializers.ValidationError("Fichier CSV ou XLSX attendu.")
+        if kind == 'xlsx' and openpyxl is None:
+            raise serializers.ValidationError("Import XLSX indisponible : openpyxl n'est pas installé.")
+        return value
+
+    def create(self, validated_data):
+        validated_data['file_name'] = validated_data['file'].name
+        return super().create(validated_data)
+
+class JobSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'params', 'priority', 'status', 'status_display', 'attempts',
+            'max_attempts', 'run_at', 'error', 'created_by', 'created_at', 'started_at',
+            'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'attempts', 'max_attempts', 'error', 'created_by',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        extra_kwargs = {'priority': {'required': False}, 'run_at': {'required': False}}
+
+class CenterStatisticsSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     tri_center_name = serializers.CharField(source='tri_center.name', read_only=True)
     period_type_display = serializers.CharField(source='get_period_type_display', read_only=True)
 
@@ -132,7 +305,18 @@ class CenterStatisticsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
 
-class StatisticsSerializer(serializers.Serializer):
+class PaymentPlanSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    plan_type_display = serializers.CharField(source='get_plan_type_display', read_only=True)
+
+    class Meta:
+        model = PaymentPlan
+        fields = [
+            'id', 'name', 'description', 'price', 'plan_type', 'plan_type_display',
+            'features', 'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class StatisticsSerializer(TimedSerializerMixin, serializers.Serializer):
     total_bins = serializers.IntegerField()
     full_bins = serializers.IntegerField()
     average_fill_level = serializers.FloatField()
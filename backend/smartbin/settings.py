@@ -93,6 +93,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'smartbin.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 # JWT Settings
@@ -0,0 +1,137 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import alerts, anomalies, center_statistics, dashboard, forecast, instrumentation, realtime, response_cache
+from .models import (
+    Alert, AlertRule, Collection, ModulePermission, PaymentPlan, SmartBin, TriCenter, UserRole,
+    WasteFlow, Zone,
+)
+from .role_permissions import invalidate_role_permissions
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
+
+
+@receiver(m2m_changed, sender=UserRole.permissions.through)
+def role_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_role_permissions()
+
+
+@receiver(post_save, sender=ModulePermission)
+@receiver(post_delete, sender=ModulePermission)
+@receiver(post_delete, sender=UserRole)
+def module_permission_changed(sender, **kwargs):
+    invalidate_role_permissions()
+
+
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+def alert_rule_changed(sender, **kwargs):
+    alerts.invalidate_rules()
+
+
+# Réponses en cache des données de référence (voir response_cache.py)
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+@receiver(post_save, sender=TriCenter)
+@receiver(post_delete, sender=TriCenter)
+@receiver(post_save, sender=PaymentPlan)
+@receiver(post_delete, sender=PaymentPlan)
+@receiver(post_save, sender=ModulePermission)
+@receiver(post_delete, sender=ModulePermission)
+def reference_data_changed(sender, instance, **kwargs):
+    response_cache.invalidate(instance)
+
+
+# Compteurs du tableau de bord (voir dashboard.py)
+
+@receiver(post_init, sender=SmartBin)
+@receiver(post_init, sender=Collection)
+@receiver(post_init, sender=Alert)
+def remember_dashboard_state(sender, instance, **kwargs):
+    dashboard.remember_state(instance)
+
+
+@receiver(post_save, sender=Zone)
+def zone_saved(sender, instance, created, **kwargs):
+    if created:
+        dashboard.zone_created(instance)
+
+
+@receiver(post_save, sender=SmartBin)
+def bin_saved(sender, instance, created, update_fields, **kwargs):
+    dashboard.bin_saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=SmartBin)
+def bin_deleted(sender, instance, **kwargs):
+    dashboard.bin_deleted(instance)
+
+
+@receiver(post_save, sender=Collection)
+def collection_saved(sender, instance, created, update_fields, **kwargs):
+    dashboard.collection_saved(instance, created, update_fields)
+    if created:
+        # Une collecte remet le niveau à zéro dans le modèle de remplissage
+        forecast.schedule_refit()
+
+
+@receiver(post_delete, sender=Collection)
+def collection_deleted(sender, instance, **kwargs):
+    dashboard.collection_deleted(instance)
+
+
+@receiver(post_save, sender=Alert)
+def alert_saved(sender, instance, created, update_fields, **kwargs):
+    dashboard.alert_saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=Alert)
+def alert_deleted(sender, instance, **kwargs):
+    dashboard.alert_deleted(instance)
+
+
+# Diffusion temps réel (voir realtime.py)
+
+REALTIME_BIN_FIELDS = {'fill_level', 'battery_level', 'status', 'last_reading_at', 'zone', 'zone_id'}
+
+
+@receiver(post_save, sender=SmartBin)
+def publish_bin(sender, instance, update_fields, **kwargs):
+    if update_fields is None or REALTIME_BIN_FIELDS.intersection(update_fields):
+        realtime.bins_changed([instance])
+
+
+@receiver(post_save, sender=Alert)
+def publish_alert(sender, instance, **kwargs):
+    realtime.alerts_changed([instance])
+
+
+# Agrégats CenterStatistics (voir center_statistics.py)
+
+@receiver(post_init, sender=WasteFlow)
+def remember_flow_period(sender, instance, **kwargs):
+    center_statistics.remember_period(instance)
+
+
+@receiver(pre_save, sender=WasteFlow)
+def screen_flow(sender, instance, raw=False, **kwargs):
+    # Pesées anormales (voir anomalies.py) ; les imports jugent leurs lots
+    # avant bulk_create
+    if instance._state.adding and not raw:
+        anomalies.screen_flows([instance])
+
+
+@receiver(post_save, sender=WasteFlow)
+def flow_saved(sender, instance, created, **kwargs):
+    center_statistics.flow_saved(instance, created)
+
+
+@receiver(post_delete, sender=WasteFlow)
+def flow_deleted(sender, instance, **kwargs):
+    center_statistics.flow_deleted(instance)
@@ -0,0 +1,101 @@
+from django.utils import timezone
+
+from . import alerts, center_statistics, dashboard, forecast, imports, realtime, timeseries
+from .jobs import task
+from .models import CollectionRoute, TriCenter, Watermark
+from .query_plan import apply_query_plan
+from .routing import plan_routes
+from .serializers import PlannedRouteSerializer, RoutePlanRequestSerializer
+
+# Tâches exécutables par les workers (``runworkers``). Les paramètres et le
+# résultat sont stockés en JSON sur le job.
+
+
+def route_plan(data):
+    """Planifie les tournées à partir des données validées de RoutePlanRequestSerializer."""
+    tri_centers = data.get('tri_centers') or list(TriCenter.objects.all())
+    routes, unserved, distance_km = plan_routes(
+        zone=data['zone'],
+        scheduled_date=data['scheduled_date'],
+        depot=(data['depot_lat'], data['depot_lng']),
+        trucks=data['trucks'],
+        capacity_kg=data['truck_capacity_kg'],
+        fill_threshold=data['fill_threshold'],
+        tri_centers=tri_centers,
+        time_budget=data['time_budget'],
+    )
+    planned = apply_query_plan(
+        CollectionRoute.objects.filter(pk__in=[route.pk for route in routes]).order_by('pk'),
+        PlannedRouteSerializer,
+    )
+    return {
+        'routes': PlannedRouteSerializer(planned, many=True).data,
+        'unserved': unserved,
+        'distance_km': round(distance_km, 2),
+    }
+
+
+# Un nouvel essai créerait un second jeu de tournées
+@task('plan_routes', max_attempts=1, priority=10)
+def plan_routes_task(**params):
+    serializer = RoutePlanRequestSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    return route_plan(serializer.validated_data)
+
+
+# Un import interrompu reste « en cours » : pas de nouvel essai automatique
+@task('import_waste_flows', max_attempts=1, priority=5)
+def import_waste_flows(import_id):
+    job = imports.run_import(import_id)
+    if job is None:
+        return None
+    return {
+        'status': job.status,
+        'created_count': job.created_count,
+        'duplicate_count': job.duplicate_count,
+        'error_count': job.error_count,
+    }
+
+
+@task('rollup_center_statistics')
+def rollup_center_statistics():
+    return {'written': center_statistics.rollup_pending()}
+
+
+@task('backfill_center_statistics', priority=-10)
+def backfill_center_statistics(tri_center_ids=None, workers=4):
+    started_at = timezone.now()
+    written = center_statistics.backfill(tri_center_ids, workers=workers)
+    if tri_center_ids is None:
+        Watermark.objects.update_or_create(
+            name=center_statistics.WATERMARK_NAME, defaults={'value': started_at}
+        )
+    return {'written': written}
+
+
+@task('rollup_readings')
+def rollup_readings():
+    timeseries.ensure_reading_partitions()
+    written = timeseries.rollup_pending()
+    purged = timeseries.apply_retention()
+    return {
+        'written': written,
+        'readings_purged': purged['readings'],
+        'hourly_rollups_purged': purged['hourly_rollups'],
+        'realtime_events_purged': realtime.purge_events(),
+    }
+
+
+@task('reconcile_statistics', priority=-10)
+def reconcile_statistics(fix=True):
+    return {'drifts': len(dashboard.reconcile(fix=fix))}
+
+
+@task('check_silent_bins')
+def check_silent_bins():
+    return dict(alerts.check_silent_bins())
+
+
+@task('refit_forecasts')
+def refit_forecasts():
+    return {'fitted': forecast.refit()}
@@ -0,0 +1,222 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import alerts, dashboard, forecast, realtime
+from .models import BinReading, SmartBin
+
+# Nombre maximal de relevés acceptés par requête
+MAX_BATCH_SIZE = getattr(settings, 'SMARTBIN_TELEMETRY_MAX_BATCH', 50000)
+# Taille des lots envoyés à la base (IN (...) et UPSERT)
+DB_BATCH_SIZE = 1000
+# Tolérance sur l'horloge des capteurs
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+Reading = namedtuple('Reading', ['index', 'bin_id', 'fill_level', 'battery_level', 'ts'])
+
+
+def _parse_level(row, field, errors, required):
+    value = row.get(field)
+    if value is None:
+        if required:
+            errors[field] = ['Ce champ est requis.']
+        return None
+    if isinstance(value, bool):
+        errors[field] = ['Un nombre est requis.']
+        return None
+    try:
+        level = round(float(value))
+    except (TypeError, ValueError, OverflowError):
+        errors[field] = ['Un nombre est requis.']
+        return None
+    if not 0 <= level <= 100:
+        errors[field] = ['La valeur doit être comprise entre 0 et 100.']
+        return None
+    return level
+
+
+def _parse_ts(row, errors, now):
+    value = row.get('ts')
+    if value is None:
+        return now
+    ts = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            ts = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            pass
+    elif isinstance(value, str):
+        try:
+            ts = parse_datetime(value)
+        except ValueError:
+            pass
+        if ts is not None and timezone.is_naive(ts):
+            ts = timezone.make_aware(ts)
+    if ts is None:
+        errors['ts'] = ['Horodatage invalide (ISO 8601 ou timestamp Unix attendu).']
+    elif ts > now + MAX_CLOCK_SKEW:
+        errors['ts'] = ['Horodatage dans le futur.']
+        ts = None
+    return ts
+
+
+def parse_reading(row, now=None, index=None):
+    """Valide un relevé ; retourne ``(Reading, None)`` ou ``(None, erreurs)``."""
+    now = now or timezone.now()
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Un objet JSON est attendu.']}
+    errors = {}
+    bin_id = row.get('id')
+    if bin_id in (None, ''):
+        errors['id'] = ['Ce champ est requis.']
+    fill_level = _parse_level(row, 'fill_level', errors, required=True)
+    battery_level = _parse_level(row, 'battery', errors, required=False)
+    ts = _parse_ts(row, errors, now)
+    if errors:
+        return None, errors
+    return Reading(index, str(bin_id), fill_level, battery_level, ts), None
+
+
+def _rejected(index, row, errors):
+    bin_id = row.get('id') if isinstance(row, dict) else None
+    return {'index': index, 'id': bin_id, 'status': 'rejected', 'errors': errors}
+
+
+def _fetch_bins(bin_ids):
+    """
+    Retourne {id: SmartBin} pour les bacs existants, par lots, verrouillés
+    jusqu'à la fin de la transaction : l'état lu est celui que le lot
+    remplace, sans transition concurrente (bin_state.py) entre-temps.
+    """
+    # Verrous pris dans l'ordre des identifiants, entre lots concurrents aussi
+    bin_ids = sorted(bin_ids)
+    known = {}
+    for start in range(0, len(bin_ids), DB_BATCH_SIZE):
+        chunk = bin_ids[start:start + DB_BATCH_SIZE]
+        bins = SmartBin.objects.select_for_update(no_key=True).filter(pk__in=chunk).order_by('pk')
+        known.update((bin.pk, bin) for bin in bins)
+    return known
+
+
+def level_runs(readings, bins):
+    """
+    Début de la série de relevés au même niveau de chaque bac après le lot
+    (``fill_level_since``), en prolongeant celle portée par le bac. Les
+    relevés antérieurs au dernier relevé connu du bac sont ignorés.
+    """
+    runs = {}
+    for reading in sorted(readings, key=lambda reading: reading.ts):
+        bin = bins[reading.bin_id]
+        if bin.last_reading_at is not None and reading.ts < bin.last_reading_at:
+            continue
+        level, since = runs.get(reading.bin_id, (bin.fill_level, bin.fill_level_since))
+        if level != reading.fill_level or since is None:
+            level, since = reading.fill_level, reading.ts
+        runs[reading.bin_id] = (level, since)
+    return runs
+
+
+def ingest_readings(rows):
+    """
+    Valide un lot de relevés ``{id, fill_level, battery, ts}`` en une passe et
+    applique le relevé le plus récent de chaque bac en une seule transaction.
+    Tous les relevés acceptés sont historisés dans ``BinReading``.
+
+    Retourne le nombre de relevés acceptés/rejetés et un résultat par ligne,
+    dans l'ordre du lot.
+    """
+    now = timezone.now()
+    results = [None] * len(rows)
+    readings = []
+    for index, row in enumerate(rows):
+        reading, errors = parse_reading(row, now, index)
+        if errors:
+            results[index] = _rejected(index, row, errors)
+        else:
+            readings.append(reading)
+
+    with transaction.atomic():
+        known = _fetch_bins({reading.bin_id for reading in readings})
+
+        latest = {}
+        history = []
+        accepted = []
+        for reading in readings:
+            if reading.bin_id not in known:
+                results[reading.index] = {
+                    'index': reading.index,
+                    'id': reading.bin_id,
+                    'status': 'rejected',
+                    'errors': {'id': ['Bac inconnu.']},
+                }
+                continue
+            results[reading.index] = {
+                'index': reading.index,
+                'id': reading.bin_id,
+                'status': 'accepted',
+            }
+            accepted.append(reading)
+            history.append(BinReading(
+                bin_id=reading.bin_id,
+                ts=reading.ts,
+                fill_level=reading.fill_level,
+                battery_level=reading.battery_level,
+            ))
+            current = latest.get(reading.bin_id)
+            if current is None or reading.ts >= current.ts:
+                latest[reading.bin_id] = reading
+        # Relevés antérieurs au dernier relevé appliqué : historisés, sans
+        # effet sur l'état du bac
+        latest = {
+            bin_id: reading for bin_id, reading in latest.items()
+            if known[bin_id].last_reading_at is None or reading.ts >= known[bin_id].last_reading_at
+        }
+
+        # Règles d'alerte évaluées avant la mise à jour des bacs, qui portent
+        # encore le relevé précédent
+        alerts.evaluate_readings(accepted, known, now)
+        # L'UPSERT ne déclenche pas les signaux : compteurs mis à jour ici
+        dashboard.fill_levels_changed(
+            [known[bin_id] for bin_id in latest],
+            {bin_id: reading.fill_level for bin_id, reading in latest.items()},
+        )
+        runs = level_runs(accepted, known)
+        bins = []
+        for bin_id, reading in latest.items():
+            bin = known[bin_id]
+            bin.fill_level = reading.fill_level
+            if reading.battery_level is not None:
+                bin.battery_level = reading.battery_level
+            bin.last_reading_at = reading.ts
+            if bin_id in runs:
+                bin.fill_level_since = runs[bin_id][1]
+            bin.version += 1
+            bins.append(bin)
+        # UPSERT (INSERT ... ON CONFLICT DO UPDATE) plutôt que bulk_update :
+        # bulk_update construit un CASE WHEN par ligne et par champ, ce qui
+        # coûte plusieurs secondes pour 10k relevés.
+        SmartBin.objects.bulk_create(
+            bins,
+            batch_size=DB_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=[
+                'fill_level', 'battery_level', 'last_reading_at', 'fill_level_since',
+                'version', 'updated_at',
+            ],
+        )
+        BinReading.objects.bulk_create(history, batch_size=DB_BATCH_SIZE)
+        realtime.bins_changed(bins)
+        if history:
+            forecast.schedule_refit()
+
+    accepted = sum(1 for result in results if result['status'] == 'accepted')
+    return {
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results,
+    }
@@ -0,0 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class HotQueryIndexTests(TestCase):
+    """Les requêtes chaudes d'index_advisor sont toutes servies par un index."""
+
+    def test_no_sequential_scan(self):
+        # Lève CommandError si une requête parcourt séquentiellement une table
+        call_command('index_advisor', check=True, rows=2000, min_rows=500, stdout=StringIO())
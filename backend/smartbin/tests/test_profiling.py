@@ -0,0 +1,39 @@
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from smartbin.models import User
+
+PATH = '/api/bins/?_profile=1'
+
+
+class ProfileParameterTests(TestCase):
+    """``?_profile=1`` : profil pour un utilisateur staff, ignoré sinon."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user('profile-staff', password='secret', role='admin', is_staff=True)
+        self.user = User.objects.create_user('profile-user', password='secret', role='citizen')
+
+    def assertProfiled(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'GET /api/bins/?_profile=1', response.content)
+
+    def assertNotProfiled(self, response):
+        self.assertFalse(response['Content-Type'].startswith('text/plain'))
+
+    def test_without_token(self):
+        response = self.client.get(PATH)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotProfiled(response)
+
+    def test_staff_session(self):
+        self.client.force_login(self.staff)
+        self.assertProfiled(self.client.get(PATH))
+
+    def test_staff_bearer_token(self):
+        token = AccessToken.for_user(self.staff)
+        self.assertProfiled(self.client.get(PATH, HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+    def test_non_staff_bearer_token(self):
+        token = AccessToken.for_user(self.user)
+        self.assertNotProfiled(self.client.get(PATH, HTTP_AUTHORIZATION=f'Bearer {token}'))
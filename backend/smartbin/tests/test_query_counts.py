@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from smartbin.management.commands.check_query_counts import LIST_ROUTES, seed
+from smartbin.models import User
+
+ROWS = 5
+
+
+class ListQueryCountTests(TestCase):
+    """Nombre de requêtes SQL des endpoints de liste indépendant du nombre de lignes (N+1)."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create(
+            username='querycount-admin', role='admin', is_staff=True, is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+
+    def _get(self, route):
+        response = self.client.get(reverse(route))
+        self.assertEqual(response.status_code, 200, route)
+        return response
+
+    def test_constant_query_count(self):
+        seed(ROWS, 0)
+        counts = {}
+        for route in LIST_ROUTES:
+            with CaptureQueriesContext(connection) as context:
+                self._get(route)
+            counts[route] = len(context.captured_queries)
+
+        seed(ROWS, ROWS)
+        for route in LIST_ROUTES:
+            with self.subTest(route=route), self.assertNumQueries(counts[route]):
+                self._get(route)
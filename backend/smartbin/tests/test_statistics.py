@@ -0,0 +1,32 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from smartbin.models import User, Zone
+
+
+class StatisticsAccessTests(TestCase):
+    """/api/statistics/ : statistiques propres au rôle, sans permission de module."""
+
+    def _get(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client.get('/api/statistics/')
+
+    def test_anonymous(self):
+        self.assertEqual(APIClient().get('/api/statistics/').status_code, 401)
+
+    def test_admin(self):
+        admin = User.objects.create(username='stats-admin', role='admin', is_staff=True)
+        response = self._get(admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total_bins', response.data)
+
+    def test_collector(self):
+        collector = User.objects.create(username='stats-collector', role='collector')
+        self.assertEqual(self._get(collector).status_code, 200)
+
+    def test_citizen(self):
+        citizen = User.objects.create(username='stats-citizen', role='citizen', zone=Zone.objects.create(name='Centre'))
+        response = self._get(citizen)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('avg_fill_level', response.data)
@@ -0,0 +1,316 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import BinReading, BinReadingRollup, Watermark
+
+# Politique de rétention : relevés bruts, puis agrégats horaires, puis
+# agrégats journaliers conservés sans limite.
+RAW_RETENTION_DAYS = getattr(settings, 'SMARTBIN_READING_RAW_RETENTION_DAYS', 30)
+HOURLY_RETENTION_DAYS = getattr(settings, 'SMARTBIN_READING_HOURLY_RETENTION_DAYS', 365)
+# Les relevés arrivés en retard de moins de LATE_WINDOW sont pris en compte
+# par le recalcul suivant.
+LATE_WINDOW = timedelta(hours=getattr(settings, 'SMARTBIN_READING_LATE_WINDOW_HOURS', 6))
+# Nombre de partitions mensuelles créées à l'avance (PostgreSQL)
+PARTITIONS_AHEAD = 2
+
+ROLLUP_BATCH_SIZE = 5000
+WATERMARK_NAME = 'bin_readings'
+
+PARTITION_PREFIX = 'smartbin_binreading_p'
+DEFAULT_PARTITION = 'smartbin_binreading_default'
+
+# Intervalle maximal servi en relevés bruts par l'API d'historique
+MAX_RAW_SPAN = timedelta(days=7)
+
+BUCKETS = {
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day': (TruncDay, timedelta(days=1)),
+}
+
+
+def floor_ts(ts, bucket):
+    ts = timezone.localtime(ts).replace(minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        ts = ts.replace(hour=0)
+    return ts
+
+
+def ceil_ts(ts, bucket):
+    floored = floor_ts(ts, bucket)
+    if floored == ts:
+        return floored
+    return floored + BUCKETS[bucket][1]
+
+
+def _month_start(ts):
+    return floor_ts(ts, 'day').replace(day=1)
+
+
+def _next_month(ts):
+    return (ts + timedelta(days=32)).replace(day=1)
+
+
+def _is_partitioned():
+    return connection.vendor == 'postgresql'
+
+
+def _reading_partitions():
+    """Retourne [(nom, début du mois)] des partitions mensuelles existantes."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'smartbin_binreading'::regclass"
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        suffix = name[len(PARTITION_PREFIX):]
+        start = timezone.make_aware(datetime(int(suffix[:4]), int(suffix[4:6]), 1))
+        partitions.append((name, start))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_reading_partitions(now=None, months_ahead=PARTITIONS_AHEAD):
+    """
+    Crée les partitions mensuelles du mois courant et des mois suivants.
+    Les relevés déjà tombés dans la partition par défaut pour un de ces mois
+    y sont déplacés avant l'attachement.
+    """
+    if not _is_partitioned():
+        return []
+    now = now or timezone.now()
+    existing = {name for name, _ in _reading_partitions()}
+    created = []
+    month = _month_start(now)
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        name = f'{PARTITION_PREFIX}{month:%Y%m}'
+        if name not in existing:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE {name} '
+                    f'(LIKE smartbin_binreading INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+                )
+                cursor.execute(
+                    f'INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} '
+                    f'WHERE ts >= %s AND ts < %s',
+                    [month, upper],
+                )
+                cursor.execute(
+                    f'DELETE FROM {DEFAULT_PARTITION} WHERE ts >= %s AND ts < %s',
+                    [month, upper],
+                )
+                cursor.execute(
+                    f'ALTER TABLE smartbin_binreading ATTACH PARTITION {name} '
+                    f'FOR VALUES FROM (%s) TO (%s)',
+                    [month, upper],
+                )
+            created.append(name)
+        month = upper
+    return created
+
+
+def _upsert_rollups(rollups):
+    if rollups:
+        BinReadingRollup.objects.bulk_create(
+            rollups,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['bin', 'bucket', 'ts'],
+            update_fields=['count', 'fill_min', 'fill_max', 'fill_avg', 'battery_min'],
+        )
+
+
+def aggregate_readings(bin_ids, bucket, start, end):
+    """Agrège les relevés bruts de [start, end) par intervalle ``bucket``."""
+    trunc = BUCKETS[bucket][0]
+    queryset = BinReading.objects.filter(ts__gte=start, ts__lt=end)
+    if bin_ids is not None:
+        queryset = queryset.filter(bin_id__in=bin_ids)
+    return (
+        queryset
+        .annotate(bucket_ts=trunc('ts'))
+        .values('bin_id', 'bucket_ts')
+        .annotate(
+            count=Count('id'),
+            fill_min=Min('fill_level'),
+            fill_max=Max('fill_level'),
+            fill_avg=Avg('fill_level'),
+            battery_min=Min('battery_level'),
+        )
+        .order_by('bin_id', 'bucket_ts')
+    )
+
+
+def rollup_readings(start, end):
+    """
+    (Re)calcule les agrégats horaires et journaliers des relevés de
+    [start, end), jour par jour. L'opération est idempotente (UPSERT).
+    """
+    day = floor_ts(start, 'day')
+    written = 0
+    while day < end:
+        day_end = day + timedelta(days=1)
+        for bucket in ('hour', 'day'):
+            window_start = max(day, floor_ts(start, bucket))
+            window_end = min(day_end, ceil_ts(end, bucket))
+            rollups = []
+            rows = aggregate_readings(None, bucket, window_start, window_end)
+            for row in rows.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+                rollups.append(BinReadingRollup(
+                    bin_id=row['bin_id'],
+                    bucket=bucket,
+                    ts=row['bucket_ts'],
+                    count=row['count'],
+                    fill_min=row['fill_min'],
+                    fill_max=row['fill_max'],
+                    fill_avg=row['fill_avg'],
+                    battery_min=row['battery_min'],
+                ))
+                if len(rollups) >= ROLLUP_BATCH_SIZE:
+                    _upsert_rollups(rollups)
+                    written += len(rollups)
+                    rollups = []
+            _upsert_rollups(rollups)
+            written += len(rollups)
+        day = day_end
+    return written
+
+
+def get_rollup_watermark():
+    """Instant jusqu'auquel les agrégats sont à jour (None si jamais calculés)."""
+    return Watermark.objects.filter(name=WATERMARK_NAME).values_list('value', flat=True).first()
+
+
+def rollup_pending(now=None):
+    """
+    Agrège les relevés arrivés depuis le dernier passage (heures complètes
+    uniquement), en recalculant LATE_WINDOW en arrière pour les retardataires.
+    """
+    now = now or timezone.now()
+    end = floor_ts(now, 'hour')
+    watermark = get_rollup_watermark()
+    if watermark is None:
+        first = BinReading.objects.aggregate(first=Min('ts'))['first']
+        if first is None:
+            return 0
+        start = first
+    else:
+        start = watermark - LATE_WINDOW
+    if start >= end:
+        return 0
+    written = rollup_readings(start, end)
+    Watermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': end})
+    return written
+
+
+def apply_retention(now=None):
+    """
+    Supprime les relevés bruts plus anciens que RAW_RETENTION_DAYS (uniquement
+    s'ils ont déjà été agrégés) et les agrégats horaires plus anciens que
+    HOURLY_RETENTION_DAYS. Sous PostgreSQL les mois entiers sont supprimés
+    par DROP de leur partition.
+    """
+    now = now or timezone.now()
+    watermark = get_rollup_watermark()
+    if watermark is None:
+        return {'readings': 0, 'partitions': [], 'hourly_rollups': 0}
+    cutoff = floor_ts(min(now - timedelta(days=RAW_RETENTION_DAYS), watermark - LATE_WINDOW), 'day')
+
+    dropped = []
+    if _is_partitioned():
+        for name, start in _reading_partitions():
+            if _next_month(start) <= cutoff:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+    readings, _ = BinReading.objects.filter(ts__lt=cutoff).delete()
+    hourly, _ = BinReadingRollup.objects.filter(
+        bucket='hour', ts__lt=now - timedelta(days=HOURLY_RETENTION_DAYS)
+    ).delete()
+    return {'readings': readings, 'partitions': dropped, 'hourly_rollups': hourly}
+
+
+def _raw_points(bin_id, start, end):
+    return [
+        {'ts': ts, 'fill_level': fill_level, 'battery_level': battery_level}
+        for ts, fill_level, battery_level in BinReading.objects.filter(
+            bin_id=bin_id, ts__gte=start, ts__lt=end
+        ).order_by('ts').values_list('ts', 'fill_level', 'battery_level')
+    ]
+
+
+def _bucket_point(ts, count, fill_min, fill_max, fill_avg, battery_min):
+    return {
+        'ts': ts,
+        'count': count,
+        'fill_min': fill_min,
+        'fill_max': fill_max,
+        'fill_avg': round(fill_avg, 2) if fill_avg is not None else None,
+        'battery_min': battery_min,
+    }
+
+
+def parse_bound(value):
+    """Date ou date-heure ISO 8601 -> datetime aware ; ValueError si invalide."""
+    if not value:
+        return None
+    ts = parse_datetime(value)
+    if ts is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        ts = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts)
+    return ts
+
+
+def choose_bucket(start, end, now=None):
+    """Résolution la plus grossière permettant une courbe lisible."""
+    now = now or timezone.now()
+    span = end - start
+    if span <= timedelta(days=2) and start >= now - timedelta(days=RAW_RETENTION_DAYS):
+        return 'raw'
+    if span <= timedelta(days=31) and start >= now - timedelta(days=HOURLY_RETENTION_DAYS):
+        return 'hour'
+    return 'day'
+
+
+def reading_history(bin_id, start, end, bucket):
+    """
+    Historique d'un bac sur [start, end). Les intervalles antérieurs au
+    watermark sont lus dans les agrégats, les plus récents sont agrégés à la
+    volée à partir des relevés bruts.
+    """
+    if bucket == 'raw':
+        return _raw_points(bin_id, start, end)
+
+    watermark = get_rollup_watermark()
+    split = floor_ts(watermark, bucket) if watermark is not None else start
+    split = min(max(split, start), end)
+
+    points = [
+        _bucket_point(*row)
+        for row in BinReadingRollup.objects.filter(
+            bin_id=bin_id, bucket=bucket, ts__gte=floor_ts(start, bucket), ts__lt=split
+        ).order_by('ts').values_list('ts', 'count', 'fill_min', 'fill_max', 'fill_avg', 'battery_min')
+    ]
+    if split < end:
+        points.extend(
+            _bucket_point(
+                row['bucket_ts'], row['count'], row['fill_min'],
+                row['fill_max'], row['fill_avg'], row['battery_min'],
+            )
+            for row in aggregate_readings([bin_id], bucket, split, end)
+        )
+    return points
@@ -2,9 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, ZoneViewSet, SmartBinViewSet, CollectionViewSet,
-    AlertViewSet, CollectionRouteViewSet, BinReportViewSet,
-    TriCenterViewSet, WasteFlowViewSet, CenterStatisticsViewSet,
-    tri_center_data_entry
+    AlertViewSet, AlertRuleViewSet, CollectionRouteViewSet, BinReportViewSet,
+    TriCenterViewSet, WasteFlowViewSet, WasteFlowImportViewSet, CenterStatisticsViewSet,
+    StatisticsViewSet, JobViewSet, PaymentPlanViewSet, ModuleViewSet,
+    event_stream, tri_center_data_entry
 )
 
 router = DefaultRouter()
@@ -13,13 +14,20 @@ router.register(r'zones', ZoneViewSet)
 router.register(r'bins', SmartBinViewSet)
 router.register(r'collections', CollectionViewSet)
 router.register(r'alerts', AlertViewSet)
+router.register(r'alert-rules', AlertRuleViewSet)
 router.register(r'routes', CollectionRouteViewSet)
 router.register(r'reports', BinReportViewSet)
 router.register(r'tri-centers', TriCenterViewSet)
 router.register(r'waste-flows', WasteFlowViewSet)
+router.register(r'waste-flow-imports', WasteFlowImportViewSet)
 router.register(r'center-statistics', CenterStatisticsViewSet)
+router.register(r'statistics', StatisticsViewSet, basename='statistics')
+router.register(r'jobs', JobViewSet)
+router.register(r'payment-plans', PaymentPlanViewSet)
+router.register(r'modules', ModuleViewSet, basename='module')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('events/stream/', event_stream, name='event_stream'),
     path('tri-center/data-entry/', tri_center_data_entry, name='tri_center_data_entry'),
 ] 
\ No newline at end of file
@@ -1,83 +1,284 @@
-from rest_framework import viewsets, status
+import hmac
+
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework.permissions import AllowAny
-from .models import User, Zone, SmartBin, Collection, Alert, CollectionRoute, BinReport, UserProfile, TriCenter, WasteFlow, CenterStatistics
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from .models import User, Zone, SmartBin, BinReading, Collection, Alert, AlertRule, CollectionRoute, BinReport, UserProfile, TriCenter, WasteFlow, WasteFlowImport, CenterStatistics, DashboardCounter, Job, ModulePermission, PaymentPlan
 from .serializers import (
     UserSerializer, ZoneSerializer, SmartBinSerializer, CollectionSerializer,
-    AlertSerializer, CollectionRouteSerializer, BinReportSerializer,
-    UserProfileSerializer, TriCenterSerializer, WasteFlowSerializer,
-    CenterStatisticsSerializer
+    AlertSerializer, AlertRuleSerializer, CollectionRouteSerializer, BinReportSerializer,
+    UserProfileSerializer, TriCenterSerializer, WasteFlowSerializer, WasteFlowImportSerializer,
+    CenterStatisticsSerializer, CustomTokenObtainPairSerializer, JobSerializer,
+    RoutePlanRequestSerializer, RouteStopSerializer, PaymentPlanSerializer
 )
 from .permissions import (
     IsAdminOrReadOnly, IsCollector, IsZoneManager, IsBinOwner, IsReportOwner,
-    IsResident, IsCollectionOwner, IsTriCenterManager, HasModulePermission
+    IsResident, IsCollectionOwner, IsTriCenterManager,
+    CollectionPermissions
 )
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Avg, F, ExpressionWrapper, FloatField
+from django.db.models import Count, Avg, F, ExpressionWrapper, FloatField, Q
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from .filters import (
     SmartBinFilter, CollectionFilter, AlertFilter,
     CollectionRouteFilter, BinReportFilter, TriCenterFilter,
-    WasteFlowFilter, CenterStatisticsFilter
+    WasteFlowFilter, CenterStatisticsFilter, PaymentPlanFilter
 )
 from django.shortcuts import render, redirect
-from django.http import HttpResponseForbidden
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from . import bin_state, instrumentation, realtime
+from .apps import SmartBinConfig
+from .async_views import AsyncViewSetMixin
+from .parsers import NDJSONParser
+from .query_plan import QueryPlanMixin, apply_query_plan
+from .replicas import ReplicaReadMixin
+from .response_cache import CachedResponseMixin
+from .dashboard import GLOBAL_KEY, collector_summary
+from .export import ExportMixin
+from .forecast import schedule_refit
+from .geo import nearest
+from .imports import start_import
+from .jobs import TASKS, enqueue
+from .tasks import route_plan
+from .telemetry import MAX_BATCH_SIZE, ingest_readings, parse_reading
+from .timeseries import MAX_RAW_SPAN, choose_bucket, parse_bound, reading_history
 
 User = get_user_model()
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     permission_classes = (AllowAny,)
+    serializer_class = CustomTokenObtainPairSerializer
 
 class CustomTokenRefreshView(TokenRefreshView):
     permission_classes = (AllowAny,)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cursor_field = 'date_joined'
 
-class ZoneViewSet(viewsets.ModelViewSet):
+class ZoneViewSet(CachedResponseMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Zone.objects.all()
     serializer_class = ZoneSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_models = (Zone,)
+    cache_timeout = 3600
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['name', 'manager']
+    filterset_fields = ['name']
 
-class SmartBinViewSet(viewsets.ModelViewSet):
+class SmartBinViewSet(AsyncViewSetMixin, ReplicaReadMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = SmartBin.objects.all()
     serializer_class = SmartBinSerializer
     permission_classes = [IsAdminOrReadOnly | IsZoneManager]
     filter_backends = [DjangoFilterBackend]
     filterset_class = SmartBinFilter
+    async_actions = ('list', 'retrieve', 'telemetry_bulk')
+    replica_actions = ('history',)
+
+    def get_cursor_ordering(self):
+        # Avec ?near=, du plus proche au plus éloigné
+        if 'near' in self.request.query_params:
+            return 'distance_m', False
+        # ?ordering=fill_level ou -fill_level : index (fill_level, id)
+        ordering = self.request.query_params.get('ordering')
+        if ordering in ('fill_level', '-fill_level'):
+            return 'fill_level', ordering.startswith('-')
+        return 'created_at', True
+
+    def perform_update(self, serializer):
+        # Seules les colonnes modifiées sont écrites : l'état du bac (niveau,
+        # relevés, collectes) ne change que par bin_state.py, et une
+        # modification ne doit pas écraser une transition concurrente
+        bin = serializer.instance
+        for field, value in serializer.validated_data.items():
+            setattr(bin, field, value)
+        bin.version = F('version') + 1
+        bin.save(update_fields=[*serializer.validated_data, 'version', 'updated_at'])
+        # Réponse avec l'état courant, pas celui lu avant la modification
+        bin.refresh_from_db(fields=bin_state.STATE_FIELDS)
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         bin = self.get_object()
         new_status = request.data.get('status')
-        if new_status:
-            bin.status = new_status
-            bin.save()
-            return Response({'status': 'success'})
-        return Response({'status': 'error'}, status=status.HTTP_400_BAD_REQUEST)
+        has_reading = request.data.get('fill_level') is not None
+        if not new_status and not has_reading:
+            return Response({'status': 'error'}, status=status.HTTP_400_BAD_REQUEST)
+        if new_status and new_status not in dict(SmartBin.STATUS_CHOICES):
+            return Response({'status': 'error', 'errors': {'status': ['Statut inconnu.']}},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        reading = None
+        if has_reading:
+            reading, errors = parse_reading({
+                'id': bin.pk,
+                'fill_level': request.data.get('fill_level'),
+                'battery': request.data.get('battery'),
+                'ts': request.data.get('ts'),
+            })
+            if errors:
+                return Response({'status': 'error', 'errors': errors},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        applied = None
+        try:
+            with transaction.atomic():
+                if reading:
+                    # Historisé même s'il est antérieur au dernier relevé appliqué
+                    applied = bin_state.apply_reading(bin, reading)
+                    BinReading.objects.create(
+                        bin=bin,
+                        ts=reading.ts,
+                        fill_level=reading.fill_level,
+                        battery_level=reading.battery_level,
+                    )
+                    schedule_refit()
+                if new_status:
+                    bin_state.set_status(bin, new_status)
+        except bin_state.ConcurrentUpdate as exc:
+            return Response({'status': 'error', 'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except SmartBin.DoesNotExist:
+            # Bac supprimé entre sa lecture et la transition
+            raise Http404
+        if applied is False:
+            return Response({'status': 'success', 'reading': 'stale'})
+        return Response({'status': 'success'})
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminOrReadOnly | IsZoneManager | IsCollector])
+    def collect(self, request, pk=None):
+        # Collecte enregistrée et bac vidé dans la même transaction. Le bac
+        # est modifié en premier : verrous pris dans le même ordre que pour
+        # un relevé (bac, puis compteurs du tableau de bord)
+        bin = self.get_object()
+        date = timezone.now()
+        try:
+            with transaction.atomic():
+                bin_state.collect(bin, date)
+                collection = Collection.objects.create(
+                    bin=bin,
+                    collector=request.user if request.user.role == 'collector' else None,
+                    date=date,
+                    notes=request.data.get('notes', ''),
+                )
+        except bin_state.ConcurrentUpdate as exc:
+            return Response({'status': 'error', 'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except SmartBin.DoesNotExist:
+            raise Http404
+        return Response(CollectionSerializer(collection).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        bin = self.get_object()
+        now = timezone.now()
+        try:
+            end = parse_bound(request.query_params.get('to')) or now
+            start = parse_bound(request.query_params.get('from')) or end - timedelta(days=1)
+        except ValueError:
+            return Response({'error': 'Les paramètres from et to doivent être des dates ISO 8601'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({'error': 'from doit précéder to'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        bucket = request.query_params.get('bucket', 'auto')
+        if bucket == 'auto':
+            bucket = choose_bucket(start, end, now)
+        elif bucket not in ('raw', 'hour', 'day'):
+            return Response({'error': 'bucket doit valoir raw, hour, day ou auto'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if bucket == 'raw' and end - start > MAX_RAW_SPAN:
+            return Response({'error': f'Au plus {MAX_RAW_SPAN.days} jours en relevés bruts'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'bin': bin.pk,
+            'bucket': bucket,
+            'from': start,
+            'to': end,
+            'points': reading_history(bin.pk, start, end, bucket),
+        })
 
-class CollectionViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        # Suggestions pour les formulaires de saisie : identifiant ou adresse
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+        bins = SmartBin.objects.order_by('pk')
+        if query:
+            bins = bins.filter(Q(pk__startswith=query) | Q(location__icontains=query))
+        return Response(list(bins.values('id', 'location')[:limit]))
+
+    @action(detail=False, methods=['post'], url_path='telemetry/bulk',
+            parser_classes=[JSONParser, NDJSONParser])
+    def telemetry_bulk(self, request):
+        rows, error = self._telemetry_rows(request)
+        if error is not None:
+            return error
+        return Response(ingest_readings(rows))
+
+    async def atelemetry_bulk(self, request):
+        # Lecture du corps et ingestion dans un thread
+        rows, error = await sync_to_async(self._telemetry_rows)(request)
+        if error is not None:
+            return error
+        return Response(await sync_to_async(ingest_readings)(rows))
+
+    def _telemetry_rows(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return None, Response(
+                {'error': 'Un tableau JSON ou un flux NDJSON de relevés est attendu'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_BATCH_SIZE:
+            return None, Response(
+                {'error': f'Au plus {MAX_BATCH_SIZE} relevés par requête'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        return rows, None
+
+class CollectionViewSet(ReplicaReadMixin, QueryPlanMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
     permission_classes = [IsAdminOrReadOnly | IsCollector | IsCollectionOwner]
     filter_backends = [DjangoFilterBackend]
     filterset_class = CollectionFilter
+    export_name = 'collections'
+    replica_actions = ('export',)
+    export_ordering = ('created_at', 'pk')
+    export_columns = [
+        ('id', 'id'),
+        ('bin', 'bin'),
+        ('bin_location', 'bin__location'),
+        ('zone', 'bin__zone__name'),
+        ('collector', 'collector'),
+        ('collector_username', 'collector__username'),
+        ('date', 'date'),
+        ('notes', 'notes'),
+        ('created_at', 'created_at'),
+    ]
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'collector':
-            return Collection.objects.filter(collector=user)
-        return Collection.objects.all()
+            return queryset.filter(collector=user)
+        return queryset
 
-class AlertViewSet(viewsets.ModelViewSet):
+class AlertViewSet(AsyncViewSetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
     permission_classes = [IsAdminOrReadOnly | IsZoneManager | IsBinOwner]
@@ -85,19 +286,29 @@ class AlertViewSet(viewsets.ModelViewSet):
     filterset_class = AlertFilter
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'citizen':
-            return Alert.objects.filter(bin__zone=user.zone)
-        return Alert.objects.all()
+            return queryset.filter(bin__zone=user.zone)
+        return queryset
 
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
         alert = self.get_object()
-        alert.status = 'resolved'
-        alert.save()
+        if not alert.is_resolved:
+            alert.is_resolved = True
+            alert.resolved_at = timezone.now()
+            alert.save(update_fields=['is_resolved', 'resolved_at'])
         return Response({'status': 'success'})
 
-class CollectionRouteViewSet(viewsets.ModelViewSet):
+class AlertRuleViewSet(QueryPlanMixin, viewsets.ModelViewSet):
+    queryset = AlertRule.objects.all()
+    serializer_class = AlertRuleSerializer
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['condition', 'zone', 'is_active']
+
+class CollectionRouteViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CollectionRoute.objects.all()
     serializer_class = CollectionRouteSerializer
     permission_classes = [IsAdminOrReadOnly | IsCollector]
@@ -105,10 +316,11 @@ class CollectionRouteViewSet(viewsets.ModelViewSet):
     filterset_class = CollectionRouteFilter
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'collector':
-            return CollectionRoute.objects.filter(collector=user)
-        return CollectionRoute.objects.all()
+            return queryset.filter(collector=user)
+        return queryset
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -117,7 +329,28 @@ class CollectionRouteViewSet(viewsets.ModelViewSet):
         route.save()
         return Response({'status': 'success'})
 
-class BinReportViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def stops(self, request, pk=None):
+        route = self.get_object()
+        serializer = RouteStopSerializer(route.stops.all(), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[IsAdminOrReadOnly | IsZoneManager | CollectionPermissions.manage])
+    def plan(self, request):
+        params = RoutePlanRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        if not params.validated_data.get('tri_centers') and not TriCenter.objects.exists():
+            return Response({'error': 'Aucun centre de tri pour décharger les camions'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get('async') in ('1', 'true'):
+            # Résultat (même contenu que la réponse synchrone) sur /jobs/{id}/result/
+            job = enqueue('plan_routes', params.data, created_by=request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        return Response(route_plan(params.validated_data), status=status.HTTP_201_CREATED)
+
+class BinReportViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = BinReport.objects.all()
     serializer_class = BinReportSerializer
     permission_classes = [IsAdminOrReadOnly | IsZoneManager | IsReportOwner | IsResident]
@@ -125,10 +358,11 @@ class BinReportViewSet(viewsets.ModelViewSet):
     filterset_class = BinReportFilter
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'citizen':
-            return BinReport.objects.filter(bin__zone=user.zone)
-        return BinReport.objects.all()
+            return queryset.filter(bin__zone=user.zone)
+        return queryset
 
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -137,65 +371,74 @@ class BinReportViewSet(viewsets.ModelViewSet):
         report.save()
         return Response({'status': 'success'})
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['role', 'zone']
+    filterset_fields = ['user']
 
-class StatisticsViewSet(viewsets.ViewSet):
-    permission_classes = [HasModulePermission]
+class StatisticsViewSet(AsyncViewSetMixin, ReplicaReadMixin, viewsets.ViewSet):
+    # Chaque rôle ne reçoit que ses propres statistiques (voir list())
+    permission_classes = [IsAuthenticated]
+    async_actions = ('list',)
+    replica_actions = ('list',)
 
+    # Servi depuis les compteurs tenus à jour par dashboard.py : le coût ne
+    # dépend pas du volume de collectes
     def list(self, request):
         user = request.user
         if user.role == 'admin':
-            # Statistiques globales
-            total_bins = SmartBin.objects.count()
-            total_collections = Collection.objects.count()
-            total_alerts = Alert.objects.count()
-            avg_fill_level = SmartBin.objects.aggregate(avg=Avg('fill_level'))['avg']
-            
-            # Statistiques par zone
-            zone_stats = Zone.objects.annotate(
-                bin_count=Count('smartbin'),
-                avg_fill_level=Avg('smartbin__fill_level')
-            ).values('name', 'bin_count', 'avg_fill_level')
-
-            return Response({
-                'total_bins': total_bins,
-                'total_collections': total_collections,
-                'total_alerts': total_alerts,
-                'avg_fill_level': avg_fill_level,
-                'zone_stats': zone_stats
-            })
+            counters = DashboardCounter.objects.select_related('zone').order_by('zone__name')
+            return Response(self._admin_statistics(counters))
         elif user.role == 'collector':
             # Statistiques du collecteur
-            today = timezone.now().date()
-            weekly_collections = Collection.objects.filter(
-                collector=user,
-                collection_date__gte=today - timedelta(days=7)
-            ).count()
-            
-            bins_collected = Collection.objects.filter(
-                collector=user,
-                collection_date__gte=today - timedelta(days=30)
-            ).values('bin').distinct().count()
-
-            return Response({
-                'weekly_collections': weekly_collections,
-                'bins_collected': bins_collected
-            })
+            return Response(collector_summary(user.pk))
         elif user.role == 'citizen':
             # Statistiques de la zone du citoyen
-            zone_bins = SmartBin.objects.filter(zone=user.zone)
-            avg_fill_level = zone_bins.aggregate(avg=Avg('fill_level'))['avg']
-            alerts_count = Alert.objects.filter(bin__zone=user.zone).count()
+            counter = None
+            if user.zone_id is not None:
+                counter = DashboardCounter.objects.filter(zone_id=user.zone_id).first()
+            return Response(self._zone_statistics(counter))
+        return Response({})
 
-            return Response({
-                'avg_fill_level': avg_fill_level,
-                'alerts_count': alerts_count
-            })
+    async def alist(self, request):
+        user = request.user
+        if user.role == 'admin':
+            counters = DashboardCounter.objects.select_related('zone').order_by('zone__name')
+            return Response(self._admin_statistics([counter async for counter in counters]))
+        elif user.role == 'collector':
+            return Response(await sync_to_async(collector_summary)(user.pk))
+        elif user.role == 'citizen':
+            counter = None
+            if user.zone_id is not None:
+                counter = await DashboardCounter.objects.filter(zone_id=user.zone_id).afirst()
+            return Response(self._zone_statistics(counter))
+        return Response({})
+
+    def _admin_statistics(self, counters):
+        total = next((c for c in counters if c.key == GLOBAL_KEY), DashboardCounter())
+        return {
+            'total_bins': total.bin_count,
+            'total_collections': total.collection_count,
+            'total_alerts': total.alert_count,
+            'avg_fill_level': total.avg_fill_level,
+            'zone_stats': [
+                {
+                    'name': counter.zone.name,
+                    'bin_count': counter.bin_count,
+                    'avg_fill_level': counter.avg_fill_level,
+                }
+                for counter in counters if counter.zone_id is not None
+            ],
+        }
+
+    def _zone_statistics(self, counter):
+        counter = counter or DashboardCounter()
+        return {
+            'avg_fill_level': counter.avg_fill_level,
+            'alerts_count': counter.alert_count,
+        }
 
 def tri_center_data_entry(request):
     if not request.user.is_authenticated:
@@ -204,60 +447,273 @@ def tri_center_data_entry(request):
     if not (request.user.is_staff or request.user.role == 'tri_center'):
         return HttpResponseForbidden("Vous n'avez pas les permissions nécessaires")
     
-    tri_centers = TriCenter.objects.all()
-    smart_bins = SmartBin.objects.all()
+    # Les bacs sont proposés par /api/bins/autocomplete/ au fil de la saisie
+    tri_centers = TriCenter.objects.only('id', 'name').order_by('name')
     
     return render(request, 'tri_center_data_entry.html', {
         'tri_centers': tri_centers,
-        'smart_bins': smart_bins
     })
 
-class TriCenterViewSet(viewsets.ModelViewSet):
+class TriCenterViewSet(CachedResponseMixin, ReplicaReadMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = TriCenter.objects.all()
     serializer_class = TriCenterSerializer
     permission_classes = [IsAdminOrReadOnly | IsTriCenterManager]
     filter_backends = [DjangoFilterBackend]
     filterset_class = TriCenterFilter
+    cache_models = (TriCenter,)
+    cache_actions = ('list', 'retrieve', 'nearest')
+    cache_timeout = 3600
+    replica_actions = ('statistics',)
+
+    def get_cursor_ordering(self):
+        if 'near' in self.request.query_params:
+            return 'distance_m', False
+        return 'created_at', True
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            limit = int(request.query_params.get('limit', 1))
+        except (KeyError, ValueError):
+            return Response({'error': 'Les paramètres lat et lng sont requis'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not 1 <= limit <= 50:
+            return Response({'error': 'Coordonnées ou limit hors limites'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        centers = nearest(self.get_queryset(), lat, lng, limit, 'gps_lat', 'gps_lng')
+        serializer = self.get_serializer(centers, many=True)
+        return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
         center = self.get_object()
-        stats = CenterStatistics.objects.filter(tri_center=center)
+        stats = apply_query_plan(
+            CenterStatistics.objects.filter(tri_center=center), CenterStatisticsSerializer
+        )
         serializer = CenterStatisticsSerializer(stats, many=True)
         return Response(serializer.data)
 
-class WasteFlowViewSet(viewsets.ModelViewSet):
+class PaymentPlanViewSet(CachedResponseMixin, QueryPlanMixin, viewsets.ModelViewSet):
+    queryset = PaymentPlan.objects.all()
+    serializer_class = PaymentPlanSerializer
+    permission_classes = [IsAdminOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PaymentPlanFilter
+    cache_models = (PaymentPlan,)
+    cache_timeout = 3600
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            # Formules retirées visibles des seuls administrateurs
+            return queryset.filter(is_active=True)
+        return queryset
+
+class ModuleViewSet(CachedResponseMixin, viewsets.ViewSet):
+    cache_models = (ModulePermission,)
+    cache_timeout = 24 * 3600
+
+    def list(self, request):
+        # Catalogue des modules (SmartBinConfig.MODULES) et description des
+        # permissions enregistrées
+        descriptions = {
+            (module, permission): description
+            for module, permission, description in ModulePermission.objects.values_list(
+                'module', 'permission', 'description'
+            )
+        }
+        return Response([
+            {
+                'code': code,
+                'name': module['name'],
+                'description': module['description'],
+                'icon': module['icon'],
+                'permissions': [
+                    {'code': permission, 'description': descriptions.get((code, permission), '')}
+                    for permission in module['permissions']
+                ],
+            }
+            for code, module in SmartBinConfig.MODULES.items()
+        ])
+
+class WasteFlowViewSet(ReplicaReadMixin, QueryPlanMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = WasteFlow.objects.all()
     serializer_class = WasteFlowSerializer
     permission_classes = [IsAdminOrReadOnly | IsTriCenterManager]
     filter_backends = [DjangoFilterBackend]
     filterset_class = WasteFlowFilter
+    cursor_field = 'processing_date'
+    export_name = 'waste-flows'
+    replica_actions = ('export', 'by_waste_type')
+    export_ordering = ('processing_date', 'pk')
+    export_columns = [
+        ('id', 'id'),
+        ('tri_center', 'tri_center'),
+        ('tri_center_name', 'tri_center__name'),
+        ('smart_bin', 'smart_bin'),
+        ('processing_date', 'processing_date'),
+        ('waste_type', 'waste_type'),
+        ('quantity_kg', 'quantity_kg'),
+        ('recycling_rate', 'recycling_rate'),
+        ('anomaly_detected', 'anomaly_detected'),
+        ('comment', 'comment'),
+    ]
 
     @action(detail=False, methods=['get'])
     def by_waste_type(self, request):
         waste_type = request.query_params.get('waste_type')
         if waste_type:
             flows = self.get_queryset().filter(waste_type=waste_type)
+            page = self.paginate_queryset(flows)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(flows, many=True)
             return Response(serializer.data)
         return Response({'error': 'waste_type parameter is required'}, 
                       status=status.HTTP_400_BAD_REQUEST)
 
-class CenterStatisticsViewSet(viewsets.ModelViewSet):
+class WasteFlowImportViewSet(QueryPlanMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                             mixins.ListModelMixin, viewsets.GenericViewSet):
+    queryset = WasteFlowImport.objects.all()
+    serializer_class = WasteFlowImportSerializer
+    permission_classes = [IsAdminOrReadOnly | IsTriCenterManager]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_staff:
+            return queryset.filter(created_by=user)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            upload = serializer.save(created_by=request.user)
+            start_import(upload)
+        # Le fichier est traité par les workers : suivre GET /waste-flow-imports/{id}/
+        return Response(self.get_serializer(upload).data, status=status.HTTP_202_ACCEPTED)
+
+class JobViewSet(QueryPlanMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                 mixins.ListModelMixin, viewsets.GenericViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    # Lecture de ses propres jobs ; création et annulation réservées aux administrateurs
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['name', 'status']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_staff:
+            return queryset.filter(created_by=user)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if data['name'] not in TASKS:
+            return Response({'name': [f"Tâche inconnue. Tâches disponibles : {', '.join(sorted(TASKS))}"]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue(data['name'], data.get('params'), data.get('priority'),
+                      data.get('run_at'), created_by=request.user)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'done':
+            return Response({'status': job.status, 'error': job.error},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(job.result)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        job = self.get_object()
+        # Seul un job encore en attente peut être annulé
+        if not Job.objects.filter(pk=job.pk, status='queued').update(
+            status='cancelled', finished_at=timezone.now()
+        ):
+            return Response({'error': f'Job {job.get_status_display().lower()}, annulation impossible'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'status': 'success'})
+
+async def event_stream(request):
+    """
+    Flux SSE des bacs et alertes modifiés, limité aux zones visibles par
+    l'utilisateur. Chaque message porte un ``id`` à renvoyer à la reconnexion
+    (en-tête Last-Event-ID, ou paramètre ``since``).
+    """
+    user = await sync_to_async(realtime.authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': "Informations d'authentification non fournies."}, status=401)
+    try:
+        token = request.headers.get('Last-Event-ID') or request.GET.get('since')
+        token = int(token) if token else None
+        zone = int(request.GET['zone']) if request.GET.get('zone') else None
+    except ValueError:
+        return JsonResponse({'error': 'since et zone doivent être des entiers'}, status=400)
+    if token is not None and token < 0:
+        return JsonResponse({'error': 'since doit être positif'}, status=400)
+    kinds = [kind for kind in request.GET.get('types', 'bins,alerts').split(',') if kind in realtime.KINDS]
+    subscription = realtime.Subscription.for_user(user, zone, kinds)
+    if isinstance(request, ASGIRequest):
+        content = realtime.stream(subscription, token)
+    else:
+        content = realtime.polling_stream(subscription, token)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def metrics(request):
+    """
+    Métriques des requêtes au format Prometheus (voir instrumentation.py),
+    pour le collecteur muni du jeton SMARTBIN_METRICS_TOKEN ou un
+    utilisateur staff.
+    """
+    token = getattr(settings, 'SMARTBIN_METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    authorized = bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+    if not authorized and instrumentation.staff_user(request) is None:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        instrumentation.render_metrics(instrumentation.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+class CenterStatisticsViewSet(ReplicaReadMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CenterStatistics.objects.all()
     serializer_class = CenterStatisticsSerializer
     permission_classes = [IsAdminOrReadOnly | IsTriCenterManager]
     filter_backends = [DjangoFilterBackend]
     filterset_class = CenterStatisticsFilter
+    cursor_field = 'period'
+    replica_actions = ('list', 'retrieve', 'monthly_summary', 'yearly_summary')
 
     @action(detail=False, methods=['get'])
     def monthly_summary(self, request):
         stats = self.get_queryset().filter(period_type='monthly')
+        page = self.paginate_queryset(stats)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(stats, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def yearly_summary(self, request):
         stats = self.get_queryset().filter(period_type='yearly')
+        page = self.paginate_queryset(stats)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(stats, many=True)
         return Response(serializer.data) 
\ No newline at end of file